@@ -0,0 +1,86 @@
+import argparse
+from datetime import date
+from dotenv import load_dotenv
+
+# Settings below are read from the environment when their modules are imported
+load_dotenv()
+
+from app.core.database import get_db_client
+from app.core.email import close_mailer
+from app.core.weekly_reports import WEEKLY_REPORT_WORKERS, last_completed_week, run_weekly_report_fanout
+
+
+# python -m app.cli rebuild-rollups --user <uid> | --all
+def rebuild_rollups_command(args):
+    db_client = get_db_client()
+    if args.all:
+        user_ids = [doc.id for doc in db_client.db.collection("users").select([]).stream()]
+    else:
+        user_ids = [args.user]
+
+    failed = 0
+    for user_id in user_ids:
+        success, result = db_client.rebuild_rollups(user_id)
+        if success:
+            print(f"[INFO] {user_id}: rebuilt {result} monthly rollups")
+        else:
+            failed += 1
+            print(f"[ERROR] {user_id}: {result}")
+    print(f"[INFO] Done: {len(user_ids) - failed} succeeded, {failed} failed")
+    return 1 if failed else 0
+
+
+# python -m app.cli migrate-legacy --user <uid>
+# Resumes from the checkpoint in the user document, so it is safe to re-run after a crash.
+def migrate_legacy_command(args):
+    success, result = get_db_client().migrate_legacy_user(args.user)
+    if not success:
+        print(f"[ERROR] {args.user}: {result}")
+        return 1
+    print(f"[INFO] {args.user}: {result if isinstance(result, str) else f'moved {result} expenses'}")
+    return 0
+
+
+# python -m app.cli send-weekly-reports [--date YYYY-MM-DD] [--workers N]
+# Runs to completion; safe to re-run after a crash (resumes from the checkpoint).
+def send_weekly_reports_command(args):
+    reference_date = date.fromisoformat(args.date) if args.date else last_completed_week(date.today())
+    try:
+        success, result = run_weekly_report_fanout(get_db_client(), reference_date, workers=args.workers)
+    finally:
+        close_mailer()
+    if not success:
+        print(f"[ERROR] Weekly report run failed: {result}")
+        return 1
+    print(
+        f"[INFO] Week {result['week_start']}: {result['status']} - "
+        f"{result['sent']} sent, {result['skipped']} skipped, {result['failed']} failed"
+    )
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m app.cli", description="AI Expense Tracker maintenance commands")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    rebuild = commands.add_parser("rebuild-rollups", help="Recompute spending rollups from raw expenses")
+    target = rebuild.add_mutually_exclusive_group(required=True)
+    target.add_argument("--user", help="Firebase user ID")
+    target.add_argument("--all", action="store_true", help="Every user in Firestore")
+    rebuild.set_defaults(func=rebuild_rollups_command)
+
+    migrate = commands.add_parser("migrate-legacy", help="Move a legacy account's expenses to the user's Firebase UID")
+    migrate.add_argument("--user", required=True, help="Firebase user ID with a pending legacy migration")
+    migrate.set_defaults(func=migrate_legacy_command)
+
+    weekly = commands.add_parser("send-weekly-reports", help="Email the weekly report to all subscribed users")
+    weekly.add_argument("--date", help="Any day in the report week (default: last completed week)")
+    weekly.add_argument("--workers", type=int, default=WEEKLY_REPORT_WORKERS, help="Concurrent users")
+    weekly.set_defaults(func=send_weekly_reports_command)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,104 @@
+import importlib
+import os
+import threading
+import firebase_admin
+from firebase_admin import auth as firebase_auth
+from app.core.cache import TokenCache
+from app.core.firebase import get_firebase_app
+
+# The frontend reuses one ID token for up to an hour, so verified claims are cached
+# until the token's own exp. Set TOKEN_CACHE_ENABLED=false to verify on every request.
+TOKEN_CACHE_ENABLED = os.getenv("TOKEN_CACHE_ENABLED", "true").lower() not in ("0", "false", "no")
+try:
+    TOKEN_CACHE_MAX_ENTRIES = int(os.getenv("TOKEN_CACHE_MAX_ENTRIES", "10000"))
+    PUBLIC_KEY_REFRESH_SECONDS = float(os.getenv("PUBLIC_KEY_REFRESH_SECONDS", "600"))
+except ValueError:
+    TOKEN_CACHE_MAX_ENTRIES = 10000
+    PUBLIC_KEY_REFRESH_SECONDS = 600.0
+
+token_cache = TokenCache(max_entries=TOKEN_CACHE_MAX_ENTRIES)
+
+# firebase_admin keeps the signing certificates in a cache owned by its token verifier, so
+# pre-warming has to go through that verifier, which is not public API. It is only used on
+# the major versions it was checked against; on any other version pre-warming is skipped
+# and keys are fetched on first verification as usual.
+PREWARM_FIREBASE_ADMIN_MAJORS = (6, 7)
+
+_refresher_started = False
+_refresher_stop = threading.Event()
+
+
+def cached_claims(token: str):
+    """Return previously verified claims for this token, or None."""
+    if not TOKEN_CACHE_ENABLED:
+        return None
+    return token_cache.get(token)
+
+
+def verify_id_token(token: str) -> dict:
+    """Verify with Firebase Admin (blocking) and remember the claims until the token expires."""
+    decoded_token = firebase_auth.verify_id_token(token, app=get_firebase_app())
+    if TOKEN_CACHE_ENABLED:
+        token_cache.set(token, decoded_token)
+    return decoded_token
+
+
+def _id_token_cert_url():
+    """Certificate URL firebase_admin verifies ID tokens against, or None on an unchecked version."""
+    try:
+        if int(firebase_admin.__version__.split(".")[0]) not in PREWARM_FIREBASE_ADMIN_MAJORS:
+            return None
+        return getattr(importlib.import_module("firebase_admin._token_gen"), "ID_TOKEN_CERT_URI", None)
+    except (ImportError, ValueError):
+        return None
+
+
+def prewarm_public_keys():
+    """
+    Fetch Firebase's token-signing certificates through the verifier's own HTTP session.
+    firebase_admin caches that response per its Cache-Control header, so refreshing it
+    here keeps the key fetch out of the request path.
+    On a firebase_admin version it doesn't know, returns (False, reason) without fetching.
+    """
+    unsupported = f"Public key pre-warming is not supported on firebase_admin {firebase_admin.__version__}"
+    cert_url = _id_token_cert_url()
+    if cert_url is None:
+        return False, unsupported
+    try:
+        client = firebase_auth._get_client(get_firebase_app())
+        request = getattr(getattr(client, "_token_verifier", None), "request", None)
+        if not callable(request):
+            return False, unsupported
+        request(cert_url)
+        return True, "Public keys refreshed"
+    except Exception as e:
+        print(f"[WARN] Firebase public key refresh failed: {e}")
+        return False, str(e)
+
+
+def start_public_key_refresher():
+    """Pre-warm the key set now and keep re-fetching it in a daemon thread (if supported)."""
+    global _refresher_started
+    if _refresher_started or _id_token_cert_url() is None:
+        return
+    _refresher_started = True
+    _refresher_stop.clear()
+
+    def refresh_loop():
+        prewarm_public_keys()
+        while not _refresher_stop.wait(PUBLIC_KEY_REFRESH_SECONDS):
+            prewarm_public_keys()
+
+    threading.Thread(target=refresh_loop, name="firebase-key-refresh", daemon=True).start()
+
+
+def stop_public_key_refresher():
+    global _refresher_started
+    _refresher_stop.set()
+    # firebase_admin keeps the signing certificates in a cache owned by its token verifier, so
+# pre-warming has to go through that verifier, which is not public API. It is only used on
+# the major versions it was checked against; on any other version pre-warming is skipped
+# and keys are fetched on first verification as usual.
+PREWARM_FIREBASE_ADMIN_MAJORS = (6, 7)
+
+_refresher_started = False
@@ -0,0 +1,352 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+class ExpenseCache:
+    """
+    In-process LRU + TTL cache of each user's full expense list.
+    Cached lists are treated as read-only: writers replace records instead of mutating them,
+    so a list handed out by get() stays consistent while it is being serialized.
+    Each entry can also hold one value derived from its list (see get_derived); any write
+    to the entry drops it.
+    """
+
+    def __init__(self, max_users: int = 256, ttl_seconds: float = 300.0, clock=time.monotonic):
+        self.max_users = max_users
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._entries = OrderedDict()  # user_id -> (expires_at, records, derived or None)
+        self._lock = threading.Lock()
+        # Bumped on every write; a load that raced with a write must not repopulate the cache
+        self._write_version = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, user_id):
+        """Return a copy of the cached record list, or None on miss/expiry."""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, records, _ = entry
+            if expires_at <= self._clock():
+                del self._entries[user_id]
+                self.evictions += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return list(records)
+
+    def get_derived(self, user_id, build):
+        """
+        build(records) for the cached list, computed once per cached version of it
+        (e.g. report columns); None on miss/expiry. build runs outside the lock.
+        """
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or entry[0] <= self._clock():
+                return None
+            self._entries.move_to_end(user_id)
+            expires_at, records, derived = entry
+            if derived is not None:
+                return derived
+        derived = build(records)
+        with self._lock:
+            # Keep it only if no write replaced the list in the meantime
+            current = self._entries.get(user_id)
+            if current is not None and current[1] is records:
+                self._entries[user_id] = (current[0], records, derived)
+        return derived
+
+    def version(self) -> int:
+        """Snapshot to pass to set() when loading from Firestore after a miss."""
+        with self._lock:
+            return self._write_version
+
+    def set(self, user_id, records, version=None):
+        with self._lock:
+            if version is not None and version != self._write_version:
+                return
+            self._entries[user_id] = (self._clock() + self.ttl_seconds, list(records), None)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_users:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._write_version += 1
+            if self._entries.pop(user_id, None) is not None:
+                self.invalidations += 1
+
+    def update_record(self, user_id, record_id, data):
+        """Apply a partial update to a cached record; drops the entry if it cannot be patched."""
+        with self._lock:
+            self._write_version += 1
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return
+            # Dotted keys are nested field paths in Firestore; don't try to mirror them here
+            if any("." in key for key in data):
+                del self._entries[user_id]
+                self.invalidations += 1
+                return
+            expires_at, records, _ = entry
+            patched = [
+                {**record, **data} if record.get("id") == record_id else record
+                for record in records
+            ]
+            self._entries[user_id] = (expires_at, patched, None)
+
+    def remove_record(self, user_id, record_id):
+        with self._lock:
+            self._write_version += 1
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return
+            expires_at, records, _ = entry
+            self._entries[user_id] = (
+                expires_at,
+                [record for record in records if record.get("id") != record_id],
+                None,
+            )
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_users": self.max_users,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+class TokenCache:
+    """
+    Verified Firebase ID-token claims keyed by a SHA-256 of the raw token.
+    Each entry expires at the token's own `exp` claim, so a cached token is never
+    accepted after Firebase itself would reject it.
+    """
+
+    def __init__(self, max_entries: int = 10000, clock=time.time):
+        self.max_entries = max_entries
+        self._clock = clock
+        self._entries = OrderedDict()  # token hash -> claims
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _key(token: str) -> str:
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+    def get(self, token: str):
+        key = self._key(token)
+        with self._lock:
+            claims = self._entries.get(key)
+            if claims is None:
+                self.misses += 1
+                return None
+            if claims.get("exp", 0) <= self._clock():
+                del self._entries[key]
+                self.evictions += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return claims
+
+    def set(self, token: str, claims: dict):
+        if claims.get("exp", 0) <= self._clock():
+            return
+        key = self._key(token)
+        with self._lock:
+            self._entries[key] = claims
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+class RenderCache:
+    """
+    Rendered email bodies keyed by a hash of the report content.
+    Identical reports (retries, re-generated weeks) render once.
+    """
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # content hash -> rendered value
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: str, value):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+class ParseResultCache:
+    """
+    LRU + TTL cache of JSON-serializable parse results, optionally persisted to SQLite
+    so entries survive restarts. Memory is checked first; SQLite is read on a memory miss
+    and written through on every set. Each entry remembers how long the original call
+    took, so hits can be reported as saved latency.
+    """
+
+    def __init__(self, max_entries: int = 5000, ttl_seconds: float = 7 * 24 * 3600, sqlite_path: str = None, clock=time.time):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._entries = OrderedDict()  # key -> (expires_at, cost_seconds, value)
+        self._lock = threading.Lock()
+        self._db = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.saved_seconds = 0.0
+        if sqlite_path:
+            self.open(sqlite_path)
+
+    def open(self, sqlite_path: str):
+        """Attach the SQLite backend (the constructor does this when given a path)."""
+        db = sqlite3.connect(sqlite_path, check_same_thread=False)
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS parse_cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, cost REAL NOT NULL, "
+            "expires_at REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+        db.execute("CREATE INDEX IF NOT EXISTS parse_cache_last_used ON parse_cache (last_used)")
+        db.commit()
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+            self._db = db
+
+    def _load(self, key, now):
+        """SQLite read-through; caller holds the lock."""
+        row = self._db.execute("SELECT value, cost, expires_at FROM parse_cache WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        value, cost, expires_at = row
+        if expires_at <= now:
+            self._db.execute("DELETE FROM parse_cache WHERE key = ?", (key,))
+            self._db.commit()
+            self.evictions += 1
+            return None
+        self._db.execute("UPDATE parse_cache SET last_used = ? WHERE key = ?", (now, key))
+        self._db.commit()
+        return expires_at, cost, json.loads(value)
+
+    def _remember(self, key, entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def get(self, key: str):
+        with self._lock:
+            now = self._clock()
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= now:
+                del self._entries[key]
+                self.evictions += 1
+                entry = None
+            if entry is None and self._db is not None:
+                entry = self._load(key, now)
+                if entry is not None:
+                    self._remember(key, entry)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            self.saved_seconds += entry[1]
+            return entry[2]
+
+    def set(self, key: str, value, cost_seconds: float = 0.0):
+        with self._lock:
+            now = self._clock()
+            expires_at = now + self.ttl_seconds
+            self._remember(key, (expires_at, cost_seconds, value))
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO parse_cache (key, value, cost, expires_at, last_used) VALUES (?, ?, ?, ?, ?)",
+                    (key, json.dumps(value, ensure_ascii=False), cost_seconds, expires_at, now),
+                )
+                # Same bound on disk: drop expired rows, then the least recently used
+                self._db.execute("DELETE FROM parse_cache WHERE expires_at <= ?", (now,))
+                self._db.execute(
+                    "DELETE FROM parse_cache WHERE key IN ("
+                    "SELECT key FROM parse_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,),
+                )
+                self._db.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "persistent": self._db is not None,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "saved_latency_seconds": round(self.saved_seconds, 3),
+            }
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
@@ -0,0 +1,79 @@
+import re
+
+# Deterministic keyword → category hints. Keys are the default category names;
+# a hint only applies when the user actually has a category with that name.
+DEFAULT_CATEGORY_KEYWORDS = {
+    "Food": [
+        "food", "coffee", "cafe", "café", "starbucks", "restaurant", "lunch", "dinner",
+        "breakfast", "brunch", "snack", "mcdonald", "mcdonalds", "kfc", "pizza", "burger",
+        "grocery", "groceries", "supermarket", "bakery", "tea", "bubble tea", "bento",
+        "早餐", "午餐", "晚餐", "咖啡", "飲料", "便當",
+    ],
+    "Transport": [
+        "transport", "uber", "lyft", "taxi", "cab", "bus", "train", "mrt", "metro",
+        "subway", "hsr", "rail", "fuel", "gas station", "petrol", "parking",
+        "toll", "flight", "airline", "捷運", "公車", "計程車", "高鐵", "火車", "加油", "停車",
+    ],
+    "Shopping": [
+        "shopping", "amazon", "store", "mall", "clothes", "shoes", "ikea", "uniqlo",
+        "shopee", "momo", "購物", "衣服",
+    ],
+    "Bills": [
+        "bill", "bills", "electric", "electricity", "water bill", "internet", "phone bill",
+        "mobile", "rent", "insurance", "utility", "utilities", "電費", "水費", "房租", "網路", "電話費",
+    ],
+    "Entertainment": [
+        "entertainment", "netflix", "spotify", "disney", "cinema", "movie", "steam",
+        "playstation", "nintendo", "concert", "ticket", "karaoke", "ktv", "電影", "遊戲",
+    ],
+}
+
+# Categories used when nothing matches and no AI fallback is available
+FALLBACK_CATEGORY_NAMES = ("Other", "Others")
+
+_WORD = re.compile(r"[^\W_]+", re.UNICODE)
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase and collapse punctuation/whitespace so keyword lookups are stable."""
+    return " ".join(_WORD.findall((text or "").lower()))
+
+
+def resolve_category_name(name: str, categories: list):
+    """Return the user's spelling of `name` if it is one of their categories (case-insensitive)."""
+    if not name:
+        return None
+    wanted = name.strip().lower()
+    for category in categories or []:
+        if category.lower() == wanted:
+            return category
+    return None
+
+
+def match_category(text: str, categories: list, keyword_map: dict = None):
+    """
+    Map free text (item / payee / memo) to one of the user's categories without an LLM.
+    Returns the category or None when no keyword applies.
+    """
+    normalized = normalize_text(text)
+    if not normalized:
+        return None
+    padded = f" {normalized} "
+    for default_name, keywords in (keyword_map or DEFAULT_CATEGORY_KEYWORDS).items():
+        category = resolve_category_name(default_name, categories)
+        if category is None:
+            continue
+        for keyword in keywords:
+            keyword = normalize_text(keyword)
+            # Whole-word match for latin keywords, substring match for CJK
+            if keyword and (f" {keyword} " in padded or (not keyword.isascii() and keyword in normalized)):
+                return category
+    return None
+
+
+def fallback_category(categories: list) -> str:
+    for name in FALLBACK_CATEGORY_NAMES:
+        category = resolve_category_name(name, categories)
+        if category:
+            return category
+    return categories[-1] if categories else "Other"
@@ -0,0 +1,198 @@
+import math
+import os
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from app.core.categorizer import normalize_text, resolve_category_name
+
+# Per-user category model, one document: users/{uid}/models/category
+# {
+#   "built": true,                        # backfilled from existing history
+#   "categories": {"Food": 120, ...},     # records seen per category
+#   "tokens": {"starbucks": {"Food": 14}, "=starbucks latte": {"Food": 3}, ...},
+# }
+# Keys starting with "=" are whole normalized item names ("merchants"); the rest are words.
+# Counts are only ever incremented/decremented, so writes are Firestore Increments,
+# committed right after the expense write (a failed model write never fails the expense).
+# The document is bounded: past CATEGORY_MODEL_MAX_TOKENS keys the least-seen ones are
+# pruned (see tokens_to_prune), keeping it far below Firestore's 1 MiB / index-entry limits.
+
+try:
+    CATEGORY_MODEL_MIN_CONFIDENCE = float(os.getenv("CATEGORY_MODEL_MIN_CONFIDENCE", "0.75"))
+    CATEGORY_MODEL_CACHE_USERS = int(os.getenv("CATEGORY_MODEL_CACHE_USERS", "512"))
+    CATEGORY_MODEL_MAX_TOKENS = int(os.getenv("CATEGORY_MODEL_MAX_TOKENS", "5000"))
+except ValueError:
+    CATEGORY_MODEL_MIN_CONFIDENCE = 0.75
+    CATEGORY_MODEL_CACHE_USERS = 512
+    CATEGORY_MODEL_MAX_TOKENS = 5000
+
+MAX_ITEM_TOKENS = 6
+MERCHANT_PREFIX = "="
+# A word/merchant must have been seen this many times before it is trusted
+MIN_EVIDENCE = 2
+SMOOTHING = 0.5
+# Pruning goes down to this share of the cap, so it doesn't run again on the next write
+PRUNE_TO = 0.8
+
+
+def item_tokens(item: str) -> list[str]:
+    normalized = normalize_text(item)
+    if not normalized:
+        return []
+    words = list(dict.fromkeys(normalized.split()))[:MAX_ITEM_TOKENS]
+    return [MERCHANT_PREFIX + normalized] + words
+
+
+def model_deltas(added: list[dict] = (), removed: list[dict] = ()) -> dict:
+    """Signed count changes for records being added and/or removed (like rollup_deltas)."""
+    categories = defaultdict(int)
+    tokens = defaultdict(lambda: defaultdict(int))
+    for records, sign in ((added, 1), (removed, -1)):
+        for record in records:
+            category = record.get("category")
+            keys = item_tokens(record.get("item"))
+            if not category or not keys:
+                continue
+            categories[category] += sign
+            for key in keys:
+                tokens[key][category] += sign
+    # Drop entries an update cancelled out (same item and category before and after)
+    return {
+        "categories": {category: count for category, count in categories.items() if count},
+        "tokens": {
+            key: {category: count for category, count in counts.items() if count}
+            for key, counts in tokens.items()
+            if any(counts.values())
+        },
+    }
+
+
+def tokens_to_prune(tokens: dict, max_tokens: int = CATEGORY_MODEL_MAX_TOKENS) -> list[str]:
+    """
+    Keys to drop once a model has more than max_tokens of them: emptied keys first,
+    then the least seen, down to PRUNE_TO of the cap. [] while the model is within the cap.
+    """
+    if len(tokens) <= max_tokens:
+        return []
+    totals = sorted((sum(counts.values()), key) for key, counts in list(tokens.items()))
+    keep = int(max_tokens * PRUNE_TO)
+    return [key for _, key in totals[:len(totals) - keep]]
+
+
+def build_model(expenses, max_tokens: int = CATEGORY_MODEL_MAX_TOKENS) -> dict:
+    model = {"built": True, **model_deltas(added=list(expenses))}
+    for key in tokens_to_prune(model["tokens"], max_tokens):
+        del model["tokens"][key]
+    return model
+
+
+class CategoryModel:
+    """Naive Bayes over item words, with exact merchant matches taking precedence."""
+
+    def __init__(self, data: dict = None):
+        data = data or {}
+        self.built = bool(data.get("built"))
+        self.categories = defaultdict(int, data.get("categories") or {})
+        self.tokens = defaultdict(lambda: defaultdict(int))
+        for key, counts in (data.get("tokens") or {}).items():
+            self.tokens[key].update(counts)
+
+    def apply(self, deltas: dict):
+        for category, count in deltas.get("categories", {}).items():
+            self.categories[category] += count
+        for key, counts in deltas.get("tokens", {}).items():
+            for category, count in counts.items():
+                self.tokens[key][category] += count
+
+    def prune(self, keys: list[str]):
+        for key in keys:
+            self.tokens.pop(key, None)
+
+    def predict(self, item: str, categories: list):
+        """
+        (category, confidence) among the user's current categories, or (None, 0.0)
+        when the user's history says nothing about this item.
+        """
+        keys = item_tokens(item)
+        if not keys or not categories:
+            return None, 0.0
+        # Snapshots: writers may apply deltas to this model concurrently
+        seen_counts = dict(self.categories)
+        allowed = {category: resolve_category_name(category, categories) for category in seen_counts}
+        allowed = {name: resolved for name, resolved in allowed.items() if resolved}
+
+        merchant = {c: n for c, n in dict(self.tokens.get(keys[0], {})).items() if c in allowed and n > 0}
+        if sum(merchant.values()) >= MIN_EVIDENCE:
+            best = max(merchant, key=merchant.get)
+            return allowed[best], round(merchant[best] / sum(merchant.values()), 3)
+
+        evidence = [
+            (key, {c: n for c, n in dict(self.tokens.get(key, {})).items() if c in allowed and n > 0})
+            for key in keys[1:]
+        ]
+        evidence = [(key, counts) for key, counts in evidence if sum(counts.values()) >= MIN_EVIDENCE]
+        if not evidence:
+            return None, 0.0
+
+        total = sum(max(seen_counts[c], 0) for c in allowed) or 1
+        scores = {}
+        for category in allowed:
+            seen = max(seen_counts[category], 0)
+            if seen <= 0:
+                continue
+            score = math.log(seen / total)
+            for _, counts in evidence:
+                score += math.log((counts.get(category, 0) + SMOOTHING) / (seen + 2 * SMOOTHING))
+            scores[category] = score
+        if not scores:
+            return None, 0.0
+        peak = max(scores.values())
+        weights = {category: math.exp(score - peak) for category, score in scores.items()}
+        best = max(weights, key=weights.get)
+        return allowed[best], round(weights[best] / sum(weights.values()), 3)
+
+
+def apply_category_model(expenses: list[dict], model, categories: list, min_confidence: float = CATEGORY_MODEL_MIN_CONFIDENCE) -> int:
+    """Override parsed categories where the user's own history is confident. Returns how many changed."""
+    if model is None:
+        return 0
+    changed = 0
+    for expense in expenses:
+        category, confidence = model.predict(expense.get("item"), categories)
+        if category and confidence >= min_confidence and category != expense.get("category"):
+            expense["category"] = category
+            changed += 1
+    return changed
+
+
+class CategoryModelCache:
+    """Loaded models per user (LRU). Writers apply their deltas to the cached copy."""
+
+    def __init__(self, max_users: int = CATEGORY_MODEL_CACHE_USERS, ttl_seconds: float = 3600, clock=time.monotonic):
+        self.max_users = max_users
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._entries = OrderedDict()  # user_id -> (expires_at, CategoryModel)
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or entry[0] <= self._clock():
+                self._entries.pop(user_id, None)
+                return None
+            self._entries.move_to_end(user_id)
+            return entry[1]
+
+    def set(self, user_id, model: CategoryModel):
+        with self._lock:
+            self._entries[user_id] = (self._clock() + self.ttl_seconds, model)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_users:
+                self._entries.popitem(last=False)
+
+    def apply(self, user_id, deltas: dict):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None:
+                entry[1].apply(deltas)
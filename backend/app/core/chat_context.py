@@ -0,0 +1,285 @@
+import json
+import os
+import re
+from collections import defaultdict
+from datetime import date, timedelta
+from app.core.categorizer import match_category, normalize_text
+from app.core.rollups import summarize_months, summarize_rollups
+
+# Size limits for the /expense/chat prompt. Token counts are estimates (see estimate_tokens).
+try:
+    CHAT_CONTEXT_TOKEN_BUDGET = int(os.getenv("CHAT_CONTEXT_TOKEN_BUDGET", "6000"))
+    CHAT_HISTORY_TOKEN_BUDGET = int(os.getenv("CHAT_HISTORY_TOKEN_BUDGET", "2000"))
+    CHAT_RECENT_TRANSACTIONS = int(os.getenv("CHAT_RECENT_TRANSACTIONS", "20"))
+    CHAT_RELEVANT_RECORDS = int(os.getenv("CHAT_RELEVANT_RECORDS", "100"))
+    CHAT_MONTHLY_DETAIL_MONTHS = int(os.getenv("CHAT_MONTHLY_DETAIL_MONTHS", "24"))
+except ValueError:
+    CHAT_CONTEXT_TOKEN_BUDGET = 6000
+    CHAT_HISTORY_TOKEN_BUDGET = 2000
+    CHAT_RECENT_TRANSACTIONS = 20
+    CHAT_RELEVANT_RECORDS = 100
+    CHAT_MONTHLY_DETAIL_MONTHS = 24
+
+MAX_NOTE_CHARS = 80
+
+MONTH_NAMES = {
+    "jan": 1, "january": 1, "feb": 2, "february": 2, "mar": 3, "march": 3, "apr": 4, "april": 4,
+    "may": 5, "jun": 6, "june": 6, "jul": 7, "july": 7, "aug": 8, "august": 8,
+    "sep": 9, "sept": 9, "september": 9, "oct": 10, "october": 10, "nov": 11, "november": 11,
+    "dec": 12, "december": 12,
+}
+
+_ISO_DATE = re.compile(r"\b(\d{4})[-/](\d{1,2})[-/](\d{1,2})\b")
+_ISO_MONTH = re.compile(r"\b(\d{4})[-/](\d{1,2})\b")
+_CJK_MONTH = re.compile(r"(?:(\d{4})\s*年\s*)?(\d{1,2})\s*月")
+_YEAR = re.compile(r"\b(19\d{2}|20\d{2})\b")
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count: ~4 characters per token for ASCII, one per CJK/other character."""
+    ascii_chars = sum(1 for char in text if char.isascii())
+    return ascii_chars // 4 + (len(text) - ascii_chars) + 1
+
+
+def _json(value) -> str:
+    return json.dumps(value, ensure_ascii=False, default=str, separators=(",", ":"))
+
+
+def _month_range(year: int, month: int):
+    start = date(year, month, 1)
+    end = date(year + 1, 1, 1) if month == 12 else date(year, month + 1, 1)
+    return start, end - timedelta(days=1)
+
+
+def _past_month(month: int, today: date):
+    """A bare month name refers to its most recent occurrence."""
+    return today.year if month <= today.month else today.year - 1
+
+
+def question_date_range(question: str, today: date):
+    """
+    (start, end) dates the question is about, or None.
+    Understands ISO dates/months, month names, years and relative phrases in English and Chinese.
+    """
+    text = question.lower()
+    match = _ISO_DATE.search(text)
+    if match:
+        try:
+            day = date(int(match.group(1)), int(match.group(2)), int(match.group(3)))
+            return day, day
+        except ValueError:
+            pass
+    match = _ISO_MONTH.search(text)
+    if match and 1 <= int(match.group(2)) <= 12:
+        return _month_range(int(match.group(1)), int(match.group(2)))
+
+    week_start = today - timedelta(days=today.weekday())
+    relative = (
+        (("yesterday", "昨天"), (today - timedelta(days=1), today - timedelta(days=1))),
+        (("today", "今天"), (today, today)),
+        (("last week", "上週", "上周", "上禮拜"), (week_start - timedelta(days=7), week_start - timedelta(days=1))),
+        (("this week", "本週", "這週", "这周", "這禮拜"), (week_start, today)),
+        (("last month", "上個月", "上个月"), _month_range(*((today.year - 1, 12) if today.month == 1 else (today.year, today.month - 1)))),
+        (("this month", "本月", "這個月", "这个月"), (today.replace(day=1), today)),
+        (("last year", "去年"), (date(today.year - 1, 1, 1), date(today.year - 1, 12, 31))),
+        (("this year", "今年"), (date(today.year, 1, 1), today)),
+    )
+    for phrases, window in relative:
+        if any(phrase in text for phrase in phrases):
+            return window
+
+    year_match = _YEAR.search(text)
+    match = _CJK_MONTH.search(text)
+    if match and 1 <= int(match.group(2)) <= 12:
+        month = int(match.group(2))
+        year = int(match.group(1)) if match.group(1) else _past_month(month, today)
+        return _month_range(year, month)
+    for word in normalize_text(text).split():
+        month = MONTH_NAMES.get(word)
+        # "may" is usually the verb; only trust it next to a year
+        if month and (word != "may" or year_match):
+            year = int(year_match.group(1)) if year_match else _past_month(month, today)
+            return _month_range(year, month)
+    if year_match:
+        year = int(year_match.group(1))
+        return date(year, 1, 1), date(year, 12, 31)
+    return None
+
+
+def question_category(question: str, categories: list):
+    """The user's category the question mentions by name, else one implied by keywords."""
+    normalized = f" {normalize_text(question)} "
+    for category in categories or []:
+        name = normalize_text(category)
+        if name and (f" {name} " in normalized or (not name.isascii() and name in normalized)):
+            return category
+    return match_category(question, categories)
+
+
+def trim_history(history: list[dict], budget: int = CHAT_HISTORY_TOKEN_BUDGET) -> list[dict]:
+    """Keep the newest turns that fit in `budget` tokens; older turns are dropped."""
+    kept = []
+    used = 0
+    for message in reversed(history):
+        cost = estimate_tokens(_json(message))
+        if used + cost > budget:
+            break
+        kept.append(message)
+        used += cost
+    kept.reverse()
+    return kept
+
+
+def compact_record(record: dict) -> dict:
+    compact = {
+        "date": record.get("date"),
+        "item": record.get("item"),
+        "amount": record.get("amount"),
+        "currency": record.get("currency"),
+        "category": record.get("category"),
+    }
+    note = (record.get("note") or "").strip()
+    if note:
+        compact["note"] = note[:MAX_NOTE_CHARS]
+    return compact
+
+
+def _fold_years(months: list[dict]) -> list[dict]:
+    """Collapse monthly summaries into per-year, per-currency totals."""
+    years = {}
+    for month in months:
+        key = (month["month"][:4], month["currency"])
+        entry = years.setdefault(key, {
+            "year": key[0], "currency": key[1], "total": 0.0, "count": 0, "categories": defaultdict(float),
+        })
+        entry["total"] += month["total"]
+        entry["count"] += month["count"]
+        for category, amount in month["categories"].items():
+            entry["categories"][category] += amount
+    return [
+        {
+            **entry,
+            "total": round(entry["total"], 2),
+            "categories": {category: round(amount, 2) for category, amount in entry["categories"].items()},
+        }
+        for entry in years.values()
+    ]
+
+
+def compact_expense_context(
+    rollups: list[dict],
+    recent: list[dict],
+    relevant: list[dict],
+    user_info: dict,
+    today: date,
+    date_range=None,
+    category=None,
+    relevant_complete: bool = True,
+    budget: int = CHAT_CONTEXT_TOKEN_BUDGET,
+) -> dict:
+    """
+    Expense context for the chat prompt, independent of how long the history is:
+    monthly totals (older months folded into yearly totals), the latest transactions,
+    and the raw records matching the question's date range / category.
+    Raw records are dropped oldest-first, then the oldest monthly detail, until the
+    serialized context fits in `budget` tokens.
+    """
+    currency = user_info.get("currency") or "USD"
+    months = summarize_months(rollups, currency)
+    detail_from = 0
+    # Keep per-month detail for the last N distinct months
+    distinct = sorted({month["month"] for month in months})
+    if len(distinct) > CHAT_MONTHLY_DETAIL_MONTHS:
+        cutoff = distinct[-CHAT_MONTHLY_DETAIL_MONTHS]
+        detail_from = next(index for index, month in enumerate(months) if month["month"] >= cutoff)
+
+    question_scope = {}
+    if date_range:
+        question_scope["start_date"], question_scope["end_date"] = (day.isoformat() for day in date_range)
+        totals = summarize_rollups(rollups, date_range[0], date_range[1], currency)
+        question_scope["totals"] = {key: totals[key] for key in ("total", "count", "categories")}
+    if category:
+        question_scope["category"] = category
+
+    relevant = [compact_record(record) for record in relevant]
+    recent = [compact_record(record) for record in recent]
+    complete = relevant_complete
+
+    def build():
+        return {
+            "today": today.isoformat(),
+            "currency": currency,
+            "categories": user_info.get("categories", []),
+            "yearly_totals": _fold_years(months[:detail_from]),
+            "monthly_totals": months[detail_from:],
+            "question_scope": question_scope,
+            "matching_records": relevant,
+            "matching_records_complete": complete,
+            "recent_transactions": recent,
+        }
+
+    context = build()
+    while estimate_tokens(_json(context)) > budget:
+        if relevant:
+            # Records arrive newest first; drop from the end
+            del relevant[-max(1, len(relevant) // 4):]
+            complete = False
+        elif len(recent) > 5:
+            del recent[-max(1, len(recent) // 4):]
+        elif detail_from < len(months) - 1:
+            detail_from += 1
+        else:
+            break
+        context = build()
+    return context
+
+
+def build_chat_context(db, user_id: str, user_info: dict, question: str, history: list[dict], today: date):
+    """
+    Read only what the question needs: monthly rollups, the latest transactions and
+    at most CHAT_RELEVANT_RECORDS records in the question's date range / category.
+    Returns (success, (expense_context, trimmed_history) or error).
+    """
+    # Accounts created before rollups existed are backfilled once
+    if not user_info.get("rollups_built"):
+        success, result = db.rebuild_rollups(user_id)
+        if not success:
+            return False, f"Database Error: {result}"
+
+    success, rollups = db.read_rollups(user_id, "0000-01", "9999-12")
+    if not success:
+        return False, f"Database Error: {rollups}"
+
+    success, page = db.read_user_record_page(user_id, limit=CHAT_RECENT_TRANSACTIONS)
+    if not success:
+        return False, f"Database Error: {page}"
+    recent = page["records"]
+
+    date_range = question_date_range(question, today)
+    category = question_category(question, user_info.get("categories", []))
+    relevant = []
+    relevant_complete = True
+    if date_range or category:
+        success, page = db.read_user_record_page(
+            user_id,
+            limit=CHAT_RELEVANT_RECORDS,
+            start_date=date_range[0].isoformat() if date_range else None,
+            end_date=date_range[1].isoformat() if date_range else None,
+            category=category,
+        )
+        if not success:
+            return False, f"Database Error: {page}"
+        relevant = page["records"]
+        relevant_complete = page["next_cursor"] is None
+
+    context = compact_expense_context(
+        rollups=rollups,
+        recent=recent,
+        relevant=relevant,
+        user_info=user_info,
+        today=today,
+        date_range=date_range,
+        category=category,
+        relevant_complete=relevant_complete,
+    )
+    return True, (context, trim_history(history))
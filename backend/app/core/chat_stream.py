@@ -0,0 +1,86 @@
+import json
+import threading
+import time
+from collections import deque
+
+# Server-Sent Events for /expense/chat/stream:
+#   event: token  data: {"text": "..."}           one per Gemini chunk
+#   event: done   data: {"ttft_ms": .., "total_ms": .., "chars": ..}
+#   event: error  data: {"detail": "..."}          the stream ends after it
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    # Stop nginx-style proxies from buffering the stream
+    "X-Accel-Buffering": "no",
+}
+TTFT_WINDOW = 500
+
+
+def sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def _percentile(values: list, fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class ChatStreamStats:
+    """Time-to-first-token of recent streamed chat answers."""
+
+    def __init__(self, window: int = TTFT_WINDOW):
+        self._lock = threading.Lock()
+        self._ttft = deque(maxlen=window)
+        self.streams = 0
+        self.errors = 0
+
+    def record(self, ttft_seconds: float = None, failed: bool = False):
+        with self._lock:
+            self.streams += 1
+            self.errors += int(failed)
+            if ttft_seconds is not None:
+                self._ttft.append(ttft_seconds)
+
+    def stats(self) -> dict:
+        with self._lock:
+            ttft = list(self._ttft)
+            return {
+                "streams": self.streams,
+                "errors": self.errors,
+                "ttft_ms_p50": round(_percentile(ttft, 0.5) * 1000, 1) if ttft else None,
+                "ttft_ms_p95": round(_percentile(ttft, 0.95) * 1000, 1) if ttft else None,
+            }
+
+
+chat_stream_stats = ChatStreamStats()
+
+
+async def stream_chat_events(chunks, started: float, stats: ChatStreamStats = chat_stream_stats, clock=time.perf_counter):
+    """
+    Forward an async iterator of answer text chunks as SSE events.
+    started is the clock() reading when the request arrived; TTFT is measured from it.
+    """
+    ttft = None
+    chars = 0
+    try:
+        async for text in chunks:
+            if not text:
+                continue
+            if ttft is None:
+                ttft = clock() - started
+            chars += len(text)
+            yield sse_event("token", {"text": text})
+    except Exception as e:
+        stats.record(ttft, failed=True)
+        yield sse_event("error", {"detail": f"Chat response error: {str(e)}"})
+        return
+
+    if not chars:
+        stats.record(None, failed=True)
+        yield sse_event("error", {"detail": "Gemini returned an empty response."})
+        return
+    stats.record(ttft)
+    yield sse_event("done", {
+        "ttft_ms": round(ttft * 1000, 1),
+        "total_ms": round((clock() - started) * 1000, 1),
+        "chars": chars,
+    })
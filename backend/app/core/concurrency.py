@@ -0,0 +1,66 @@
+import asyncio
+import functools
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Firestore, Gemini and SMTP clients are synchronous. Routes dispatch them to this
+# bounded pool so one slow call doesn't stall every other request on the worker.
+try:
+    BLOCKING_POOL_SIZE = int(os.getenv("BLOCKING_POOL_SIZE", "32"))
+except ValueError:
+    BLOCKING_POOL_SIZE = 32
+
+_executor = ThreadPoolExecutor(
+    max_workers=max(1, BLOCKING_POOL_SIZE),
+    thread_name_prefix="blocking-io",
+)
+
+
+async def run_blocking(func, *args, **kwargs):
+    """Run a synchronous call in the blocking-I/O pool and await its result."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, functools.partial(func, *args, **kwargs))
+
+
+def shutdown_blocking_pool():
+    _executor.shutdown(wait=False, cancel_futures=True)
+
+
+class RateLimiter:
+    """Token bucket shared by all sender threads: at most `rate` messages/second, bursts up to `burst`."""
+
+    def __init__(self, rate: float, burst: int = 1, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = float(self.burst)
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def _take(self) -> float:
+        """Take a token and return 0, or return how long to wait before trying again."""
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            # Tolerance so float rounding can't leave us sleeping for ~0s forever
+            if self._tokens >= 1 - 1e-9:
+                self._tokens = max(0.0, self._tokens - 1)
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+    def acquire(self):
+        if not self.rate or self.rate <= 0:
+            return
+        while wait := self._take():
+            self._sleep(wait)
+
+    async def acquire_async(self):
+        """acquire() for the event loop: waits with asyncio.sleep, so no pool thread is held."""
+        if not self.rate or self.rate <= 0:
+            return
+        while wait := self._take():
+            await asyncio.sleep(wait)
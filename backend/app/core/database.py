@@ -1,35 +1,104 @@
-import firebase_admin
-from firebase_admin import credentials, firestore
+from firebase_admin import firestore
 import os
 import json
-from dotenv import load_dotenv
+import base64
+import threading
+import time
+from app.core.firebase import get_firebase_app
 from app.core.models import ExpenseRecord
+from app.core.cache import ExpenseCache
+from app.core.rollups import build_rollups, rollup_deltas
+from app.core.category_model import CategoryModel, CategoryModelCache, build_model, model_deltas, tokens_to_prune
+from app.core.dedup import build_index, candidate_keys, find_duplicates, fingerprint, index_writes
+from app.core.migration import run_legacy_migration
+from app.core.projection import REPORT_FIELDS, project_record
+from app.core.reports import ExpenseColumns
 
-load_dotenv()
+# Firestore allows 500 writes per batch; stay under it
+BATCH_WRITE_LIMIT = 400
+FIRESTORE_BATCH_MAX_WRITES = 500
+
+# Per-user expense list cache settings (see app/core/cache.py)
+try:
+    EXPENSE_CACHE_MAX_USERS = int(os.getenv("EXPENSE_CACHE_MAX_USERS", "256"))
+    EXPENSE_CACHE_TTL_SECONDS = float(os.getenv("EXPENSE_CACHE_TTL_SECONDS", "300"))
+except ValueError:
+    EXPENSE_CACHE_MAX_USERS = 256
+    EXPENSE_CACHE_TTL_SECONDS = 300.0
+
+# Turn a rollup delta into nested Firestore Increment transforms for set(..., merge=True)
+def _as_increments(value):
+    if isinstance(value, dict):
+        return {key: _as_increments(item) for key, item in value.items()}
+    return firestore.Increment(value)
+
+# Write batch for a chunk plus a variable number of derived writes (rollups, dedup index):
+# commits every FIRESTORE_BATCH_MAX_WRITES operations and carries on in a new batch,
+# so each committed part is atomic and none exceeds the limit
+class _SplitBatch:
+    def __init__(self, client, max_writes=FIRESTORE_BATCH_MAX_WRITES):
+        self._client = client
+        self._max_writes = max_writes
+        self._batch = client.batch()
+        self._count = 0
+
+    def set(self, reference, data, merge=False):
+        self._batch.set(reference, data, merge=merge)
+        self._count += 1
+        if self._count >= self._max_writes:
+            self.commit()
+
+    def commit(self):
+        if self._count:
+            self._batch.commit()
+        self._batch = self._client.batch()
+        self._count = 0
+
+# Page cursors are opaque to the client: base64 of the last returned (date, id) pair
+def encode_cursor(date, record_id):
+    raw = json.dumps({"date": date, "id": record_id}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode("ascii"))
+        data = json.loads(raw)
+        return data["date"], data["id"]
+    except Exception:
+        raise ValueError("Invalid cursor")
 
 class Database:
-    # Initialize connection to Firebase database
-    def __init__(self):
-        if not firebase_admin._apps:
-            config_str = os.getenv('FIREBASE_CONFIG')
-            if not config_str:
-                raise ValueError("❌ Error: FIREBASE_CONFIG not found in .env")
-
-            try:
-                cred_dict = json.loads(config_str)
-                cred = credentials.Certificate(cred_dict)
-                firebase_admin.initialize_app(cred)
-                print("[INFO] Firebase initialized successfully")
-            except Exception as e:
-                print(f"[ERROR] Firebase initialization failed: {e}")
-                raise
-
-        self.db = firestore.client()
+    # Initialize connection to Firebase database (tests pass their own Firestore-like client)
+    def __init__(self, client=None):
+        if client is None:
+            get_firebase_app()
+            client = firestore.client()
+        self.db = client
+        self.expense_cache = ExpenseCache(
+            max_users=EXPENSE_CACHE_MAX_USERS,
+            ttl_seconds=EXPENSE_CACHE_TTL_SECONDS,
+        )
+        self.category_models = CategoryModelCache()
+        # Users whose duplicate-detection index is known to be built (saves a user-doc read per check)
+        self._dedup_built = set()
+        # Legacy migrations in progress in this process (a second login must not start another)
+        self._migrations_running = set()
+        self._migrations_lock = threading.Lock()
 
     # Check if user exists, if not create user document with default fields.
-    # Automatically migrates legacy user data (Google sub ID) to the new Firebase UID.
+    # Legacy user data (Google sub ID) is moved to the new Firebase UID once; afterwards the
+    # user document carries "legacy_checked" and a login costs a single document read.
+    # Returns (True, "Migration pending") when migrate_legacy_user still has to run.
     def check_user_exists(self, user_id, email, name):
         try:
+            user_ref = self.db.collection("users").document(user_id)
+            doc = user_ref.get()
+            if doc.exists and doc.to_dict().get("legacy_checked"):
+                return True, "User exists"
+            if doc.exists and doc.to_dict().get("legacy_migration"):
+                # Started but not finished: resume from the checkpoint, no need to query again
+                return True, "Migration pending"
+
             # 1. Search for legacy user document with the same email
             old_user_doc = None
             legacy_query = self.db.collection("users").where("email", "==", email).get()
@@ -38,14 +107,12 @@ class Database:
                     old_user_doc = d
                     break
             
-            user_ref = self.db.collection("users").document(user_id)
-            doc = user_ref.get()
-            
-            # If a legacy document exists, perform migration
+            # If a legacy document exists, copy its settings now and move the expenses in the background
             if old_user_doc:
                 old_id = old_user_doc.id
-                print(f"[INFO] Found legacy user document '{old_id}' for email '{email}'. Migrating data...")
+                print(f"[INFO] Found legacy user document '{old_id}' for email '{email}'. Scheduling migration...")
                 old_data = old_user_doc.to_dict()
+                migration = {"legacy_migration": {"from": old_id, "status": "pending"}}
                 
                 # Check if the new user document exists
                 if not doc.exists:
@@ -56,45 +123,21 @@ class Database:
                         "created_at": old_data.get("created_at") or firestore.SERVER_TIMESTAMP,
                         "categories": old_data.get("categories", ["Food", "Transport", "Shopping", "Bills", "Entertainment", "Other"]),
                         "currency": old_data.get("currency", "USD"),
-                        "stats_start_date": old_data.get("stats_start_date", "2026-01-01")
+                        "stats_start_date": old_data.get("stats_start_date", "2026-01-01"),
+                        **migration,
                     })
                 else:
                     # New user doc already exists, make sure settings are merged if missing in new doc
                     new_data = doc.to_dict()
-                    update_payload = {}
+                    update_payload = dict(migration)
                     if "categories" not in new_data or not new_data["categories"]:
                         update_payload["categories"] = old_data.get("categories", [])
                     if "currency" not in new_data:
                         update_payload["currency"] = old_data.get("currency", "USD")
                     if "stats_start_date" not in new_data:
                         update_payload["stats_start_date"] = old_data.get("stats_start_date", "2026-01-01")
-                    if update_payload:
-                        user_ref.update(update_payload)
-                
-                # 2. Migrate expenses subcollection
-                old_expenses_ref = self.db.collection("users").document(old_id).collection("expenses")
-                new_expenses_ref = self.db.collection("users").document(user_id).collection("expenses")
-                
-                old_expenses = old_expenses_ref.get()
-                batch = self.db.batch()
-                count = 0
-                
-                for exp_doc in old_expenses:
-                    batch.set(new_expenses_ref.document(exp_doc.id), exp_doc.to_dict())
-                    batch.delete(exp_doc.reference)
-                    count += 1
-                    if count >= 200:  # Avoid exceeding Firestore batch limit of 500
-                        batch.commit()
-                        batch = self.db.batch()
-                        count = 0
-                
-                if count > 0:
-                    batch.commit()
-                    
-                # 3. Delete the old user document
-                old_user_doc.reference.delete()
-                print(f"[INFO] Successfully migrated {email} from '{old_id}' to '{user_id}'.")
-                return True, "User migrated"
+                    user_ref.update(update_payload)
+                return True, "Migration pending"
             
             # If no legacy document exists
             if not doc.exists:
@@ -106,15 +149,123 @@ class Database:
                     "created_at": firestore.SERVER_TIMESTAMP,
                     "categories": ["Food", "Transport", "Shopping", "Bills", "Entertainment", "Other"],
                     "currency": "USD",
-                    "stats_start_date": "2026-01-01"
+                    "stats_start_date": "2026-01-01",
+                    "rollups_built": True,  # nothing to backfill for a brand-new account
+                    "dedup_built": True,
+                    "legacy_checked": True,
                 })
                 return True, "User initialized"
             
+            # Existing user from before the marker: checked now, never again
+            user_ref.update({"legacy_checked": True})
             return True, "User exists"
         except Exception as e:
             print(f"[ERROR] check_user_exists failed: {e}")
             return False, str(e)
 
+    # method to move a legacy user's expenses to their Firebase UID (run as a background job)
+    # See app/core/migration.py; an interrupted run resumes from its checkpoint when called again.
+    def migrate_legacy_user(self, user_id):
+        with self._migrations_lock:
+            if user_id in self._migrations_running:
+                return True, "Migration already running"
+            self._migrations_running.add(user_id)
+        try:
+            doc = self.db.collection("users").document(user_id).get()
+            migration = (doc.to_dict() or {}).get("legacy_migration") if doc.exists else None
+            if not migration or migration.get("status") == "completed":
+                return True, "Nothing to migrate"
+            success, result = run_legacy_migration(self, user_id, migration)
+            if not success:
+                print(f"[ERROR] migrate_legacy_user failed: {result}")
+                return False, result
+            self.db.collection("users").document(user_id).update({"legacy_checked": True})
+            print(f"[INFO] Successfully migrated {result['copied']} expenses from '{migration['from']}' to '{user_id}'.")
+            return True, result["copied"]
+        except Exception as e:
+            print(f"[ERROR] migrate_legacy_user failed: {e}")
+            return False, str(e)
+        finally:
+            with self._migrations_lock:
+                self._migrations_running.discard(user_id)
+
+    # method to checkpoint a legacy migration (the user document's "legacy_migration" map)
+    def save_legacy_migration(self, user_id, migration):
+        try:
+            # update() replaces the whole map, so fields such as a previous "error" don't linger
+            self.db.collection("users").document(user_id).update(
+                {"legacy_migration": {**migration, "updated_at": firestore.SERVER_TIMESTAMP}}
+            )
+            return True, user_id
+        except Exception as e:
+            print(f"[ERROR] save_legacy_migration failed: {e}")
+            return False, str(e)
+
+    # method to read one page of a user's expenses ordered by document ID, as (id, record) pairs
+    # With ids_only the documents are fetched without fields and record is None.
+    def read_expense_page(self, user_id, limit, start_after=None, ids_only=False):
+        try:
+            query = self.db.collection(f"users/{user_id}/expenses").order_by("__name__")
+            if ids_only:
+                query = query.select([])
+            if start_after:
+                query = query.start_after({"__name__": start_after})
+            return True, [
+                (doc.id, None if ids_only else doc.to_dict())
+                for doc in query.limit(limit).stream()
+            ]
+        except Exception as e:
+            return False, str(e)
+
+    # method to write (id, record) pairs to a user's expenses in one batch, keeping their IDs
+    def copy_expenses(self, user_id, expenses):
+        try:
+            expenses_ref = self.db.collection(f"users/{user_id}/expenses")
+            batch = self.db.batch()
+            for expense_id, record in expenses:
+                batch.set(expenses_ref.document(expense_id), record)
+            batch.commit()
+            return True, len(expenses)
+        except Exception as e:
+            return False, str(e)
+
+    # method to delete expenses by ID in one batch (no rollup/index bookkeeping)
+    def delete_expenses(self, user_id, expense_ids):
+        try:
+            expenses_ref = self.db.collection(f"users/{user_id}/expenses")
+            batch = self.db.batch()
+            for expense_id in expense_ids:
+                batch.delete(expenses_ref.document(expense_id))
+            batch.commit()
+            return True, len(expense_ids)
+        except Exception as e:
+            return False, str(e)
+
+    # method to count a user's expenses with an aggregation query (no documents are read)
+    def count_expenses(self, user_id):
+        try:
+            results = self.db.collection(f"users/{user_id}/expenses").count().get()
+            return True, int(results[0][0].value)
+        except Exception as e:
+            return False, str(e)
+
+    # method to recompute everything derived from a user's expenses after a bulk change
+    def rebuild_expense_indexes(self, user_id):
+        self.expense_cache.invalidate(user_id)
+        for rebuild in (self.rebuild_rollups, self.rebuild_dedup_index, self.rebuild_category_model):
+            success, result = rebuild(user_id)
+            if not success:
+                return False, result
+        return True, user_id
+
+    # method to delete a user document (its subcollections are not touched)
+    def delete_user_document(self, user_id):
+        try:
+            self.db.collection("users").document(user_id).delete()
+            return True, user_id
+        except Exception as e:
+            return False, str(e)
+
     # method to get user categories
     def get_user_categories(self, user_id):
         try:
@@ -135,31 +286,179 @@ class Database:
             record_to_save['created_at'] = firestore.SERVER_TIMESTAMP
             
             collection_path = f"users/{user_id}/expenses" 
-            _, doc_ref = self.db.collection(collection_path).add(record_to_save)
+            doc_ref = self.db.collection(collection_path).document()
+            # Write the record and its rollup delta atomically
+            batch = self.db.batch()
+            batch.set(doc_ref, record_to_save)
+            self._add_rollup_writes(batch, user_id, rollup_deltas(added=[data]))
+            self._add_dedup_writes(batch, user_id, index_writes(added=[(doc_ref.id, data)]))
+            batch.commit()
+            # created_at is only known server-side, so drop the cached list instead of patching it
+            self.expense_cache.invalidate(user_id)
+            self._write_category_model(user_id, model_deltas(added=[data]))
             return True, doc_ref.id
         except Exception as e:
             return False, str(e)
 
+    # method to create many user records with chunked batched writes
+    # Returns the new document IDs in input order.
+    def create_user_records(self, user_id, records):
+        try:
+            expenses_ref = self.db.collection(f"users/{user_id}/expenses")
+            # Loaded up front so the model is pruned as a bulk import grows it
+            self.get_category_model(user_id)
+            ids = []
+            for start in range(0, len(records), BATCH_WRITE_LIMIT):
+                # A chunk spanning many months has more rollup/index writes than fit with it
+                batch = _SplitBatch(self.db)
+                chunk_ids = []
+                chunk = records[start:start + BATCH_WRITE_LIMIT]
+                for data in chunk:
+                    record_to_save = data.copy()
+                    record_to_save['created_at'] = firestore.SERVER_TIMESTAMP
+                    doc_ref = expenses_ref.document()  # auto-generated ID, same as collection.add()
+                    batch.set(doc_ref, record_to_save)
+                    chunk_ids.append(doc_ref.id)
+                self._add_rollup_writes(batch, user_id, rollup_deltas(added=chunk))
+                # One index document per month, like the rollups
+                self._add_dedup_writes(batch, user_id, index_writes(added=list(zip(chunk_ids, chunk))))
+                batch.commit()
+                self._write_category_model(user_id, model_deltas(added=chunk))
+                ids.extend(chunk_ids)
+            return True, ids
+        except Exception as e:
+            # Earlier chunks may already be committed
+            return False, str(e)
+        finally:
+            self.expense_cache.invalidate(user_id)
+
+    # Build the expenses query with date/category filters pushed down to Firestore.
+    # Dates are stored as YYYY-MM-DD strings, so range filters compare correctly.
+    # Combining category with a date range needs a composite index (category, date, __name__).
+    def _expense_query(self, user_id, start_date=None, end_date=None, category=None):
+        query = self.db.collection(f"users/{user_id}/expenses")
+        if category:
+            query = query.where("category", "==", category)
+        if start_date:
+            query = query.where("date", ">=", start_date)
+        if end_date:
+            query = query.where("date", "<=", end_date)
+        return query
+
     # method to read user records
-    def read_user_record(self, user_id):
+    # The full list is served from the per-user cache when possible; filtered reads
+    # are answered from a cached list too, otherwise they go to Firestore uncached.
+    # With `fields` only those fields (plus the id) are returned; uncached reads ask
+    # Firestore for them with a select() field mask and are not cached.
+    def read_user_record(self, user_id, start_date=None, end_date=None, category=None, fields=None):
         try:
-            collection_path = f"users/{user_id}/expenses"
-            docs = self.db.collection(collection_path).stream() # docs : <class 'generator'>
+            filtered = bool(start_date or end_date or category)
+            cached = self.expense_cache.get(user_id)
+            if cached is not None:
+                if filtered:
+                    cached = [
+                        record for record in cached
+                        if (not category or record.get("category") == category)
+                        and (not start_date or (record.get("date") or "") >= start_date)
+                        and (not end_date or (record.get("date") or "") <= end_date)
+                    ]
+                if fields is not None:
+                    return True, [project_record(record, fields) for record in cached]
+                return True, cached
+
+            cache_version = self.expense_cache.version()
+            query = self._expense_query(user_id, start_date, end_date, category)
+            if fields is not None:
+                query = query.select(fields)
+            docs = query.stream() # docs : <class 'generator'>
             # Use for loop to run the generator from "stream()"
             records = []
             for doc in docs:
                 record = doc.to_dict()
                 record['id'] = doc.id # Include the Firestore document ID so that frontend can delete/update the record
                 records.append(record)
+            if not filtered and fields is None:
+                self.expense_cache.set(user_id, records, version=cache_version)
             return True, records
         except Exception as e:
             return False, str(e)
-    
+
+    # method to get expenses as report columns (see ExpenseColumns in app/core/reports.py)
+    # With a warm expense cache the columns are built once per cached list and reused by every
+    # report until the next write; otherwise only the date range is read, with the report fields.
+    def read_expense_columns(self, user_id, start_date=None, end_date=None):
+        try:
+            columns = self.expense_cache.get_derived(user_id, ExpenseColumns)
+            if columns is not None:
+                return True, columns
+            success, records = self.read_user_record(
+                user_id, start_date=start_date, end_date=end_date, fields=REPORT_FIELDS
+            )
+            if not success:
+                return False, records
+            return True, ExpenseColumns(records)
+        except Exception as e:
+            return False, str(e)
+
+    # method to read one page of user records, newest first (same order as the frontend list)
+    # Returns {"records": [...], "next_cursor": str | None}; next_cursor is None on the last page.
+    def read_user_record_page(self, user_id, limit, start_date=None, end_date=None, category=None, cursor=None, fields=None):
+        try:
+            query = (
+                self._expense_query(user_id, start_date, end_date, category)
+                .order_by("date", direction=firestore.Query.DESCENDING)
+                .order_by("__name__", direction=firestore.Query.DESCENDING)
+            )
+            if fields is not None:
+                # The cursor needs the date of the page's last record
+                query = query.select(fields if "date" in fields else [*fields, "date"])
+            if cursor:
+                try:
+                    cursor_date, cursor_id = decode_cursor(cursor)
+                except ValueError as e:
+                    return False, str(e)
+                query = query.start_after({"date": cursor_date, "__name__": cursor_id})
+
+            # Fetch one extra document to know whether another page exists
+            docs = list(query.limit(limit + 1).stream())
+            records = []
+            for doc in docs[:limit]:
+                record = doc.to_dict()
+                record['id'] = doc.id
+                records.append(record)
+
+            next_cursor = None
+            if len(docs) > limit and records:
+                last = records[-1]
+                next_cursor = encode_cursor(last.get("date"), last["id"])
+            if fields is not None and "date" not in fields:
+                records = [project_record(record, fields) for record in records]
+            return True, {"records": records, "next_cursor": next_cursor}
+        except Exception as e:
+            return False, str(e)
+
     # method to update user record
     def update_user_record(self, user_id, record_id, data):
         try:
             collection_path = f"users/{user_id}/expenses"
-            self.db.collection(collection_path).document(record_id).update(data)
+            doc_ref = self.db.collection(collection_path).document(record_id)
+            old_doc = doc_ref.get()
+            if not old_doc.exists:
+                return False, "Record not found"
+            old_record = old_doc.to_dict()
+            batch = self.db.batch()
+            batch.update(doc_ref, data)
+            self._add_rollup_writes(
+                batch, user_id, rollup_deltas(added=[{**old_record, **data}], removed=[old_record])
+            )
+            if fingerprint({**old_record, **data}) != fingerprint(old_record):
+                self._add_dedup_writes(batch, user_id, index_writes(
+                    added=[(record_id, {**old_record, **data})], removed=[(record_id, old_record)]
+                ))
+            batch.commit()
+            self.expense_cache.update_record(user_id, record_id, data)
+            # A category correction moves the item's counts to the new category
+            self._write_category_model(user_id, model_deltas(added=[{**old_record, **data}], removed=[old_record]))
             return True, "Record updated successfully"
         except Exception as e:
             return False, str(e)
@@ -168,11 +467,226 @@ class Database:
     def delete_user_record(self, user_id, record_id):
         try:
             collection_path = f"users/{user_id}/expenses"
-            self.db.collection(collection_path).document(record_id).delete()
+            doc_ref = self.db.collection(collection_path).document(record_id)
+            old_doc = doc_ref.get()
+            batch = self.db.batch()
+            batch.delete(doc_ref)
+            category_deltas = {"categories": {}, "tokens": {}}
+            if old_doc.exists:
+                old_record = old_doc.to_dict()
+                self._add_rollup_writes(batch, user_id, rollup_deltas(removed=[old_record]))
+                category_deltas = model_deltas(removed=[old_record])
+                self._add_dedup_writes(batch, user_id, index_writes(removed=[(record_id, old_record)]))
+            batch.commit()
+            self.expense_cache.remove_record(user_id, record_id)
+            self._write_category_model(user_id, category_deltas)
             return True, "Record deleted successfully"
         except Exception as e:
             return False, str(e)
 
+    def _rollups_ref(self, user_id):
+        return self.db.collection("users").document(user_id).collection("rollups")
+
+    # Queue signed rollup increments (see app/core/rollups.py) on a write batch
+    def _add_rollup_writes(self, batch, user_id, deltas):
+        rollups_ref = self._rollups_ref(user_id)
+        for period, currencies in deltas.items():
+            batch.set(
+                rollups_ref.document(period),
+                {"period": period, "currencies": _as_increments(currencies)},
+                merge=True,
+            )
+
+    def _dedup_ref(self, user_id):
+        return self.db.collection("users").document(user_id).collection("dedup")
+
+    # Queue duplicate-index changes (see app/core/dedup.py) on a write batch
+    def _add_dedup_writes(self, batch, user_id, writes):
+        dedup_ref = self._dedup_ref(user_id)
+        for period, buckets in writes.items():
+            batch.set(
+                dedup_ref.document(period),
+                {"buckets": {
+                    key: {
+                        expense_id: firestore.DELETE_FIELD if item is None else item
+                        for expense_id, item in entries.items()
+                    }
+                    for key, entries in buckets.items()
+                }},
+                merge=True,
+            )
+
+    # method to find possible duplicates of expenses about to be saved
+    # Reads only the index documents for the records' months (usually one), never the expenses.
+    # Returns one list of hints per record; see find_duplicates for their shape.
+    def find_possible_duplicates(self, user_id, records):
+        try:
+            if user_id not in self._dedup_built:
+                user_doc = self.db.collection("users").document(user_id).get()
+                if not (user_doc.exists and user_doc.to_dict().get("dedup_built")):
+                    success, result = self.rebuild_dedup_index(user_id)
+                    if not success:
+                        return False, result
+                self._dedup_built.add(user_id)
+            periods = sorted({period for record in records for period, _ in candidate_keys(record)})
+            dedup_ref = self._dedup_ref(user_id)
+            docs = self.db.get_all([dedup_ref.document(period) for period in periods]) if periods else []
+            buckets_by_period = {doc.id: doc.to_dict().get("buckets", {}) for doc in docs if doc.exists}
+            return True, find_duplicates(records, buckets_by_period)
+        except Exception as e:
+            return False, str(e)
+
+    # method to recompute the duplicate-detection index from the user's expenses
+    def rebuild_dedup_index(self, user_id):
+        try:
+            expenses = (
+                (doc.id, doc.to_dict())
+                for doc in self.db.collection(f"users/{user_id}/expenses")
+                .select(["item", "amount", "currency", "date"])
+                .stream()
+            )
+            index = build_index(expenses)
+
+            dedup_ref = self._dedup_ref(user_id)
+            stale = [ref for ref in dedup_ref.list_documents() if ref.id not in index]
+            batch = self.db.batch()
+            count = 0
+            writes = [(ref, None) for ref in stale] + [(dedup_ref.document(period), doc) for period, doc in index.items()]
+            for ref, doc in writes:
+                if doc is None:
+                    batch.delete(ref)
+                else:
+                    batch.set(ref, doc)
+                count += 1
+                if count >= BATCH_WRITE_LIMIT:
+                    batch.commit()
+                    batch = self.db.batch()
+                    count = 0
+            if count > 0:
+                batch.commit()
+            self.db.collection("users").document(user_id).set({"dedup_built": True}, merge=True)
+            self._dedup_built.add(user_id)
+            return True, len(index)
+        except Exception as e:
+            print(f"[ERROR] rebuild_dedup_index failed: {e}")
+            return False, str(e)
+
+    def _category_model_ref(self, user_id):
+        return self.db.collection("users").document(user_id).collection("models").document("category")
+
+    # Write the category model's count increments (see app/core/category_model.py) once the
+    # expense write has committed. The model is only a hint for categorising, so a failure is
+    # logged rather than failing the expense; rebuild_category_model repairs any drift.
+    def _write_category_model(self, user_id, deltas):
+        if not deltas["categories"] and not deltas["tokens"]:
+            return
+        try:
+            self._category_model_ref(user_id).set(
+                {"categories": _as_increments(deltas["categories"]), "tokens": _as_increments(deltas["tokens"])},
+                merge=True,
+            )
+        except Exception as e:
+            print(f"[WARN] Category model update failed for {user_id}: {e}")
+            return
+        self.category_models.apply(user_id, deltas)
+        model = self.category_models.get(user_id)
+        if model is not None:
+            self._prune_category_model(user_id, model)
+
+    # Drop the least-seen tokens once the model outgrows CATEGORY_MODEL_MAX_TOKENS
+    def _prune_category_model(self, user_id, model):
+        keys = tokens_to_prune(model.tokens)
+        if not keys:
+            return
+        try:
+            self._category_model_ref(user_id).set(
+                {"tokens": {key: firestore.DELETE_FIELD for key in keys}}, merge=True
+            )
+            model.prune(keys)
+        except Exception as e:
+            print(f"[WARN] Category model prune failed for {user_id}: {e}")
+
+    # method to get the user's category model; loaded on first use, backfilled from history once
+    def get_category_model(self, user_id):
+        try:
+            model = self.category_models.get(user_id)
+            if model is not None:
+                return True, model
+            doc = self._category_model_ref(user_id).get()
+            if doc.exists and doc.to_dict().get("built"):
+                model = CategoryModel(doc.to_dict())
+                self._prune_category_model(user_id, model)
+                self.category_models.set(user_id, model)
+                return True, model
+            return self.rebuild_category_model(user_id)
+        except Exception as e:
+            return False, str(e)
+
+    # method to recompute the category model from the user's expenses
+    def rebuild_category_model(self, user_id):
+        try:
+            expenses = (
+                doc.to_dict()
+                for doc in self.db.collection(f"users/{user_id}/expenses").select(["item", "category"]).stream()
+            )
+            data = build_model(expenses)
+            self._category_model_ref(user_id).set(data)
+            model = CategoryModel(data)
+            self.category_models.set(user_id, model)
+            return True, model
+        except Exception as e:
+            return False, str(e)
+
+    # method to read monthly rollups between two YYYY-MM periods (inclusive)
+    def read_rollups(self, user_id, start_period, end_period):
+        try:
+            docs = (
+                self._rollups_ref(user_id)
+                .where("period", ">=", start_period)
+                .where("period", "<=", end_period)
+                .stream()
+            )
+            return True, [doc.to_dict() for doc in docs]
+        except Exception as e:
+            return False, str(e)
+
+    # method to recompute rollups from raw expenses, repairing any drift
+    def rebuild_rollups(self, user_id):
+        try:
+            expenses = (
+                doc.to_dict()
+                for doc in self.db.collection(f"users/{user_id}/expenses").stream()
+            )
+            rollups = build_rollups(expenses)
+
+            rollups_ref = self._rollups_ref(user_id)
+            stale = [doc.reference for doc in rollups_ref.stream() if doc.id not in rollups]
+
+            batch = self.db.batch()
+            count = 0
+            for ref in stale:
+                batch.delete(ref)
+                count += 1
+                if count >= BATCH_WRITE_LIMIT:
+                    batch.commit()
+                    batch = self.db.batch()
+                    count = 0
+            for period, rollup in rollups.items():
+                # Full overwrite (no merge) so stale category/day keys disappear
+                batch.set(rollups_ref.document(period), rollup)
+                count += 1
+                if count >= BATCH_WRITE_LIMIT:
+                    batch.commit()
+                    batch = self.db.batch()
+                    count = 0
+            if count > 0:
+                batch.commit()
+            self.db.collection("users").document(user_id).set({"rollups_built": True}, merge=True)
+            return True, len(rollups)
+        except Exception as e:
+            print(f"[ERROR] rebuild_rollups failed: {e}")
+            return False, str(e)
+
     # method to get user info
     def get_user_info(self, user_id):
         try:
@@ -218,7 +732,191 @@ class Database:
         except Exception as e:
             return False, str(e)
 
-db_client = Database()
+    # method to get a saved weekly report (None if it doesn't exist yet)
+    def get_weekly_report(self, user_id, week_start):
+        try:
+            doc = (
+                self.db.collection("users")
+                .document(user_id)
+                .collection("weekly_reports")
+                .document(week_start)
+                .get()
+            )
+            return True, doc.to_dict() if doc.exists else None
+        except Exception as e:
+            return False, str(e)
+
+    # method to record the email delivery result on a saved weekly report
+    def mark_weekly_report_email(self, user_id, week_start, status, detail=""):
+        try:
+            report_ref = (
+                self.db.collection("users")
+                .document(user_id)
+                .collection("weekly_reports")
+                .document(week_start)
+            )
+            report_ref.set({
+                "email_status": status,
+                "email_detail": detail,
+                "email_updated_at": firestore.SERVER_TIMESTAMP,
+            }, merge=True)
+            return True, week_start
+        except Exception as e:
+            return False, str(e)
+
+    # method to claim a user's weekly report email before sending it, so two senders can't both
+    # send it. Returns (True, "claimed"), or (True, "sent") / (True, "sending") when it is already
+    # delivered or another sender claimed it less than claim_seconds ago.
+    def claim_weekly_report_email(self, user_id, week_start, claim_seconds):
+        try:
+            report_ref = (
+                self.db.collection("users")
+                .document(user_id)
+                .collection("weekly_reports")
+                .document(week_start)
+            )
+
+            @firestore.transactional
+            def claim(transaction):
+                snapshot = report_ref.get(transaction=transaction)
+                report = snapshot.to_dict() if snapshot.exists else {}
+                now = time.time()
+                status = report.get("email_status")
+                if status == "sent":
+                    return "sent"
+                if status == "sending" and report.get("email_claimed_at", 0) > now - claim_seconds:
+                    return "sending"
+                transaction.set(report_ref, {"email_status": "sending", "email_claimed_at": now}, merge=True)
+                return "claimed"
+
+            return True, claim(self.db.transaction())
+        except Exception as e:
+            return False, str(e)
+
+    # method to list one page of users subscribed to the weekly report, ordered by ID
+    def list_subscribed_users(self, limit, start_after=None):
+        try:
+            query = (
+                self.db.collection("users")
+                .where("weekly_report_subscribed", "==", True)
+                .order_by("__name__")
+            )
+            if start_after:
+                query = query.start_after({"__name__": start_after})
+            users = []
+            for doc in query.limit(limit).stream():
+                user = doc.to_dict()
+                user["id"] = doc.id
+                users.append(user)
+            return True, users
+        except Exception as e:
+            return False, str(e)
+
+    # method to get the checkpoint of a scheduled weekly report run (None if not started)
+    def get_report_run(self, run_id):
+        try:
+            doc = self.db.collection("report_runs").document(run_id).get()
+            return True, doc.to_dict() if doc.exists else None
+        except Exception as e:
+            return False, str(e)
+
+    # method to take the lease on a scheduled weekly report run, so overlapping invocations
+    # (a scheduler retry, a CLI run) don't work through the same users at once.
+    # Returns (True, run) with the lease held by `owner` (run is {} for a new run),
+    # or (True, None) while another invocation's lease is still live.
+    def acquire_report_run_lease(self, run_id, owner, lease_seconds):
+        try:
+            run_ref = self.db.collection("report_runs").document(run_id)
+
+            @firestore.transactional
+            def acquire(transaction):
+                snapshot = run_ref.get(transaction=transaction)
+                run = snapshot.to_dict() if snapshot.exists else {}
+                now = time.time()
+                if run.get("lease_owner") not in (None, owner) and run.get("lease_expires_at", 0) > now:
+                    return None
+                lease = {"lease_owner": owner, "lease_expires_at": now + lease_seconds}
+                transaction.set(run_ref, lease, merge=True)
+                return {**run, **lease}
+
+            return True, acquire(self.db.transaction())
+        except Exception as e:
+            return False, str(e)
+
+    # method to checkpoint a scheduled weekly report run
+    # With a lease (run["lease_owner"]), the write only happens while that owner still holds it,
+    # and the lease is extended by lease_seconds (0 releases it).
+    def save_report_run(self, run_id, run, lease_seconds=None):
+        try:
+            run_ref = self.db.collection("report_runs").document(run_id)
+            if not run.get("lease_owner"):
+                run_ref.set({**run, "updated_at": firestore.SERVER_TIMESTAMP}, merge=True)
+                return True, run_id
+
+            @firestore.transactional
+            def checkpoint(transaction):
+                snapshot = run_ref.get(transaction=transaction)
+                if snapshot.exists and snapshot.to_dict().get("lease_owner") != run["lease_owner"]:
+                    return False
+                data = {**run, "updated_at": firestore.SERVER_TIMESTAMP}
+                if lease_seconds is not None:
+                    data["lease_expires_at"] = time.time() + lease_seconds
+                transaction.set(run_ref, data, merge=True)
+                return True
+
+            if not checkpoint(self.db.transaction()):
+                return False, "Lease lost"
+            return True, run_id
+        except Exception as e:
+            print(f"[ERROR] save_report_run failed: {e}")
+            return False, str(e)
+
+    # method to save bulk import progress
+    def save_import_job(self, user_id, job_id, job):
+        try:
+            job_ref = (
+                self.db.collection("users")
+                .document(user_id)
+                .collection("imports")
+                .document(job_id)
+            )
+            job_ref.set({**job, "updated_at": firestore.SERVER_TIMESTAMP}, merge=True)
+            return True, job_id
+        except Exception as e:
+            print(f"[ERROR] save_import_job failed: {e}")
+            return False, str(e)
+
+    # method to get bulk import progress
+    def get_import_job(self, user_id, job_id):
+        try:
+            doc = (
+                self.db.collection("users")
+                .document(user_id)
+                .collection("imports")
+                .document(job_id)
+                .get()
+            )
+            if doc.exists:
+                return True, doc.to_dict()
+            return False, "Import job not found"
+        except Exception as e:
+            return False, str(e)
+
+_db_client = None
+_db_client_lock = threading.Lock()
+
+
+def get_db_client(create: bool = True):
+    """
+    Process-wide Database, created on first use so importing this module connects to nothing.
+    With create=False, returns None if it hasn't been created yet.
+    """
+    global _db_client
+    if _db_client is None and create:
+        with _db_client_lock:
+            if _db_client is None:
+                _db_client = Database()
+    return _db_client
 
 # # 以下為測試代碼（很久以前了...)
 # if __name__ == "__main__":
@@ -0,0 +1,123 @@
+import os
+from datetime import date, timedelta
+from difflib import SequenceMatcher
+from app.core.categorizer import normalize_text
+from app.core.rollups import DEFAULT_CURRENCY_KEY, period_of
+
+# Duplicate-detection index, one document per month: users/{uid}/dedup/{YYYY-MM}
+# {
+#   "buckets": {
+#     "2026-08-19|15000|TWD": {"<expense id>": "starbucks latte", ...},   # date|amount in cents|currency
+#   },
+# }
+# A new expense is checked against the buckets for its date and the day either side
+# (at most two month documents), then against the item names in those buckets, so the
+# check never scans the expenses collection.
+
+try:
+    DEDUP_WINDOW_DAYS = int(os.getenv("DEDUP_WINDOW_DAYS", "1"))
+    DEDUP_ITEM_SIMILARITY = float(os.getenv("DEDUP_ITEM_SIMILARITY", "0.8"))
+except ValueError:
+    DEDUP_WINDOW_DAYS = 1
+    DEDUP_ITEM_SIMILARITY = 0.8
+
+
+def bucket_key(date_str: str, cents: int, currency: str) -> str:
+    return f"{date_str}|{cents}|{currency}"
+
+
+def fingerprint(record: dict):
+    """(date, bucket key, normalized item) or None for records that can't be indexed."""
+    try:
+        expense_date = date.fromisoformat(record["date"])
+        cents = round(float(record["amount"]) * 100)
+    except (KeyError, ValueError, TypeError):
+        return None
+    currency = (record.get("currency") or "").upper() or DEFAULT_CURRENCY_KEY
+    return expense_date, bucket_key(expense_date.isoformat(), cents, currency), normalize_text(record.get("item"))
+
+
+def candidate_keys(record: dict, window_days: int = DEDUP_WINDOW_DAYS) -> list[tuple[str, str]]:
+    """(period, bucket key) for every day in the fuzzy window around the record's date."""
+    parts = fingerprint(record)
+    if parts is None:
+        return []
+    expense_date, key, _ = parts
+    _, cents, currency = key.split("|")
+    keys = []
+    for offset in range(-window_days, window_days + 1):
+        day = (expense_date + timedelta(days=offset)).isoformat()
+        keys.append((period_of(day), bucket_key(day, int(cents), currency)))
+    return keys
+
+
+def similar_items(a: str, b: str, threshold: float = DEDUP_ITEM_SIMILARITY) -> bool:
+    # An empty item only matches another empty item: amount + date alone is too weak
+    if a == b:
+        return True
+    if not a or not b:
+        return False
+    return SequenceMatcher(None, a, b).ratio() >= threshold
+
+
+def index_writes(added: list = (), removed: list = ()) -> dict:
+    """
+    {period: {bucket key: {expense id: normalized item, or None to remove}}} for
+    (expense id, record) pairs being added and/or removed.
+    """
+    writes = {}
+    for pairs, adding in ((removed, False), (added, True)):
+        for expense_id, record in pairs:
+            parts = fingerprint(record)
+            if parts is None:
+                continue
+            expense_date, key, item = parts
+            bucket = writes.setdefault(period_of(expense_date.isoformat()), {}).setdefault(key, {})
+            bucket[expense_id] = item if adding else None
+    return writes
+
+
+def build_index(expenses) -> dict:
+    """Index documents for (expense id, record) pairs: {period: {"buckets": ...}}."""
+    return {
+        period: {"buckets": buckets}
+        for period, buckets in index_writes(added=list(expenses)).items()
+    }
+
+
+def _hint(key: str, item: str, **ref) -> dict:
+    day, cents, currency = key.split("|")
+    return {
+        **ref,
+        "item": item,
+        "date": day,
+        "amount": int(cents) / 100,
+        "currency": None if currency == DEFAULT_CURRENCY_KEY else currency,
+    }
+
+
+def find_duplicates(records: list[dict], buckets_by_period: dict, window_days: int = DEDUP_WINDOW_DAYS) -> list[list[dict]]:
+    """
+    Possible duplicates for each record, in input order: stored expenses from the index
+    ({"id": ...}) and earlier records of the same list ({"index": ...}).
+    buckets_by_period is {period: buckets} for the periods in the records' candidate keys.
+    """
+    hints = []
+    seen = {}  # bucket key -> [(index, item)] for records earlier in the list
+    for index, record in enumerate(records):
+        parts = fingerprint(record)
+        if parts is None:
+            hints.append([])
+            continue
+        _, own_key, item = parts
+        matches = []
+        for period, key in candidate_keys(record, window_days):
+            for expense_id, stored_item in (buckets_by_period.get(period, {}).get(key) or {}).items():
+                if stored_item is not None and similar_items(item, stored_item):
+                    matches.append(_hint(key, stored_item, id=expense_id))
+            for earlier, earlier_item in seen.get(key, []):
+                if similar_items(item, earlier_item):
+                    matches.append(_hint(key, earlier_item, index=earlier))
+        seen.setdefault(own_key, []).append((index, item))
+        hints.append(matches)
+    return hints
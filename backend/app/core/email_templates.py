@@ -0,0 +1,94 @@
+import hashlib
+import json
+import os
+import threading
+from app.core.cache import RenderCache
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "templates", "email")
+WEEKLY_REPORT_TEMPLATES = ("weekly_report.html", "weekly_report.txt", "_category_table.html", "_insights.html")
+
+try:
+    EMAIL_RENDER_CACHE_SIZE = int(os.getenv("EMAIL_RENDER_CACHE_SIZE", "1024"))
+except ValueError:
+    EMAIL_RENDER_CACHE_SIZE = 1024
+
+render_cache = RenderCache(max_entries=EMAIL_RENDER_CACHE_SIZE)
+
+_environment = None
+_environment_lock = threading.Lock()
+
+
+def get_environment():
+    """
+    Jinja environment shared by the process. Templates are compiled once here
+    (auto_reload is off, so they are never re-read from disk afterwards).
+    """
+    global _environment
+    with _environment_lock:
+        if _environment is None:
+            # pyrefly: ignore [missing-import]
+            from jinja2 import Environment, FileSystemLoader, select_autoescape
+
+            environment = Environment(
+                loader=FileSystemLoader(TEMPLATE_DIR),
+                # Item names are user input; escape them in HTML, not in the plain-text part
+                autoescape=select_autoescape(["html"]),
+                auto_reload=False,
+                keep_trailing_newline=True,
+                cache_size=-1,
+            )
+            for name in WEEKLY_REPORT_TEMPLATES:
+                environment.get_template(name)
+            _environment = environment
+        return _environment
+
+
+def report_hash(report: dict) -> str:
+    """Stable content hash: key order and Firestore timestamp types don't matter."""
+    payload = json.dumps(report, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def weekly_report_context(report: dict) -> dict:
+    """Values the weekly report templates display, derived from a saved report."""
+    change_amount = report.get("change_amount", 0.0)
+    change_percent = report.get("change_percent")
+    if change_amount > 0:
+        change_sign, change_color = "+", "#e76e55"  # red for increase (negative in budgeting context)
+    elif change_amount < 0:
+        change_sign, change_color = "-", "#92cc41"  # green for decrease (savings/success)
+    else:
+        change_sign, change_color = "", "#212529"
+
+    return {
+        "week_start": report.get("week_start", ""),
+        "week_end": report.get("week_end", ""),
+        "currency": report.get("currency", "USD"),
+        "expense_count": report.get("expense_count", 0),
+        "total": report.get("total", 0.0),
+        "previous_week_total": report.get("previous_week_total", 0.0),
+        "abs_change_amount": abs(change_amount),
+        "change_sign": change_sign,
+        "change_color": change_color,
+        "change_percent_str": "N/A" if change_percent is None else f"{abs(change_percent)}%",
+        "category_totals": report.get("category_totals") or [],
+        "largest_expense": report.get("largest_expense"),
+        "top_spending_day": report.get("top_spending_day"),
+    }
+
+
+def render_weekly_report(report: dict) -> tuple[str, str]:
+    """Returns (plain_text, html) for a weekly report, from the render cache when possible."""
+    key = report_hash(report)
+    rendered = render_cache.get(key)
+    if rendered is not None:
+        return rendered
+
+    environment = get_environment()
+    context = weekly_report_context(report)
+    rendered = (
+        environment.get_template("weekly_report.txt").render(context),
+        environment.get_template("weekly_report.html").render(context),
+    )
+    render_cache.set(key, rendered)
+    return rendered
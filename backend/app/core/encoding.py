@@ -0,0 +1,113 @@
+import gzip
+import json
+import os
+import threading
+from datetime import date, datetime
+
+# Response encodings for expense history downloads (GET /expense).
+# The format is chosen with ?format=json|msgpack or the Accept header (application/msgpack);
+# the body is gzipped when the client sends Accept-Encoding: gzip and it is worth compressing.
+# Combined with layout=columns (app/core/projection.py) this replaces one JSON object per row.
+RESPONSE_FORMATS = {
+    "json": "application/json",
+    "msgpack": "application/msgpack",
+}
+MSGPACK_MEDIA_TYPES = ("application/msgpack", "application/x-msgpack", "application/vnd.msgpack")
+
+try:
+    RESPONSE_GZIP_MIN_BYTES = int(os.getenv("RESPONSE_GZIP_MIN_BYTES", "1024"))
+    RESPONSE_GZIP_LEVEL = int(os.getenv("RESPONSE_GZIP_LEVEL", "6"))
+except ValueError:
+    RESPONSE_GZIP_MIN_BYTES = 1024
+    RESPONSE_GZIP_LEVEL = 6
+
+
+class ResponseEncodingStats:
+    """Responses per format, and encoded vs sent bytes (after compression)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.responses = {name: 0 for name in RESPONSE_FORMATS}
+        self.gzipped = 0
+        self.bytes_encoded = 0
+        self.bytes_sent = 0
+
+    def record(self, response_format: str, encoded: int, sent: int, gzipped: bool):
+        with self._lock:
+            self.responses[response_format] += 1
+            self.gzipped += int(gzipped)
+            self.bytes_encoded += encoded
+            self.bytes_sent += sent
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "responses": dict(self.responses),
+                "gzipped": self.gzipped,
+                "bytes_encoded": self.bytes_encoded,
+                "bytes_sent": self.bytes_sent,
+            }
+
+
+response_encoding_stats = ResponseEncodingStats()
+
+
+def negotiate_format(format_param: str | None, accept: str | None):
+    """(True, format) from the query parameter, else the Accept header; (False, error) if unknown."""
+    if format_param:
+        if format_param not in RESPONSE_FORMATS:
+            return False, f"format must be one of: {', '.join(RESPONSE_FORMATS)}."
+        return True, format_param
+    media_types = [part.split(";")[0].strip().lower() for part in (accept or "").split(",")]
+    if any(media_type in MSGPACK_MEDIA_TYPES for media_type in media_types):
+        return True, "msgpack"
+    return True, "json"
+
+
+def accepts_gzip(accept_encoding: str | None) -> bool:
+    """Whether Accept-Encoding allows gzip (gzip or *, with a non-zero q-value)."""
+    for part in (accept_encoding or "").split(","):
+        coding, *params = part.split(";")
+        if coding.strip().lower() not in ("gzip", "*"):
+            continue
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        return quality > 0
+    return False
+
+
+# Firestore timestamps (created_at) go out as ISO strings, like FastAPI's JSON encoder
+def _plain(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not serializable")
+
+
+def encode_body(payload, response_format: str) -> bytes:
+    if response_format == "msgpack":
+        import msgpack  # loaded on first use; app.main preloads it at startup
+
+        return msgpack.packb(payload, default=_plain, use_bin_type=True)
+    return json.dumps(payload, default=_plain, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def encode_response(payload, response_format: str, gzip_ok: bool):
+    """
+    Encode (and maybe gzip) a payload: returns (body, media type, extra headers).
+    CPU-bound on large histories; call it through run_blocking.
+    """
+    body = encode_body(payload, response_format)
+    encoded = len(body)
+    headers = {"Vary": "Accept, Accept-Encoding"}
+    gzipped = gzip_ok and encoded >= RESPONSE_GZIP_MIN_BYTES
+    if gzipped:
+        body = gzip.compress(body, compresslevel=RESPONSE_GZIP_LEVEL)
+        headers["Content-Encoding"] = "gzip"
+    response_encoding_stats.record(response_format, encoded, len(body), gzipped)
+    return body, RESPONSE_FORMATS[response_format], headers
@@ -0,0 +1,32 @@
+import json
+import os
+import threading
+import firebase_admin
+from firebase_admin import credentials
+
+_init_lock = threading.Lock()
+
+
+def get_firebase_app():
+    """
+    The default Firebase app, initialized from FIREBASE_CONFIG on first use.
+    Shared by the Firestore client (database.py) and ID-token verification (auth.py);
+    nothing is initialized at import time.
+    """
+    if firebase_admin._apps:
+        return firebase_admin.get_app()
+    with _init_lock:
+        if not firebase_admin._apps:
+            config_str = os.getenv('FIREBASE_CONFIG')
+            if not config_str:
+                raise ValueError("❌ Error: FIREBASE_CONFIG not found in .env")
+
+            try:
+                cred_dict = json.loads(config_str)
+                cred = credentials.Certificate(cred_dict)
+                firebase_admin.initialize_app(cred)
+                print("[INFO] Firebase initialized successfully")
+            except Exception as e:
+                print(f"[ERROR] Firebase initialization failed: {e}")
+                raise
+        return firebase_admin.get_app()
@@ -0,0 +1,57 @@
+import asyncio
+import os
+from app.core.concurrency import RateLimiter, run_blocking
+
+# POST /parse_expense_images: many receipts per request, parsed concurrently.
+# Concurrency is per request; the rate limit is shared by every request in the process
+# because it protects the Gemini quota, not the request.
+# IMAGE_BATCH_MAX_BYTES caps the whole request body on its own; it is not derived from the
+# per-file limit, since 30 files at the full per-file size would allow a ~600 MB request.
+try:
+    IMAGE_BATCH_MAX_FILES = int(os.getenv("IMAGE_BATCH_MAX_FILES", "30"))
+    IMAGE_BATCH_MAX_BYTES = int(os.getenv("IMAGE_BATCH_MAX_BYTES", str(50 * 1024 * 1024)))
+    IMAGE_BATCH_CONCURRENCY = int(os.getenv("IMAGE_BATCH_CONCURRENCY", "4"))
+    GEMINI_IMAGE_RATE_PER_SECOND = float(os.getenv("GEMINI_IMAGE_RATE_PER_SECOND", "4"))
+except ValueError:
+    IMAGE_BATCH_MAX_FILES = 30
+    IMAGE_BATCH_MAX_BYTES = 50 * 1024 * 1024
+    IMAGE_BATCH_CONCURRENCY = 4
+    GEMINI_IMAGE_RATE_PER_SECOND = 4.0
+
+gemini_image_limiter = RateLimiter(GEMINI_IMAGE_RATE_PER_SECOND, burst=max(1, IMAGE_BATCH_CONCURRENCY))
+
+
+async def parse_images_as_completed(
+    images: list, parse_one, concurrency: int = IMAGE_BATCH_CONCURRENCY, read=None, limiter: RateLimiter = None
+):
+    """
+    Run parse_one(image) -> (success, data) for every image in the blocking pool, at most
+    `concurrency` at a time, and yield (index, success, data) in completion order.
+    With `read`, an async read(image) -> (success, data) runs first inside the same slot and
+    parse_one gets its data, so only `concurrency` uploads are held in memory at once.
+    With `limiter`, each image waits for a token on the event loop before parse_one is
+    dispatched, so a throttled batch doesn't hold blocking-pool threads while it waits.
+    An exception in one image becomes (index, False, message); the others keep going.
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def run(index, image):
+        async with semaphore:
+            try:
+                success, data = await read(image) if read is not None else (True, image)
+                if success:
+                    if limiter is not None:
+                        await limiter.acquire_async()
+                    success, data = await run_blocking(parse_one, data)
+            except Exception as e:
+                success, data = False, str(e)
+        return index, success, data
+
+    tasks = [asyncio.ensure_future(run(index, image)) for index, image in enumerate(images)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        # Client went away: don't start the images that are still queued
+        for task in tasks:
+            task.cancel()
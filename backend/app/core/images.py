@@ -0,0 +1,111 @@
+import io
+import os
+import threading
+import time
+
+# Receipt photos are pre-processed before they go to Gemini: EXIF (GPS, device) is
+# dropped, the image is rotated upright, downscaled and re-encoded as JPEG.
+# A 12 MP phone photo (5-12 MB) typically ends up at 150-400 KB.
+try:
+    IMAGE_MAX_UPLOAD_BYTES = int(os.getenv("IMAGE_MAX_UPLOAD_BYTES", str(20 * 1024 * 1024)))
+    # Long edge in pixels; receipt text stays legible to the model at this size
+    IMAGE_MAX_DIMENSION = int(os.getenv("IMAGE_MAX_DIMENSION", "1600"))
+    IMAGE_JPEG_QUALITY = int(os.getenv("IMAGE_JPEG_QUALITY", "85"))
+except ValueError:
+    IMAGE_MAX_UPLOAD_BYTES = 20 * 1024 * 1024
+    IMAGE_MAX_DIMENSION = 1600
+    IMAGE_JPEG_QUALITY = 85
+
+# Refuse to decode anything bigger (decompression bombs)
+IMAGE_MAX_PIXELS = 60_000_000
+# Formats Gemini accepts that Pillow can't decode here; these are sent as uploaded
+PASSTHROUGH_TYPES = {"image/heic", "image/heif"}
+
+
+class ImageStats:
+    """Bytes received vs bytes sent to Gemini, and time spent pre-processing."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.images = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.seconds = 0.0
+
+    def record(self, bytes_in: int, bytes_out: int, seconds: float):
+        with self._lock:
+            self.images += 1
+            self.bytes_in += bytes_in
+            self.bytes_out += bytes_out
+            self.seconds += seconds
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "images": self.images,
+                "bytes_in": self.bytes_in,
+                "bytes_out": self.bytes_out,
+                "avg_ms": round(self.seconds / self.images * 1000, 1) if self.images else 0.0,
+            }
+
+
+image_stats = ImageStats()
+
+
+def _flatten(image):
+    from PIL import Image
+
+    # JPEG has no alpha; paste transparent images onto white like a printed receipt
+    if image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info):
+        image = image.convert("RGBA")
+        background = Image.new("RGB", image.size, "white")
+        background.paste(image, mask=image.getchannel("A"))
+        return background
+    if image.mode not in ("RGB", "L"):
+        return image.convert("RGB")
+    return image
+
+
+def preprocess_image(
+    image_bytes: bytes,
+    content_type: str = "image/jpeg",
+    max_dimension: int = IMAGE_MAX_DIMENSION,
+    quality: int = IMAGE_JPEG_QUALITY,
+):
+    """
+    Returns (True, (jpeg_bytes, "image/jpeg")) or (False, error message).
+    CPU-bound: call it through run_blocking.
+    """
+    # Pillow is loaded on first use; app.main preloads it at startup
+    from PIL import Image, ImageOps, UnidentifiedImageError
+
+    started = time.perf_counter()
+    try:
+        image = Image.open(io.BytesIO(image_bytes))
+        width, height = image.size
+        if width * height > IMAGE_MAX_PIXELS:
+            return False, "Image resolution is too large."
+        if image.mode not in ("RGB", "L", "CMYK", "YCbCr"):
+            # Palette/alpha images would be resized with nearest-neighbour; flatten them first
+            image = _flatten(image)
+        # Downscale before anything else touches the pixels. JPEG decodes straight at
+        # 1/2, 1/4 or 1/8 scale (draft mode), much cheaper than a full decode + resize.
+        scale = min(1.0, max_dimension / max(width, height))
+        image.draft("RGB", (round(width * scale), round(height * scale)))
+        image.thumbnail((max_dimension, max_dimension), Image.Resampling.LANCZOS)
+        image = ImageOps.exif_transpose(image)
+        image = _flatten(image)
+
+        output = io.BytesIO()
+        # No exif= argument, so none of the original metadata is written
+        image.save(output, format="JPEG", quality=quality)
+        processed = output.getvalue()
+    except UnidentifiedImageError:
+        if content_type in PASSTHROUGH_TYPES:
+            return True, (image_bytes, content_type)
+        return False, "Unsupported or corrupt image."
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        return False, f"Image could not be processed: {str(e)}"
+
+    image_stats.record(len(image_bytes), len(processed), time.perf_counter() - started)
+    return True, (processed, "image/jpeg")
@@ -0,0 +1,354 @@
+import csv
+import io
+import os
+import re
+import uuid
+from datetime import datetime
+from pydantic import ValidationError
+from app.core.models import ExpenseRecord
+from app.core.categorizer import fallback_category, match_category, resolve_category_name
+
+# Rows are validated and committed in chunks of this size, so memory use is bounded
+# by one chunk no matter how large the uploaded statement is.
+IMPORT_CHUNK_SIZE = 400
+# Only the first N row errors are kept on the job document
+MAX_REPORTED_ERRORS = 50
+
+# CSV header aliases (lowercased) → ExpenseRecord field, plus the debit/type columns
+# used to tell expenses from credits
+CSV_COLUMN_ALIASES = {
+    "date": ["date", "transaction date", "posted date", "posting date", "日期"],
+    "amount": ["amount", "value", "金額"],
+    "debit": ["debit", "debit amount", "withdrawal", "withdrawals", "支出"],
+    "type": ["type", "transaction type", "debit/credit", "dr/cr", "收支"],
+    "item": ["item", "description", "payee", "merchant", "name", "title", "項目", "品項"],
+    "category": ["category", "分類", "類別"],
+    "currency": ["currency", "幣別"],
+    "note": ["note", "notes", "memo", "備註"],
+}
+
+# Values of a CSV type column; anything else is imported as an expense (or by sign, see iter_csv_rows)
+CSV_DEBIT_TYPES = {"debit", "dr", "withdrawal", "expense", "支出"}
+CSV_CREDIT_TYPES = {"credit", "cr", "deposit", "income", "收入", "存入"}
+
+_OFX_TAG = re.compile(r"<([^>]+)>([^<]*)")
+_AMOUNT_CLEANUP = re.compile(r"[^\d.\-]")
+
+
+def detect_format(filename: str, content_type: str):
+    name = (filename or "").lower()
+    if name.endswith((".ofx", ".qfx")) or "ofx" in (content_type or ""):
+        return "ofx"
+    if name.endswith(".csv") or (content_type or "") in ("text/csv", "application/vnd.ms-excel"):
+        return "csv"
+    return None
+
+
+def _amount_sign(value: str):
+    """1, -1 or 0 for a parseable amount, None otherwise."""
+    try:
+        amount = parse_amount(value)
+    except ValueError:
+        return None
+    return (amount > 0) - (amount < 0)
+
+
+def _expense_amount(row: dict, signed: bool) -> str:
+    """
+    The row's amount if it is a debit, "" if it is a credit (skipped, like OFX credits).
+    A debit column holds only expenses; a type column decides when it says debit or credit;
+    otherwise, only when the caller said the amounts are signed, debits are the negative ones.
+    """
+    debit = row.pop("debit", None)
+    kind = row.pop("type", "").lower()
+    if debit is not None:
+        return debit
+    amount = row.get("amount", "")
+    if kind in CSV_CREDIT_TYPES:
+        return ""
+    if kind not in CSV_DEBIT_TYPES and signed and _amount_sign(amount) == 1:
+        return ""
+    return amount
+
+
+def iter_csv_rows(binary_stream, signed_amounts: bool = False):
+    """
+    Yield (line_number, row) with rows keyed by ExpenseRecord field names.
+    Credits come back with an empty amount, like iter_ofx_rows. Credits are only recognised
+    from explicit information: a Debit column (credit rows leave it empty), a type column, or
+    signed_amounts=True for a bank statement whose amount column is signed like OFX (debits
+    negative, credits positive). Otherwise every row is an expense, whatever its sign.
+    """
+    text_stream = io.TextIOWrapper(binary_stream, encoding="utf-8-sig", newline="")
+    try:
+        reader = csv.DictReader(text_stream)
+        columns = {}
+        for header in reader.fieldnames or []:
+            key = (header or "").strip().lower()
+            for field, aliases in CSV_COLUMN_ALIASES.items():
+                if key in aliases and field not in columns:
+                    columns[field] = header
+        if "date" not in columns or not ("amount" in columns or "debit" in columns):
+            raise ValueError("CSV must have date and amount (or debit) columns.")
+
+        for row in reader:
+            values = {
+                field: (row.get(header) or "").strip()
+                for field, header in columns.items()
+            }
+            values["amount"] = _expense_amount(values, signed_amounts)
+            yield reader.line_num, values
+    finally:
+        # Hand the binary stream back to the caller, who owns closing it
+        text_stream.detach()
+
+
+def iter_ofx_rows(binary_stream, chunk_size: int = 65536):
+    """
+    Yield (transaction_number, row) from an OFX/QFX statement without loading the whole file.
+    Works for both SGML (unclosed leaf tags) and XML flavours. Only debits are expenses,
+    so credits are yielded with an empty amount and counted as skipped.
+    """
+    text_stream = io.TextIOWrapper(binary_stream, encoding="utf-8", errors="replace")
+    statement_currency = ""
+    transaction = None
+    number = 0
+    buffer = ""
+
+    def tokens():
+        nonlocal buffer
+        while True:
+            chunk = text_stream.read(chunk_size)
+            if not chunk:
+                break
+            buffer += chunk
+            # Everything before the last "<" is complete; keep the tail for the next read
+            last = buffer.rfind("<")
+            if last < 0:
+                buffer = ""  # header text before the first tag
+                continue
+            if last == 0:
+                continue
+            for match in _OFX_TAG.finditer(buffer, 0, last):
+                yield match.group(1).strip().upper(), match.group(2).strip()
+            buffer = buffer[last:]
+        for match in _OFX_TAG.finditer(buffer):
+            yield match.group(1).strip().upper(), match.group(2).strip()
+
+    try:
+        for tag, value in tokens():
+            if tag == "CURDEF":
+                statement_currency = value
+            elif tag == "STMTTRN":
+                transaction = {}
+            elif tag == "/STMTTRN" and transaction is not None:
+                number += 1
+                try:
+                    amount = float(transaction.get("TRNAMT", ""))
+                except ValueError:
+                    amount = None
+                posted = transaction.get("DTPOSTED", "")[:8]
+                yield number, {
+                    "date": f"{posted[:4]}-{posted[4:6]}-{posted[6:8]}" if len(posted) == 8 else posted,
+                    # OFX debits are negative; credits (income, refunds) are not expenses
+                    "amount": str(-amount) if amount is not None and amount < 0 else "",
+                    "item": transaction.get("NAME") or transaction.get("MEMO") or "",
+                    "note": transaction.get("MEMO", "") if transaction.get("NAME") else "",
+                    "currency": statement_currency,
+                }
+                transaction = None
+            elif transaction is not None and not tag.startswith("/"):
+                transaction[tag] = value
+    finally:
+        text_stream.detach()
+
+
+def parse_amount(value: str) -> float:
+    text = (value or "").strip()
+    negative = text.startswith("(") and text.endswith(")")
+    cleaned = _AMOUNT_CLEANUP.sub("", text.replace(",", ""))
+    if not cleaned or cleaned in ("-", "."):
+        raise ValueError(f"Invalid amount: {value!r}")
+    amount = float(cleaned)
+    return -amount if negative else amount
+
+
+def parse_date(value: str) -> str:
+    text = (value or "").strip()
+    for fmt in ("%Y-%m-%d", "%Y/%m/%d", "%Y%m%d", "%Y.%m.%d"):
+        try:
+            return datetime.strptime(text, fmt).date().isoformat()
+        except ValueError:
+            continue
+    raise ValueError(f"Invalid date: {value!r} (expected YYYY-MM-DD)")
+
+
+def normalize_row(row: dict, categories: list, default_currency: str):
+    """
+    Turn a raw statement row into ExpenseRecord fields.
+    Returns None for rows that are not expenses (zero amounts, OFX and CSV credits).
+    Amounts arrive unsigned or as negative debits; both are stored as positive expenses.
+    category is None when it can't be mapped deterministically and needs the AI.
+    """
+    if not row.get("amount"):
+        return None
+    amount = abs(parse_amount(row["amount"]))
+    if amount == 0:
+        return None
+    item = row.get("item") or row.get("note") or "Imported expense"
+    category = (
+        resolve_category_name(row.get("category"), categories)
+        or match_category(f"{item} {row.get('category', '')} {row.get('note', '')}", categories)
+    )
+    return {
+        "item": item,
+        "amount": amount,
+        "category": category,
+        "currency": (row.get("currency") or default_currency or "USD").upper(),
+        "date": parse_date(row.get("date")),
+        "note": row.get("note") or "",
+    }
+
+
+class ImportJob:
+    """Progress counters for one import, persisted to users/{uid}/imports/{job_id}."""
+
+    def __init__(self, user_id: str, filename: str, file_format: str, job_id: str = None, signed_amounts: bool = False):
+        self.user_id = user_id
+        self.job_id = job_id or uuid.uuid4().hex
+        self.filename = filename
+        self.file_format = file_format
+        # CSV only: positive amounts are credits (see iter_csv_rows)
+        self.signed_amounts = signed_amounts
+        self.status = "pending"
+        self.rows_read = 0
+        self.imported = 0
+        self.skipped = 0
+        self.failed = 0
+        self.ai_categorized = 0
+        self.possible_duplicates = 0
+        self.errors = []
+        self.duplicates = []
+        self.error = None
+
+    def add_error(self, row_number: int, message: str):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"row": row_number, "detail": message})
+
+    def add_duplicate(self, row_number: int, matches: list):
+        # Imported anyway; the user decides what to delete
+        self.possible_duplicates += 1
+        if len(self.duplicates) < MAX_REPORTED_ERRORS:
+            self.duplicates.append({"row": row_number, "matches": matches})
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.job_id,
+            "filename": self.filename,
+            "format": self.file_format,
+            "signed_amounts": self.signed_amounts,
+            "status": self.status,
+            "rows_read": self.rows_read,
+            "imported": self.imported,
+            "skipped": self.skipped,
+            "failed": self.failed,
+            "ai_categorized": self.ai_categorized,
+            "possible_duplicates": self.possible_duplicates,
+            "errors": self.errors,
+            "duplicates": self.duplicates,
+            "error": self.error,
+        }
+
+
+def _assign_ai_categories(pending: list[dict], categories: list, parser, job: ImportJob):
+    """One Gemini call per chunk for the rows the keyword map couldn't place."""
+    if not pending:
+        return
+    items = sorted({record["item"] for record in pending})
+    assigned = {}
+    if parser is not None:
+        success, result = parser.categorize_items(items, categories=categories)
+        if success:
+            for item, category in zip(items, result):
+                resolved = resolve_category_name(category, categories)
+                if resolved:
+                    assigned[item] = resolved
+    fallback = fallback_category(categories)
+    for record in pending:
+        if record["item"] in assigned:
+            record["category"] = assigned[record["item"]]
+            job.ai_categorized += 1
+        else:
+            record["category"] = fallback
+
+
+def _flush_chunk(chunk: list, job: ImportJob, categories: list, db, parser):
+    _assign_ai_categories(
+        [record for _, record in chunk if record["category"] is None],
+        categories,
+        parser,
+        job,
+    )
+    records = []
+    row_numbers = []
+    for row_number, record in chunk:
+        try:
+            records.append(ExpenseRecord(**record).model_dump())
+            row_numbers.append(row_number)
+        except ValidationError as e:
+            job.add_error(row_number, str(e))
+    if records:
+        # Re-importing an overlapping statement is the usual source of duplicates
+        found, hints = db.find_possible_duplicates(job.user_id, records)
+        if found:
+            for row_number, matches in zip(row_numbers, hints):
+                if matches:
+                    job.add_duplicate(row_number, matches)
+        success, result = db.create_user_records(job.user_id, records)
+        if not success:
+            raise RuntimeError(f"Database Error: {result}")
+        job.imported += len(records)
+    chunk.clear()
+    db.save_import_job(job.user_id, job.job_id, job.to_dict())
+
+
+def run_import_job(job: ImportJob, path: str, categories: list, default_currency: str, db, parser):
+    """
+    Stream rows from the spooled upload at `path`, validate them and commit in chunks.
+    Runs outside the request; progress is written to Firestore after every chunk.
+    The temporary file is removed when the job ends.
+    """
+    job.status = "running"
+    db.save_import_job(job.user_id, job.job_id, job.to_dict())
+    try:
+        with open(path, "rb") as binary_stream:
+            rows = iter_ofx_rows(binary_stream) if job.file_format == "ofx" else iter_csv_rows(binary_stream, job.signed_amounts)
+            chunk = []
+            for row_number, row in rows:
+                job.rows_read += 1
+                try:
+                    record = normalize_row(row, categories, default_currency)
+                except ValueError as e:
+                    job.add_error(row_number, str(e))
+                    continue
+                if record is None:
+                    job.skipped += 1
+                    continue
+                chunk.append((row_number, record))
+                if len(chunk) >= IMPORT_CHUNK_SIZE:
+                    _flush_chunk(chunk, job, categories, db, parser)
+            if chunk:
+                _flush_chunk(chunk, job, categories, db, parser)
+        job.status = "completed"
+    except Exception as e:
+        print(f"[ERROR] Import job {job.job_id} failed: {e}")
+        job.status = "failed"
+        job.error = str(e)
+    finally:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        db.save_import_job(job.user_id, job.job_id, job.to_dict())
+    return job
@@ -0,0 +1,194 @@
+import os
+import re
+import threading
+import unicodedata
+from datetime import date, timedelta
+from app.core.categorizer import match_category, fallback_category
+from app.core.category_model import CATEGORY_MODEL_MIN_CONFIDENCE
+
+# Deterministic fast path for short inputs like "lunch 120" or "uber 15 USD yesterday".
+# GeminiParser.parse_text only calls Gemini when the confidence here is below the threshold.
+try:
+    LOCAL_PARSE_MIN_CONFIDENCE = float(os.getenv("LOCAL_PARSE_MIN_CONFIDENCE", "0.8"))
+except ValueError:
+    LOCAL_PARSE_MIN_CONFIDENCE = 0.8
+LOCAL_PARSE_ENABLED = os.getenv("LOCAL_PARSE_ENABLED", "true").lower() not in ("0", "false", "no")
+
+# Currencies whose symbol is "$"; for these a bare "$" or "dollars" means the user's own currency
+DOLLAR_CURRENCIES = {"USD", "TWD", "HKD", "SGD", "AUD", "CAD", "NZD"}
+CURRENCY_SYMBOLS = {"nt$": "TWD", "us$": "USD", "hk$": "HKD", "€": "EUR", "£": "GBP", "¥": "JPY", "₩": "KRW"}
+CURRENCY_WORDS = {
+    "usd": "USD", "twd": "TWD", "ntd": "TWD", "nt": "TWD", "eur": "EUR", "euro": "EUR", "euros": "EUR",
+    "jpy": "JPY", "yen": "JPY", "日圓": "JPY", "日幣": "JPY", "gbp": "GBP", "pound": "GBP", "pounds": "GBP",
+    "cny": "CNY", "rmb": "CNY", "人民幣": "CNY", "hkd": "HKD", "krw": "KRW", "won": "KRW",
+    "sgd": "SGD", "aud": "AUD", "cad": "CAD", "美金": "USD", "美元": "USD", "台幣": "TWD", "新台幣": "TWD",
+}
+# Words meaning "in my currency"
+DEFAULT_CURRENCY_WORDS = {"元", "塊", "塊錢", "dollar", "dollars", "bucks"}
+
+RELATIVE_DAYS = {
+    "today": 0, "tonight": 0, "this morning": 0, "今天": 0, "今日": 0,
+    "yesterday": -1, "昨天": -1, "昨日": -1, "昨晚": -1,
+    "day before yesterday": -2, "前天": -2,
+}
+FILLER_WORDS = {"for", "on", "at", "spent", "paid", "pay", "bought", "buy", "a", "an", "the", "花了", "付了"}
+
+_AMOUNT = re.compile(
+    r"(?P<symbol>nt\$|us\$|hk\$|[$€£¥₩])?\s*"
+    r"(?P<number>\d{1,3}(?:,\d{3})+(?:\.\d+)?|\d+(?:\.\d+)?)"
+    r"(?![\d/\-.:])(?:\s*(?P<suffix>[$€£¥₩]))?"
+)
+# A currency symbol not attached to the amount ("4.50 coffee €") is left to Gemini
+_STRAY_SYMBOL = re.compile(r"[$€£¥₩]")
+_DAYS_AGO = re.compile(r"(\d+)\s*(?:days?\s+ago|天前)")
+# Calendar dates, weekdays, multiple items and money words we don't handle go to Gemini
+_UNSUPPORTED = re.compile(
+    r"\d{1,4}\s*[-/]\s*\d{1,2}|\d{4}\.\d{1,2}\.\d{1,2}"
+    r"|\b(?:jan|feb|mar|apr|jun|jul|aug|sep|sept|oct|nov|dec)[a-z]*\b"
+    r"|\b(?:mon|tues?|wed(?:nes)?|thu(?:rs)?|fri|sat(?:ur)?|sun)(?:day)?\b"
+    r"|\b(?:last|next|week|weekend|month|year|and|plus|each|split|per|refund|income|salary)\b"
+    r"|星期|禮拜|週|周|月|年|號|和|跟|還有|以及|各|每|退款|收入|薪水|[;&+、，；]|,(?!\d{3})"
+)
+_WORD = re.compile(r"[^\W_]+(?:['’][^\W_]+)?|[^\x00-\x7f]", re.UNICODE)
+
+
+class LocalParseStats:
+    """How often the fast path answered without Gemini."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.attempts = 0
+        self.accepted = 0
+
+    def record(self, accepted: bool):
+        with self._lock:
+            self.attempts += 1
+            self.accepted += int(accepted)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "attempts": self.attempts,
+                "accepted": self.accepted,
+                "accept_rate": round(self.accepted / self.attempts, 4) if self.attempts else 0.0,
+            }
+
+
+local_parse_stats = LocalParseStats()
+
+
+def _strip_phrase(text: str, phrase: str) -> str:
+    if phrase.isascii():
+        return re.sub(rf"\b{re.escape(phrase)}\b", " ", text)
+    return text.replace(phrase, " ")
+
+
+def parse_locally(
+    user_input: str, categories: list, default_currency: str, today: date, keyword_map: dict = None, category_model=None
+):
+    """
+    Parse one simple expense without an LLM.
+    Returns (confidence, expenses); confidence is 0.0 with no expenses when the input
+    has to go to Gemini (several amounts, calendar dates, multiple items, ...).
+    A confident prediction from the user's category model wins over the keyword match.
+    """
+    default_currency = (default_currency or "USD").upper()
+    original = " ".join(unicodedata.normalize("NFKC", user_input or "").split())
+    # Matching is done on lowercase text; the item keeps the user's casing ("Starbucks Latte")
+    text = original.lower()
+    if not text or len(text) > 80 or _UNSUPPORTED.search(text):
+        return 0.0, []
+
+    # Relative date (done first so "3 days ago" isn't read as an amount)
+    offset = 0
+    days_ago = _DAYS_AGO.search(text)
+    dated = bool(days_ago)
+    if days_ago:
+        offset = -int(days_ago.group(1))
+        text = f"{text[:days_ago.start()]} {text[days_ago.end():]}"
+    for phrase, days in sorted(RELATIVE_DAYS.items(), key=lambda item: -len(item[0])):
+        if phrase in text:
+            # Conflicting dates ("yesterday today") are ambiguous
+            if dated and days != offset:
+                return 0.0, []
+            dated = True
+            offset = days
+            text = _strip_phrase(text, phrase)
+
+    amounts = list(_AMOUNT.finditer(text))
+    if len(amounts) != 1:
+        return 0.0, []
+    match = amounts[0]
+    amount = float(match.group("number").replace(",", ""))
+    if amount <= 0:
+        return 0.0, []
+    confidence = 1.0
+    rest = f"{text[:match.start()]} {text[match.end():]}"
+
+    # Currency: symbol before or after the number, or a code/word anywhere
+    currency = None
+    symbol, suffix = match.group("symbol"), match.group("suffix")
+    if symbol and suffix and symbol != suffix:
+        return 0.0, []
+    symbol = symbol or suffix
+    if symbol == "$":
+        currency = default_currency if default_currency in DOLLAR_CURRENCIES else "USD"
+        if default_currency not in DOLLAR_CURRENCIES:
+            confidence -= 0.1
+    elif symbol:
+        currency = CURRENCY_SYMBOLS[symbol]
+    for word, code in sorted(CURRENCY_WORDS.items(), key=lambda item: -len(item[0])):
+        if word in rest and (not word.isascii() or re.search(rf"\b{word}\b", rest)):
+            if currency and currency != code:
+                return 0.0, []
+            currency = code
+            rest = _strip_phrase(rest, word)
+    for word in sorted(DEFAULT_CURRENCY_WORDS, key=len, reverse=True):
+        if word in rest and (not word.isascii() or re.search(rf"\b{word}\b", rest)):
+            if word.isascii() and default_currency not in DOLLAR_CURRENCIES:
+                currency = currency or "USD"
+            else:
+                currency = currency or default_currency
+            rest = _strip_phrase(rest, word)
+
+    if _STRAY_SYMBOL.search(rest):
+        return 0.0, []
+
+    for word in FILLER_WORDS:
+        if not word.isascii():
+            rest = rest.replace(word, " ")
+    words = [word for word in _WORD.findall(rest) if word not in FILLER_WORDS]
+    if not words:
+        return 0.0, []
+    # No spaces between neighbouring CJK words ("早餐", not "早 餐")
+    item = ""
+    for word in words:
+        item += word if (item and not word.isascii() and not item[-1].isascii()) else f" {word}"
+    item = item.strip()
+    cased = {}
+    for word in _WORD.findall(original):
+        cased.setdefault(word.lower(), word)
+    display_item = " ".join(cased.get(word, word) for word in item.split(" "))
+    if len(words) > 6:
+        confidence -= 0.3
+
+    category = None
+    if category_model is not None:
+        predicted, predicted_confidence = category_model.predict(item, categories)
+        if predicted_confidence >= CATEGORY_MODEL_MIN_CONFIDENCE:
+            category = predicted
+    if category is None:
+        category = match_category(item, categories, keyword_map)
+    if category is None:
+        category = fallback_category(categories)
+        confidence -= 0.35
+
+    expense = {
+        "item": display_item,
+        "amount": amount,
+        "category": category,
+        "currency": currency or default_currency,
+        "date": (today + timedelta(days=offset)).isoformat(),
+        "note": "",
+    }
+    return round(max(confidence, 0.0), 2), [expense]
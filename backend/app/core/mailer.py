@@ -0,0 +1,186 @@
+import queue
+import random
+import smtplib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from app.core.concurrency import RateLimiter
+
+
+class SMTPConnectionPool:
+    """
+    Reusable authenticated SMTP sessions. A connection is opened (and STARTTLS/login done)
+    once, then handed to many sends; broken connections are dropped and replaced lazily.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        username: str = None,
+        password: str = None,
+        size: int = 4,
+        timeout: float = 15,
+        use_tls: bool = True,
+        idle_check_seconds: float = 30,
+        max_messages_per_connection: int = 500,
+    ):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.size = max(1, size)
+        self.timeout = timeout
+        self.use_tls = use_tls
+        self.idle_check_seconds = idle_check_seconds
+        self.max_messages_per_connection = max_messages_per_connection
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(self.size)
+        self.connections_opened = 0
+
+    def _connect(self):
+        if self.port == 465:
+            server = smtplib.SMTP_SSL(self.host, self.port, timeout=self.timeout)
+        else:
+            server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+            if self.use_tls:
+                server.ehlo()
+                server.starttls()
+            server.ehlo()
+        if self.username and self.password:
+            server.login(self.username, self.password)
+        self.connections_opened += 1
+        return {"server": server, "last_used": time.monotonic(), "sent": 0}
+
+    def acquire(self):
+        """Borrow a live connection; blocks while all `size` connections are in use."""
+        self._slots.acquire()
+        try:
+            while True:
+                try:
+                    conn = self._idle.get_nowait()
+                except queue.Empty:
+                    return self._connect()
+                # Servers drop idle sessions; check with NOOP before reusing an old one
+                if time.monotonic() - conn["last_used"] < self.idle_check_seconds:
+                    return conn
+                try:
+                    if conn["server"].noop()[0] == 250:
+                        return conn
+                except (smtplib.SMTPException, OSError):
+                    pass
+                self._close(conn)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def release(self, conn, healthy: bool = True):
+        try:
+            if healthy and conn["sent"] < self.max_messages_per_connection:
+                conn["last_used"] = time.monotonic()
+                self._idle.put(conn)
+            else:
+                self._close(conn)
+        finally:
+            self._slots.release()
+
+    def _close(self, conn):
+        try:
+            conn["server"].quit()
+        except (smtplib.SMTPException, OSError):
+            try:
+                conn["server"].close()
+            except OSError:
+                pass
+
+    def close(self):
+        while True:
+            try:
+                self._close(self._idle.get_nowait())
+            except queue.Empty:
+                return
+
+
+def is_transient(error: Exception) -> bool:
+    """4xx replies and dropped connections are worth retrying; 5xx replies are not."""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(400 <= code < 500 for code, _ in error.recipients.values())
+    if isinstance(error, smtplib.SMTPResponseException):
+        return 400 <= error.smtp_code < 500
+    return isinstance(error, (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, OSError))
+
+
+class SMTPMailer:
+    """
+    Send queue on top of SMTPConnectionPool: one worker per pooled connection,
+    a shared rate limit, and retry with exponential backoff for transient failures.
+    """
+
+    def __init__(
+        self,
+        pool: SMTPConnectionPool,
+        rate_per_second: float = 0,
+        burst: int = 1,
+        max_retries: int = 3,
+        backoff_seconds: float = 1.0,
+        max_backoff_seconds: float = 30.0,
+        sleep=time.sleep,
+    ):
+        self.pool = pool
+        self.rate_limiter = RateLimiter(rate_per_second, burst, sleep=sleep)
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self._sleep = sleep
+        self._executor = ThreadPoolExecutor(max_workers=pool.size, thread_name_prefix="smtp-send")
+        self._stats_lock = threading.Lock()
+        self.sent = 0
+        self.failed = 0
+        self.retries = 0
+
+    def send(self, from_addr: str, to_addrs: list, message: str):
+        """Send one message now (blocking). Raises the last error if all attempts fail."""
+        attempt = 0
+        while True:
+            self.rate_limiter.acquire()
+            conn = None
+            try:
+                # Connect/greeting/login failures (e.g. 421 at the banner) retry like send failures
+                conn = self.pool.acquire()
+                conn["server"].sendmail(from_addr, to_addrs, message)
+            except Exception as e:
+                # A failed session may be in an unknown state; never put it back
+                if conn is not None:
+                    self.pool.release(conn, healthy=False)
+                if not is_transient(e) or attempt >= self.max_retries:
+                    with self._stats_lock:
+                        self.failed += 1
+                    raise
+                delay = min(self.max_backoff_seconds, self.backoff_seconds * (2 ** attempt))
+                attempt += 1
+                with self._stats_lock:
+                    self.retries += 1
+                self._sleep(delay * random.uniform(0.5, 1.0))
+                continue
+            conn["sent"] += 1
+            self.pool.release(conn)
+            with self._stats_lock:
+                self.sent += 1
+            return
+
+    def submit(self, from_addr: str, to_addrs: list, message: str):
+        """Queue a message; returns a Future that resolves when it is sent (or fails)."""
+        return self._executor.submit(self.send, from_addr, to_addrs, message)
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return {
+                "sent": self.sent,
+                "failed": self.failed,
+                "retries": self.retries,
+                "connections_opened": self.pool.connections_opened,
+            }
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        self.pool.close()
@@ -0,0 +1,122 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+# Legacy account migration: expenses stored under a user's old Google sub ID are moved
+# to their Firebase UID. Progress lives in the new user document's "legacy_migration" map:
+# {
+#   "from": "<old user id>",
+#   "status": "pending" | "running" | "failed" | "completed",
+#   "phase": "copy" | "delete",
+#   "cursor": "<last copied expense id>",
+#   "copied": 1200, "deleted": 0,
+#   "error": "...",   # set when status is "failed"
+# }
+try:
+    MIGRATION_WORKERS = int(os.getenv("MIGRATION_WORKERS", "4"))
+    # Expenses per write batch; a copy is one write, Firestore allows 500 per batch
+    MIGRATION_BATCH_SIZE = min(int(os.getenv("MIGRATION_BATCH_SIZE", "400")), 500)
+except ValueError:
+    MIGRATION_WORKERS = 4
+    MIGRATION_BATCH_SIZE = 400
+
+
+def _chunks(items, size):
+    return [items[start:start + size] for start in range(0, len(items), size)]
+
+
+def _commit_in_parallel(executor, write, chunks):
+    """Run write(chunk) for every chunk concurrently; (False, error) if any failed."""
+    for success, result in executor.map(write, chunks):
+        if not success:
+            return False, result
+    return True, None
+
+
+def run_legacy_migration(db, user_id, migration, workers=MIGRATION_WORKERS, batch_size=MIGRATION_BATCH_SIZE):
+    """
+    Move a legacy account's expenses to user_id.
+
+    The old expenses are paged by document ID, workers * batch_size at a time, and each
+    page is written as `workers` batches committed in parallel; the checkpoint is saved
+    after every page. Expenses keep their IDs, so re-copying a page after a crash is harmless.
+    Nothing is deleted until the source count matches the number copied and the new ID
+    holds at least as many expenses; the delete phase and the old user document go last.
+    Returns (success, migration); a failed or interrupted run resumes from the checkpoint.
+    """
+    old_id = migration["from"]
+    migration = {"phase": "copy", "cursor": None, "copied": 0, "deleted": 0, **migration, "status": "running"}
+    migration.pop("error", None)
+    page_size = max(1, workers) * batch_size
+
+    def fail(message):
+        migration["status"] = "failed"
+        migration["error"] = message
+        db.save_legacy_migration(user_id, migration)
+        return False, message
+
+    success, result = db.save_legacy_migration(user_id, migration)
+    if not success:
+        return False, result
+
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="legacy-migration") as executor:
+        if migration["phase"] == "copy":
+            while True:
+                success, page = db.read_expense_page(old_id, page_size, start_after=migration["cursor"])
+                if not success:
+                    return fail(page)
+                if not page:
+                    break
+                success, result = _commit_in_parallel(
+                    executor, lambda chunk: db.copy_expenses(user_id, chunk), _chunks(page, batch_size)
+                )
+                if not success:
+                    return fail(result)
+                migration["copied"] += len(page)
+                migration["cursor"] = page[-1][0]
+                db.save_legacy_migration(user_id, migration)
+                if len(page) < page_size:
+                    break
+
+            # Verify before anything is deleted
+            success, source_count = db.count_expenses(old_id)
+            if not success:
+                return fail(source_count)
+            if source_count != migration["copied"]:
+                return fail(f"Count mismatch: {source_count} legacy expenses, {migration['copied']} copied")
+            success, target_count = db.count_expenses(user_id)
+            if not success:
+                return fail(target_count)
+            if target_count < source_count:
+                return fail(f"Count mismatch: {source_count} legacy expenses, {target_count} under the new ID")
+
+            success, result = db.rebuild_expense_indexes(user_id)
+            if not success:
+                return fail(result)
+            migration["phase"] = "delete"
+            migration["cursor"] = None
+            db.save_legacy_migration(user_id, migration)
+
+        # Deleted documents drop out of the query, so every page starts from the beginning
+        while True:
+            success, page = db.read_expense_page(old_id, page_size, ids_only=True)
+            if not success:
+                return fail(page)
+            if not page:
+                break
+            success, result = _commit_in_parallel(
+                executor,
+                lambda chunk: db.delete_expenses(old_id, [expense_id for expense_id, _ in chunk]),
+                _chunks(page, batch_size),
+            )
+            if not success:
+                return fail(result)
+            migration["deleted"] += len(page)
+            db.save_legacy_migration(user_id, migration)
+
+    success, result = db.delete_user_document(old_id)
+    if not success:
+        return fail(result)
+    migration["status"] = "completed"
+    migration["cursor"] = None
+    db.save_legacy_migration(user_id, migration)
+    return True, migration
@@ -19,6 +19,12 @@ class ExpenseRecord(BaseModel):
         # Extra fields will be ignored to keep the database clean
         extra = "ignore"
 
+# Batch create request model
+# Items stay raw dicts so each one can be validated against ExpenseRecord on its own
+# and reported back by index, instead of one bad row rejecting the whole request.
+class ExpenseBatchRequest(BaseModel):
+    expenses: list[dict]
+
 # User's information request model
 class UserUpdate(BaseModel):
     name: Optional[str] = None
@@ -40,6 +46,10 @@ class ParsedExpenseList(BaseModel):
     """
     expenses: list[ExpenseRecord]
 
+# AI category assignment for imported rows, one category per input item (same order)
+class CategoryAssignmentList(BaseModel):
+    categories: list[str]
+
 # 聊天相關模型
 class ChatMessage(BaseModel):
     """A single completed chat turn kept by the browser."""
@@ -0,0 +1,93 @@
+import hashlib
+import json
+import os
+import re
+import unicodedata
+from datetime import date, timedelta
+from app.core.cache import ParseResultCache
+
+# Cache of GeminiParser.parse_text results. PARSE_CACHE_SQLITE_PATH enables the on-disk backend.
+try:
+    PARSE_CACHE_MAX_ENTRIES = int(os.getenv("PARSE_CACHE_MAX_ENTRIES", "5000"))
+    PARSE_CACHE_TTL_SECONDS = float(os.getenv("PARSE_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+except ValueError:
+    PARSE_CACHE_MAX_ENTRIES = 5000
+    PARSE_CACHE_TTL_SECONDS = 7 * 24 * 3600
+PARSE_CACHE_ENABLED = os.getenv("PARSE_CACHE_ENABLED", "true").lower() not in ("0", "false", "no")
+PARSE_CACHE_SQLITE_PATH = os.getenv("PARSE_CACHE_SQLITE_PATH") or None
+
+# Bump when the prompt or response schema changes so old answers are not reused
+PARSE_CACHE_VERSION = 1
+
+# Inputs that mention a calendar date, month or weekday resolve differently depending on
+# which day it is, so they are only reused on the same day. Everything else ("coffee 150",
+# "bus 15 yesterday") resolves to a fixed offset from today and is re-anchored on a hit.
+_ABSOLUTE_DATE_HINTS = re.compile(
+    r"\d{1,4}\s*[-/.]\s*\d{1,2}"
+    r"|\d+\s*(?:st|nd|rd|th)\b"
+    r"|\d+\s*[月日號号]"
+    r"|\b(?:jan|feb|mar|apr|may|jun|jul|aug|sep|sept|oct|nov|dec)[a-z]*\b"
+    r"|\b(?:mon|tues?|wed(?:nes)?|thu(?:rs)?|fri|sat(?:ur)?|sun)(?:day)?\b"
+    r"|\b(?:week|weekend|month|year)\b"
+    r"|星期|禮拜|礼拜|週|周|月|年",
+    re.IGNORECASE,
+)
+
+
+def normalize_input(text: str) -> str:
+    """Case, width and whitespace differences don't change the meaning of an expense."""
+    return " ".join(unicodedata.normalize("NFKC", text or "").casefold().split())
+
+
+def is_relative_input(text: str) -> bool:
+    return not _ABSOLUTE_DATE_HINTS.search(normalize_input(text))
+
+
+def cache_key(user_input: str, categories: list, default_currency: str, today: date) -> str:
+    """
+    Key over normalized input, category list, default currency and the date anchor.
+    The anchor is "relative" for inputs re-anchored on every hit, otherwise today's date.
+    """
+    anchor = "relative" if is_relative_input(user_input) else today.isoformat()
+    payload = json.dumps(
+        [PARSE_CACHE_VERSION, normalize_input(user_input), sorted(categories or []), (default_currency or "").upper(), anchor],
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def pack_expenses(expenses: list[dict], today: date) -> list[dict]:
+    """Store dates as day offsets from `today` so a hit on a later day can re-anchor them."""
+    packed = []
+    for expense in expenses:
+        entry = {}
+        for key, value in expense.items():
+            if key == "date":
+                try:
+                    entry["date_offset"] = (date.fromisoformat(value) - today).days
+                    continue
+                except (TypeError, ValueError):
+                    pass
+            entry[key] = value
+        packed.append(entry)
+    return packed
+
+
+def unpack_expenses(packed: list[dict], today: date) -> list[dict]:
+    return [
+        {
+            ("date" if key == "date_offset" else key):
+            ((today + timedelta(days=value)).isoformat() if key == "date_offset" else value)
+            for key, value in expense.items()
+        }
+        for expense in packed
+    ]
+
+
+# In memory until open_parse_cache() attaches the SQLite file (app.main does it at startup)
+parse_cache = ParseResultCache(max_entries=PARSE_CACHE_MAX_ENTRIES, ttl_seconds=PARSE_CACHE_TTL_SECONDS)
+
+
+def open_parse_cache():
+    if PARSE_CACHE_ENABLED and PARSE_CACHE_SQLITE_PATH:
+        parse_cache.open(PARSE_CACHE_SQLITE_PATH)
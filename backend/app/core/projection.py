@@ -0,0 +1,97 @@
+# Field projections and the compact list layout for expense reads.
+# GET /expense?fields=date,amount,category asks Firestore for those fields only (select()),
+# and layout=columns returns parallel arrays instead of one object per record:
+# {
+#   "fields": ["id", "date", "amount", "category"],
+#   "id": ["a1", ...], "date": ["2026-08-19", ...], "amount": [150.0, ...],
+#   "category": {"values": ["Food", "Transport"], "codes": [0, 1, 0, ...]},   # dictionary-encoded
+# }
+# "id" is always included; category and currency are sent as distinct values plus one index per row.
+
+EXPENSE_FIELDS = ("item", "amount", "category", "date", "currency", "note", "created_at")
+LIST_LAYOUTS = ("records", "columns")
+DICTIONARY_FIELDS = ("category", "currency")
+
+# Fields the period and weekly reports read (everything but note and created_at)
+REPORT_FIELDS = ["item", "amount", "category", "date", "currency"]
+
+
+def parse_fields(value: str | None):
+    """
+    Parse a comma-separated `fields` parameter.
+    Returns (True, [field, ...]), (True, None) when no projection was asked for, or (False, error).
+    """
+    if not value:
+        return True, None
+    fields = []
+    for field in (part.strip() for part in value.split(",")):
+        if not field or field == "id" or field in fields:
+            continue
+        if field not in EXPENSE_FIELDS:
+            return False, f"Unknown field '{field}'. Allowed: {', '.join(EXPENSE_FIELDS)}."
+        fields.append(field)
+    return True, fields
+
+
+def project_record(record: dict, fields: list[str]) -> dict:
+    """The record's id plus the requested fields it has (missing fields stay missing, like select())."""
+    projected = {"id": record["id"]} if "id" in record else {}
+    for field in fields:
+        if field in record:
+            projected[field] = record[field]
+    return projected
+
+
+def dictionary_encode(values: list) -> tuple[list, list[int]]:
+    """
+    (distinct values in first-seen order, index into them for each row). Also used by the
+    report columns (app/core/reports.py). Unhashable values, such as a list stored through
+    PUT /expense/{id}, are not merged: each occurrence gets its own code.
+    """
+    try:
+        index = {value: code for code, value in enumerate(dict.fromkeys(values))}
+        return list(index), list(map(index.__getitem__, values))
+    except TypeError:
+        keys, codes, index = [], [], {}
+        for value in values:
+            try:
+                code = index.setdefault(value, len(keys))
+            except TypeError:
+                code = len(keys)
+            if code == len(keys):
+                keys.append(value)
+            codes.append(code)
+        return keys, codes
+
+
+def to_columns(records: list[dict], fields: list[str] | None = None, dictionary=DICTIONARY_FIELDS) -> dict:
+    """
+    Parallel arrays for `records`; a field a record lacks is None in its column.
+    Without `fields`, the columns are the EXPENSE_FIELDS present in any record.
+    Columns named in `dictionary` are dictionary-encoded.
+    """
+    if fields is None:
+        present = set().union(*records) if records else set()
+        fields = [field for field in EXPENSE_FIELDS if field in present]
+    names = ["id", *fields]
+    columns = {"fields": names}
+    for name in names:
+        column = [record.get(name) for record in records]
+        if name in dictionary:
+            distinct, codes = dictionary_encode(column)
+            columns[name] = {"values": distinct, "codes": codes}
+        else:
+            columns[name] = column
+    return columns
+
+
+def from_columns(columns: dict) -> list[dict]:
+    """Records from to_columns output (what a client does); missing fields come back as None."""
+    names = columns["fields"]
+    decoded = []
+    for name in names:
+        column = columns[name]
+        if isinstance(column, dict):
+            column = [column["values"][code] for code in column["codes"]]
+        decoded.append(column)
+    return [dict(zip(names, row)) for row in zip(*decoded)]
@@ -1,15 +1,102 @@
 from collections import defaultdict
 from datetime import date, timedelta
-from typing import Any
+from app.core.projection import dictionary_encode
+from app.core.rollups import summarize_rollups
+
+
+def _date_ordinal(raw_date) -> int:
+    try:
+        return date.fromisoformat(raw_date).toordinal()
+    except (ValueError, TypeError):
+        return -1
+
+
+def _parse_amount(expense: dict):
+    try:
+        return float(expense["amount"])
+    except (KeyError, ValueError, TypeError):
+        return None
+
+
+def _dictionary_encode(values: list):
+    """(distinct values in first-seen order, int32 code per row)."""
+    import numpy as np
+
+    distinct, codes = dictionary_encode(values)
+    return distinct, np.asarray(codes, dtype=np.int32)
+
+
+class ExpenseColumns:
+    """
+    Columnar view of a list of expense dicts, parsed once and reusable across reports.
+    Repeated values are dictionary-encoded: each distinct raw date string is parsed once,
+    and categories/currencies become integer codes.
+    NumPy is imported on first use; app.main preloads it at startup.
+    """
+
+    __slots__ = (
+        "records", "date_keys", "date_ordinals", "date_codes", "ordinals",
+        "amounts", "amount_valid", "categories", "category_codes",
+        "currencies", "currency_codes",
+    )
+
+    def __init__(self, records: list[dict]):
+        import numpy as np
+
+        self.records = records
+
+        # 日期：每個不同的日期字串只解析一次；日期錯誤記為 -1，週報會略過
+        raw_dates = [expense.get("date") for expense in records]
+        self.date_keys, self.date_codes = _dictionary_encode(raw_dates)
+        self.date_ordinals = np.fromiter(
+            (_date_ordinal(raw_date) for raw_date in self.date_keys),
+            dtype=np.int64,
+            count=len(self.date_keys),
+        )
+        self.ordinals = self.date_ordinals[self.date_codes]
+
+        # 金額：全為數字時直接轉成陣列，否則逐筆 float() 並標記無效的資料
+        raw_amounts = [expense.get("amount") for expense in records]
+        if set(map(type, raw_amounts)) <= {float, int}:
+            self.amounts = np.asarray(raw_amounts, dtype=np.float64)
+            self.amount_valid = np.ones(len(records), dtype=bool)
+        else:
+            parsed = [_parse_amount(expense) for expense in records]
+            self.amount_valid = np.asarray([amount is not None for amount in parsed], dtype=bool)
+            self.amounts = np.asarray([amount or 0.0 for amount in parsed], dtype=np.float64)
+
+        # 沒有幣別的紀錄視為主幣別（以空字串表示，出報表時再決定）
+        self.currencies, self.currency_codes = _dictionary_encode(
+            [expense.get("currency") or "" for expense in records]
+        )
+        self.categories, self.category_codes = _dictionary_encode(
+            [expense.get("category") or "Others" for expense in records]
+        )
+
+    def __len__(self):
+        return len(self.records)
+
+    def currency_mask(self, primary_currency: str):
+        """Rows counted in `primary_currency` (including rows saved without a currency)."""
+        import numpy as np
+
+        codes = [i for i, currency in enumerate(self.currencies) if currency in ("", primary_currency)]
+        return np.isin(self.currency_codes, codes)
+
 
 def build_weekly_report(
     expenses: list[dict],
     reference_date: date,
     primary_currency: str,
 ) -> dict:
+    """
+    Weekly totals, category breakdown, largest expense and top day for the week of
+    `reference_date` from expense dicts. Used on one week of records (the
+    rollup report); /report builds the same figures from cached ExpenseColumns.
+    """
     week_start = reference_date - timedelta(days=reference_date.weekday())  # weekday()：星期一是 0，星期日是 6
     week_end = week_start + timedelta(days=6)
-    previous_week_start = week_start - timedelta(days=7) 
+    previous_week_start = week_start - timedelta(days=7)
     previous_week_end = week_start - timedelta(days=1)
 
     # 分成兩週的處理資料 跳過日期錯誤與幣別不同的資料
@@ -23,12 +110,12 @@ def build_weekly_report(
         expense_currency = expense.get("currency") or primary_currency
         if expense_currency != primary_currency:
             continue
-        
+
         if week_start <= expense_date <= week_end:
             current_week_expenses.append(expense)
         elif previous_week_start <= expense_date <= previous_week_end:
             previous_week_expenses.append(expense)
-    
+
     # 計算各週花費總和
     def calculate_total(records: list[dict]) -> float:
         total = 0.0
@@ -39,7 +126,7 @@ def build_weekly_report(
                 continue
 
         return round(total, 2)
-    
+
     # 計算兩週花費總和與增減比例
     current_total = calculate_total(current_week_expenses)
     previous_total = calculate_total(previous_week_expenses)
@@ -51,7 +138,7 @@ def build_weekly_report(
             (change_amount / previous_total) * 100,
             1,
         )
-   
+
     # 計算本週各分類的支出總額
     category_totals = defaultdict(float)
     for expense in current_week_expenses:
@@ -79,7 +166,7 @@ def build_weekly_report(
             amount = float(expense["amount"])
         except (KeyError, ValueError, TypeError):
             continue
-        
+
         expense_date = expense["date"]
         category = expense.get("category") or "Others"
         # 累計每天的消費
@@ -120,10 +207,210 @@ def build_weekly_report(
     }
 
 
+# 支援的報表週期：週、月、年初至今、自訂區間
+REPORT_PERIODS = ("week", "month", "ytd", "custom")
+
+
+def _add_months(day: date, months: int) -> date:
+    """First day of the month `months` away from `day`'s month."""
+    index = day.year * 12 + (day.month - 1) + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _same_day_in_year(day: date, year: int) -> date:
+    try:
+        return day.replace(year=year)
+    except ValueError:  # 2/29 → 2/28
+        return day.replace(year=year, day=28)
+
+
+def period_windows(
+    period: str,
+    reference_date: date,
+    count: int,
+    start: date = None,
+    end: date = None,
+) -> list[tuple[date, date]]:
+    """
+    `count` consecutive, non-overlapping (start, end) windows ending with the one that
+    contains `reference_date`, oldest first. The second-to-last is the comparison window.
+    - week: Monday–Sunday weeks
+    - month: calendar months
+    - ytd: Jan 1 → reference date, compared with the same span in earlier years
+    - custom: [start, end], compared with the preceding windows of the same length
+    """
+    windows = []
+    for back in range(count - 1, -1, -1):
+        if period == "week":
+            week_start = reference_date - timedelta(days=reference_date.weekday() + 7 * back)
+            windows.append((week_start, week_start + timedelta(days=6)))
+        elif period == "month":
+            month_start = _add_months(reference_date, -back)
+            windows.append((month_start, _add_months(month_start, 1) - timedelta(days=1)))
+        elif period == "ytd":
+            year = reference_date.year - back
+            windows.append((date(year, 1, 1), _same_day_in_year(reference_date, year)))
+        elif period == "custom":
+            if start is None or end is None or end < start:
+                raise ValueError("custom period needs start <= end")
+            length = timedelta(days=(end - start).days + 1)
+            windows.append((start - length * back, end - length * back))
+        else:
+            raise ValueError(f"Unknown period: {period}")
+    return windows
+
+
+def _window_stats(columns: ExpenseColumns, windows: list[tuple[date, date]], primary_currency: str) -> list[dict]:
+    """
+    Metrics for every window in a single vectorized pass over the columns.
+    Windows must be sorted and non-overlapping (as returned by period_windows).
+    """
+    import numpy as np
+
+    n = len(windows)
+    starts = np.asarray([w[0].toordinal() for w in windows], dtype=np.int64)
+    ends = np.asarray([w[1].toordinal() for w in windows], dtype=np.int64)
 
+    # 每筆資料屬於哪個區間（-1 表示不在任何區間內）
+    ordinals = columns.ordinals
+    window_of = np.searchsorted(starts, ordinals, side="right") - 1
+    in_window = (window_of >= 0) & (ordinals <= ends[np.clip(window_of, 0, None)]) & columns.currency_mask(primary_currency)
+    rows = np.flatnonzero(in_window)
+    counts = np.bincount(window_of[rows], minlength=n)
 
+    valid_rows = rows[columns.amount_valid[rows]]
+    windows_v = window_of[valid_rows]
+    amounts_v = columns.amounts[valid_rows]
+    totals = np.bincount(windows_v, weights=amounts_v, minlength=n)
 
+    # 分類 × 區間
+    n_categories = max(len(columns.categories), 1)
+    category_keys = windows_v * n_categories + columns.category_codes[valid_rows]
+    category_sums = np.bincount(category_keys, weights=amounts_v, minlength=n * n_categories).reshape(n, n_categories)
+    category_present = np.bincount(category_keys, minlength=n * n_categories).reshape(n, n_categories) > 0
 
+    # 每日總額；區間不重疊，所以每個日期只屬於一個區間
+    n_dates = max(len(columns.date_keys), 1)
+    date_codes_v = columns.date_codes[valid_rows]
+    day_sums = np.bincount(date_codes_v, weights=amounts_v, minlength=n_dates)
+    day_present = np.flatnonzero(np.bincount(date_codes_v, minlength=n_dates) > 0)
+    day_window = np.searchsorted(starts, columns.date_ordinals[day_present], side="right") - 1
 
+    # 每個區間的最大單筆：依 (區間, -金額, 原順序) 排序後取各組第一筆
+    order = np.lexsort((valid_rows, -amounts_v, windows_v))
+    first_in_group = order[np.r_[True, windows_v[order][1:] != windows_v[order][:-1]]] if len(order) else order
+    largest_row = {int(windows_v[i]): int(valid_rows[i]) for i in first_in_group}
 
+    stats = []
+    for w, (window_start, window_end) in enumerate(windows):
+        category_totals = [
+            {"category": columns.categories[code], "amount": round(float(category_sums[w, code]), 2)}
+            for code in np.flatnonzero(category_present[w])
+        ]
+        category_totals.sort(key=lambda item: item["amount"], reverse=True)
 
+        largest_expense = None
+        if w in largest_row:
+            i = largest_row[w]
+            largest_expense = {
+                "item": columns.records[i].get("item") or "Unknown item",
+                "amount": round(float(columns.amounts[i]), 2),
+                "date": columns.date_keys[columns.date_codes[i]],
+                "category": columns.categories[columns.category_codes[i]],
+            }
+
+        top_spending_day = None
+        days = day_present[day_window == w]
+        if len(days):
+            top = days[np.argmax(day_sums[days])]
+            top_spending_day = {"date": columns.date_keys[top], "amount": round(float(day_sums[top]), 2)}
+
+        stats.append({
+            "start": window_start.isoformat(),
+            "end": window_end.isoformat(),
+            "expense_count": int(counts[w]),
+            "total": round(float(totals[w]), 2),
+            "category_totals": category_totals,
+            "largest_expense": largest_expense,
+            "top_spending_day": top_spending_day,
+        })
+    return stats
+
+
+def build_period_report(
+    expenses,
+    period: str,
+    reference_date: date,
+    primary_currency: str,
+    trend: int = 0,
+    start: date = None,
+    end: date = None,
+) -> dict:
+    """
+    Report for any period with a comparison against the previous window, plus an
+    optional trend of the last `trend` windows. All windows come from one scan.
+    """
+    columns = expenses if isinstance(expenses, ExpenseColumns) else ExpenseColumns(expenses)
+    windows = period_windows(period, reference_date, max(trend, 2), start=start, end=end)
+    stats = _window_stats(columns, windows, primary_currency)
+    current, previous = stats[-1], stats[-2]
+
+    change_amount = round(current["total"] - previous["total"], 2)
+    if previous["total"] == 0:
+        change_percent = None
+    else:
+        change_percent = round((change_amount / previous["total"]) * 100, 1)
+
+    return {
+        "period": period,
+        "start": current["start"],
+        "end": current["end"],
+        "currency": primary_currency,
+        "expense_count": current["expense_count"],
+        "total": current["total"],
+        "previous_start": previous["start"],
+        "previous_end": previous["end"],
+        "previous_total": previous["total"],
+        "change_amount": change_amount,
+        "change_percent": change_percent,
+        "category_totals": current["category_totals"],
+        "largest_expense": current["largest_expense"],
+        "top_spending_day": current["top_spending_day"],
+        "trend": [
+            {"start": item["start"], "end": item["end"], "total": item["total"], "expense_count": item["expense_count"]}
+            for item in stats[-trend:]
+        ] if trend else [],
+    }
+
+
+# 週報涵蓋的日期：(上週一, 本週一, 本週日)
+def week_range(reference_date: date) -> tuple[date, date, date]:
+    week_start = reference_date - timedelta(days=reference_date.weekday())
+    return week_start - timedelta(days=7), week_start, week_start + timedelta(days=6)
+
+
+# 用預先彙總的 rollups 產生週報：本週的統計從本週原始紀錄計算（與 build_weekly_report 完全一致，
+# 包含金額錯誤的筆數、金額為零的分類與同分時的順序），只有上週總額從 rollups 讀取
+def build_weekly_report_from_rollups(
+    rollups: list[dict],
+    week_expenses: list[dict],
+    reference_date: date,
+    primary_currency: str,
+) -> dict:
+    previous_week_start, week_start, _ = week_range(reference_date)
+    previous_week_end = week_start - timedelta(days=1)
+
+    report = build_weekly_report(week_expenses, reference_date, primary_currency)
+    previous_total = summarize_rollups(rollups, previous_week_start, previous_week_end, primary_currency)["total"]
+    change_amount = round(report["total"] - previous_total, 2)
+    if previous_total == 0:
+        change_percent = None
+    else:
+        change_percent = round((change_amount / previous_total) * 100, 1)
+
+    return {
+        **report,
+        "previous_week_total": previous_total,
+        "change_amount": change_amount,
+        "change_percent": change_percent,
+    }
@@ -0,0 +1,169 @@
+from collections import defaultdict
+from datetime import date
+
+# Pre-aggregated spending, one document per month: users/{uid}/rollups/{YYYY-MM}
+# {
+#   "period": "2026-08",
+#   "currencies": {
+#     "TWD": {
+#       "total": 150.0, "count": 2,
+#       "categories": {"Food": 100.0, "Transport": 50.0},
+#       "days": {"2026-08-10": {"total": 100.0, "count": 1, "categories": {"Food": 100.0}}, ...},
+#     },
+#   },
+# }
+# Daily, weekly and monthly figures are all derived from the day buckets, so a report
+# reads one or two documents instead of the user's whole expense history.
+
+# Records saved without a currency follow the user's primary currency at report time.
+# Firestore map keys can't be empty, so they are stored under this key.
+DEFAULT_CURRENCY_KEY = "_default"
+
+
+def period_of(date_str: str) -> str:
+    return date_str[:7]
+
+
+def periods_between(start: date, end: date) -> list[str]:
+    """All YYYY-MM periods overlapping [start, end]."""
+    periods = []
+    year, month = start.year, start.month
+    while (year, month) <= (end.year, end.month):
+        periods.append(f"{year:04d}-{month:02d}")
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return periods
+
+
+def _expense_key(expense: dict):
+    """(date, currency_key, category, amount) or None if the record can't be aggregated."""
+    try:
+        expense_date = date.fromisoformat(expense["date"]).isoformat()
+        amount = float(expense["amount"])
+    except (KeyError, ValueError, TypeError):
+        return None
+    currency = expense.get("currency") or DEFAULT_CURRENCY_KEY
+    category = expense.get("category") or "Others"
+    return expense_date, currency, category, amount
+
+
+def _add(deltas: dict, expense: dict, sign: int):
+    key = _expense_key(expense)
+    if key is None:
+        return
+    expense_date, currency, category, amount = key
+    bucket = deltas.setdefault(period_of(expense_date), {}).setdefault(currency, {
+        "total": 0.0, "count": 0, "categories": defaultdict(float), "days": {},
+    })
+    day = bucket["days"].setdefault(expense_date, {
+        "total": 0.0, "count": 0, "categories": defaultdict(float),
+    })
+    bucket["total"] += sign * amount
+    bucket["count"] += sign
+    bucket["categories"][category] += sign * amount
+    day["total"] += sign * amount
+    day["count"] += sign
+    day["categories"][category] += sign * amount
+
+
+def _plain(deltas: dict) -> dict:
+    """Convert defaultdicts to plain dicts so the result can be serialized/stored."""
+    return {
+        period: {
+            currency: {
+                "total": bucket["total"],
+                "count": bucket["count"],
+                "categories": dict(bucket["categories"]),
+                "days": {
+                    day: {"total": values["total"], "count": values["count"], "categories": dict(values["categories"])}
+                    for day, values in bucket["days"].items()
+                },
+            }
+            for currency, bucket in currencies.items()
+        }
+        for period, currencies in deltas.items()
+    }
+
+
+def rollup_deltas(added: list[dict] = (), removed: list[dict] = ()) -> dict:
+    """
+    Signed per-period changes for records being added and/or removed.
+    An update is `rollup_deltas(added=[new], removed=[old])`.
+    Returns {period: {currency: {...}}} with the layout of a rollup document's "currencies".
+    """
+    deltas = {}
+    for expense in added:
+        _add(deltas, expense, 1)
+    for expense in removed:
+        _add(deltas, expense, -1)
+    return _plain(deltas)
+
+
+def build_rollups(expenses) -> dict:
+    """Full rollup documents recomputed from raw expenses (used to repair drift)."""
+    return {
+        period: {"period": period, "currencies": currencies}
+        for period, currencies in rollup_deltas(added=expenses).items()
+    }
+
+
+def summarize_rollups(rollups: list[dict], start: date, end: date, currency: str) -> dict:
+    """
+    Totals for [start, end] in one currency from rollup documents.
+    Records stored without a currency count towards `currency`, like build_weekly_report.
+    """
+    start_str, end_str = start.isoformat(), end.isoformat()
+    total = 0.0
+    count = 0
+    categories = defaultdict(float)
+    days = defaultdict(float)
+    for rollup in rollups:
+        for currency_key, bucket in (rollup.get("currencies") or {}).items():
+            if currency_key not in (currency, DEFAULT_CURRENCY_KEY):
+                continue
+            for day, values in (bucket.get("days") or {}).items():
+                if not (start_str <= day <= end_str):
+                    continue
+                total += values.get("total", 0.0)
+                count += values.get("count", 0)
+                days[day] += values.get("total", 0.0)
+                for category, amount in (values.get("categories") or {}).items():
+                    categories[category] += amount
+    return {
+        "total": round(total, 2),
+        "count": count,
+        # Buckets that went back to zero after deletes are not real spending
+        "categories": {k: v for k, v in categories.items() if round(v, 2) != 0},
+        "days": {k: v for k, v in sorted(days.items()) if round(v, 2) != 0},
+    }
+
+
+def summarize_months(rollups: list[dict], currency: str) -> list[dict]:
+    """
+    Per-month, per-currency totals and category sums (no day buckets), oldest first.
+    Records stored without a currency count towards `currency`.
+    """
+    months = {}
+    for rollup in rollups:
+        period = rollup.get("period")
+        for currency_key, bucket in (rollup.get("currencies") or {}).items():
+            key = currency if currency_key == DEFAULT_CURRENCY_KEY else currency_key
+            entry = months.setdefault((period, key), {
+                "month": period, "currency": key, "total": 0.0, "count": 0, "categories": defaultdict(float),
+            })
+            entry["total"] += bucket.get("total", 0.0)
+            entry["count"] += bucket.get("count", 0)
+            for category, amount in (bucket.get("categories") or {}).items():
+                entry["categories"][category] += amount
+    return [
+        {
+            **entry,
+            "total": round(entry["total"], 2),
+            "categories": {
+                category: round(amount, 2)
+                for category, amount in sorted(entry["categories"].items(), key=lambda item: item[1], reverse=True)
+                if round(amount, 2) != 0
+            },
+        }
+        for _, entry in sorted(months.items(), key=lambda item: (item[0][0] or "", item[0][1]))
+        if entry["count"] > 0
+    ]
@@ -0,0 +1,46 @@
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+
+# Request body limits for upload routes, enforced before the body is read.
+# Starlette parses (and spools) a whole multipart body before the route runs, so the
+# per-file checks inside the routes only fire after an oversized upload was received.
+# The limits add room for multipart framing (boundaries and part headers) on top of the files.
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+
+class BodySizeLimitMiddleware:
+    """
+    ASGI middleware taking {path: max body bytes}. A request to one of those paths whose
+    Content-Length is over the limit gets 413 without any of its body being read; a body
+    sent without Content-Length (chunked) is counted as it arrives and cut off at the limit.
+    """
+
+    def __init__(self, app, limits: dict):
+        self.app = app
+        self.limits = limits
+
+    async def __call__(self, scope, receive, send):
+        limit = self.limits.get(scope["path"]) if scope["type"] == "http" else None
+        if limit is None:
+            return await self.app(scope, receive, send)
+
+        content_length = dict(scope["headers"]).get(b"content-length")
+        if content_length is not None:
+            if not content_length.isdigit() or int(content_length) > limit:
+                response = JSONResponse({"detail": "Request body is too large."}, status_code=413)
+                return await response(scope, receive, send)
+            return await self.app(scope, receive, send)
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # Raised inside the route's body parsing; FastAPI turns it into the response
+                    raise HTTPException(status_code=413, detail="Request body is too large.")
+            return message
+
+        await self.app(scope, limited_receive, send)
@@ -0,0 +1,184 @@
+import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from app.core.email import send_weekly_report_email
+from app.core.projection import REPORT_FIELDS
+from app.core.reports import build_weekly_report_from_rollups, week_range
+from app.core.rollups import period_of
+
+# Fan-out settings for the scheduled weekly report run
+# The run lease is renewed after every page, so it only has to outlast one page; a claimed
+# ("sending") email is only retried once the claim is older than WEEKLY_REPORT_CLAIM_SECONDS.
+try:
+    WEEKLY_REPORT_WORKERS = int(os.getenv("WEEKLY_REPORT_WORKERS", "8"))
+    WEEKLY_REPORT_PAGE_SIZE = int(os.getenv("WEEKLY_REPORT_PAGE_SIZE", "200"))
+    WEEKLY_REPORT_LEASE_SECONDS = float(os.getenv("WEEKLY_REPORT_LEASE_SECONDS", "600"))
+    WEEKLY_REPORT_CLAIM_SECONDS = float(os.getenv("WEEKLY_REPORT_CLAIM_SECONDS", "900"))
+except ValueError:
+    WEEKLY_REPORT_WORKERS = 8
+    WEEKLY_REPORT_PAGE_SIZE = 200
+    WEEKLY_REPORT_LEASE_SECONDS = 600.0
+    WEEKLY_REPORT_CLAIM_SECONDS = 900.0
+
+
+def last_completed_week(today: date) -> date:
+    """Reference date for a scheduled run: the Sunday that ended the previous week."""
+    return today - timedelta(days=today.weekday() + 1)
+
+
+def generate_weekly_report(db, user_id, user_info, reference_date, recipient_email):
+    """
+    Build the weekly report from rollups and save it to users/{uid}/weekly_reports/{week_start}.
+    Returns (success, report_or_error).
+    """
+    # Accounts created before rollups existed are backfilled once
+    if not user_info.get("rollups_built"):
+        success, result = db.rebuild_rollups(user_id)
+        if not success:
+            return False, f"Database Error: {result}"
+
+    # Read only the rollup months covering both weeks, plus this week's raw records
+    previous_week_start, week_start, week_end = week_range(reference_date)
+    success, rollups = db.read_rollups(
+        user_id,
+        period_of(previous_week_start.isoformat()),
+        period_of(week_end.isoformat()),
+    )
+    if not success:
+        return False, f"Database Error: {rollups}"
+    success, week_expenses = db.read_user_record(
+        user_id,
+        start_date=week_start.isoformat(),
+        end_date=week_end.isoformat(),
+        fields=REPORT_FIELDS,
+    )
+    if not success:
+        return False, f"Database Error: {week_expenses}"
+
+    report = build_weekly_report_from_rollups(
+        rollups=rollups,
+        week_expenses=week_expenses,
+        reference_date=reference_date,
+        primary_currency=user_info.get("currency") or "USD",
+    )
+    success, result = db.save_weekly_report(
+        user_id=user_id,
+        report=report,
+        recipient_email=recipient_email,
+    )
+    if not success:
+        return False, f"Database Error: {result}"
+    return True, report
+
+
+def deliver_weekly_report(db, user, reference_date, send_email=send_weekly_report_email):
+    """
+    Generate, save and email one subscribed user's report.
+    Returns "sent", "skipped" (already sent or being sent for this week / no address) or "failed".
+    """
+    user_id = user["id"]
+    week_start = week_range(reference_date)[1].isoformat()
+
+    recipient_email = user.get("weekly_report_email") or user.get("email")
+    if not recipient_email:
+        return "skipped"
+
+    # Idempotency: the report is claimed ("sending") in a transaction before anything is sent,
+    # so a week already delivered, or being delivered by an overlapping run, is skipped
+    success, claim = db.claim_weekly_report_email(user_id, week_start, WEEKLY_REPORT_CLAIM_SECONDS)
+    if not success:
+        print(f"[ERROR] Weekly report claim for {user_id} failed: {claim}")
+        return "failed"
+    if claim != "claimed":
+        return "skipped"
+
+    success, report = generate_weekly_report(db, user_id, user, reference_date, recipient_email)
+    if not success:
+        print(f"[ERROR] Weekly report for {user_id} failed: {report}")
+        db.mark_weekly_report_email(user_id, week_start, "failed", report)
+        return "failed"
+
+    email_success, email_msg = send_email(recipient_email, report)
+    db.mark_weekly_report_email(user_id, week_start, "sent" if email_success else "failed", email_msg)
+    return "sent" if email_success else "failed"
+
+
+def run_weekly_report_fanout(
+    db,
+    reference_date,
+    workers=WEEKLY_REPORT_WORKERS,
+    page_size=WEEKLY_REPORT_PAGE_SIZE,
+    max_seconds=None,
+    send_email=send_weekly_report_email,
+    clock=time.monotonic,
+    lease_seconds=WEEKLY_REPORT_LEASE_SECONDS,
+):
+    """
+    Deliver the week's report to every subscribed user.
+
+    Users are paged by document ID; each page is processed by `workers` threads and
+    the run document report_runs/{week_start} is checkpointed after every page.
+    A later call with the same reference date resumes from the checkpoint, and users
+    already sent within a half-finished page are skipped by deliver_weekly_report.
+    With max_seconds the run stops at a page boundary once the budget is spent
+    (status "partial"), so a time-limited caller such as Cloud Scheduler just calls again.
+    Only one invocation works on a week at a time: it holds a lease on the run document,
+    renewed with every checkpoint. Another call meanwhile returns status "busy".
+    """
+    started = clock()
+    run_id = week_range(reference_date)[1].isoformat()
+    owner = uuid.uuid4().hex
+    success, run = db.acquire_report_run_lease(run_id, owner, lease_seconds)
+    if not success:
+        return False, run
+    if run is None:
+        success, run = db.get_report_run(run_id)
+        if not success:
+            return False, run
+        return True, {**(run or {"week_start": run_id}), "status": "busy"}
+    run = {
+        "week_start": run_id,
+        "status": "running",
+        "cursor": None,
+        "processed": 0,
+        "sent": 0,
+        "skipped": 0,
+        "failed": 0,
+        **run,
+    }
+    if run.get("status") == "completed":
+        db.save_report_run(run_id, run, lease_seconds=0)
+        return True, run
+    run["status"] = "running"
+
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="weekly-report") as executor:
+        while True:
+            success, users = db.list_subscribed_users(limit=page_size, start_after=run.get("cursor"))
+            if not success:
+                run["status"] = "failed"
+                db.save_report_run(run_id, run, lease_seconds=0)
+                return False, users
+            if not users:
+                run["status"] = "completed"
+                break
+
+            for outcome in executor.map(lambda user: deliver_weekly_report(db, user, reference_date, send_email), users):
+                run["processed"] += 1
+                run[outcome] += 1
+            run["cursor"] = users[-1]["id"]
+            success, result = db.save_report_run(run_id, run, lease_seconds=lease_seconds)
+            if not success:
+                # The lease expired and another invocation took over; it resumes from its own checkpoint
+                return False, result
+
+            if len(users) < page_size:
+                run["status"] = "completed"
+                break
+            if max_seconds is not None and clock() - started >= max_seconds:
+                run["status"] = "partial"
+                break
+
+    db.save_report_run(run_id, run, lease_seconds=0)
+    return True, run
@@ -1,23 +1,87 @@
-from fastapi import FastAPI, HTTPException, Depends, Header, File, UploadFile
-from pydantic import BaseModel
-from typing import Optional
+from fastapi import FastAPI, HTTPException, Depends, Header, File, UploadFile, Query, BackgroundTasks
+from pydantic import BaseModel, ValidationError
+from typing import List, Optional
+from contextlib import asynccontextmanager
+import asyncio
+import hmac
+import importlib
 import os
-from app.core.parser import expense_parser
-from app.core.database import db_client
-from app.core.models import ChatRequestModel, ExpenseRecord, UserUpdate, ParseRequestModel, TokenBody, WeeklyReportRequest 
-from app.core.reports import build_weekly_report
-from app.core.email import send_weekly_report_email
-import firebase_admin
-from firebase_admin import auth as firebase_auth
+import tempfile
+import time
+from dotenv import load_dotenv
+
+# Settings below are read from the environment when their modules are imported
+load_dotenv()
+
+from app.core.parser import DEFAULT_PARSE_CATEGORIES, GeminiParser, get_expense_parser
+from app.core.database import Database, get_db_client
+from app.core.models import ChatRequestModel, ExpenseBatchRequest, ExpenseRecord, UserUpdate, ParseRequestModel, TokenBody, WeeklyReportRequest 
+from app.core.reports import REPORT_PERIODS, build_period_report, period_windows
+from app.core.weekly_reports import generate_weekly_report, last_completed_week, run_weekly_report_fanout
+from app.core.email import close_mailer, send_weekly_report_email
+from app.core.email_templates import render_cache as email_render_cache
+from app.core.concurrency import run_blocking, shutdown_blocking_pool
+from app.core import auth as token_auth
+from app.core.importer import ImportJob, detect_format, run_import_job
+from app.core.chat_context import build_chat_context
+from app.core.chat_stream import SSE_HEADERS, chat_stream_stats, sse_event, stream_chat_events
+from app.core.parse_cache import open_parse_cache, parse_cache
+from app.core.local_parser import local_parse_stats
+from app.core.images import IMAGE_MAX_UPLOAD_BYTES, image_stats, preprocess_image
+from app.core.image_batch import IMAGE_BATCH_MAX_BYTES, IMAGE_BATCH_MAX_FILES, gemini_image_limiter, parse_images_as_completed
+from app.core.category_model import apply_category_model
+from app.core.projection import LIST_LAYOUTS, parse_fields, to_columns
+from app.core.encoding import accepts_gzip, encode_response, negotiate_format, response_encoding_stats
+from app.core.uploads import MULTIPART_OVERHEAD_BYTES, BodySizeLimitMiddleware
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response, StreamingResponse
 from datetime import date as Date
 
 
+def create_clients():
+    for create in (get_db_client, get_expense_parser):
+        try:
+            create()
+        except Exception as e:
+            print(f"[WARN] Client warm-up failed, retrying on first use: {e}")
+
+# NumPy, Pillow, msgpack and Jinja are imported by the code that uses them, not when the app
+# is imported; load them during warm-up so the first report, image or email doesn't pay for it
+PRELOADED_MODULES = ("numpy", "PIL.Image", "msgpack", "jinja2")
+
+def warm_up():
+    create_clients()
+    for name in PRELOADED_MODULES:
+        try:
+            importlib.import_module(name)
+        except ImportError as e:
+            print(f"[WARN] Could not preload {name}: {e}")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    try:
+        await run_blocking(open_parse_cache)
+    except Exception as e:
+        print(f"[WARN] Parse cache file could not be opened, caching in memory only: {e}")
+    # Keep Firebase's token-signing keys warm so verification never waits on a key fetch
+    token_auth.start_public_key_refresher()
+    # Build the clients in the background: uvicorn starts accepting requests
+    # immediately and the first request usually finds them ready
+    app.state.client_warm_up = asyncio.create_task(run_blocking(warm_up))
+    yield
+    # Release the blocking-I/O worker threads when uvicorn stops
+    token_auth.stop_public_key_refresher()
+    close_mailer()
+    parse_cache.close()
+    shutdown_blocking_pool()
+
+
 # Initialize FastAPI application
 app = FastAPI(
     title="AI Expense Tracker API",
     description="An AI-powered API that parses natural language into structured expense records.",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
 )
 
 # Add CORS Middleware for Vite(different port) to connect to API
@@ -29,6 +93,35 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Upload size caps. Oversized requests are refused from their Content-Length before the body
+# is received; the routes still check each file as they read it.
+MAX_IMPORT_BYTES = 100 * 1024 * 1024
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+app.add_middleware(
+    BodySizeLimitMiddleware,
+    limits={
+        "/parse_expense_image": IMAGE_MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD_BYTES,
+        "/parse_expense_images": IMAGE_BATCH_MAX_BYTES + MULTIPART_OVERHEAD_BYTES,
+        "/expense/import": MAX_IMPORT_BYTES + MULTIPART_OVERHEAD_BYTES,
+    },
+)
+
+# Firebase/Firestore and Gemini clients are created on first use, never at import, so the
+# server can start listening right away. Routes get them through these dependencies
+# (tests can swap them with app.dependency_overrides).
+async def get_db() -> Database:
+    try:
+        # Created in the blocking pool: Firebase initialization must not stall the event loop
+        return get_db_client(create=False) or await run_blocking(get_db_client)
+    except ValueError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+async def get_parser() -> GeminiParser:
+    try:
+        return get_expense_parser(create=False) or await run_blocking(get_expense_parser)
+    except ValueError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
 # read GOOGLE_CLIENT_ID from .env
 GOOGLE_CLIENT_ID = os.getenv("GOOGLE_CLIENT_ID")
 
@@ -37,20 +130,44 @@ async def get_current_user_id(authorization: str = Header(None)):
     if not authorization or not authorization.startswith("Bearer "):
         raise HTTPException(status_code=401, detail="Invalid authorization header")
     token = authorization.split("Bearer ")[1]
+    # Cache hits skip both signature verification and the thread-pool hop
+    decoded_token = token_auth.cached_claims(token)
+    if decoded_token is not None:
+        return decoded_token['uid']
     try:
-        decoded_token = firebase_auth.verify_id_token(token)
+        decoded_token = await run_blocking(token_auth.verify_id_token, token)
         return decoded_token['uid']
     except Exception as e:
         print(f"❌ Token verification failed: {e}")
         raise HTTPException(status_code=401, detail="Invalid ID token")
 
+# In-process counters (cache hit/miss/eviction) for checking Firestore read volume
+@app.get("/metrics")
+async def get_metrics():
+    db = get_db_client(create=False)
+    return {
+        "status": "success",
+        "data": {
+            "expense_cache": db.expense_cache.stats() if db else None,
+            "token_cache": token_auth.token_cache.stats(),
+            "email_render_cache": email_render_cache.stats(),
+            "parse_cache": parse_cache.stats(),
+            "local_parse": local_parse_stats.stats(),
+            "chat_stream": chat_stream_stats.stats(),
+            "images": image_stats.stats(),
+            "response_encoding": response_encoding_stats.stats(),
+        },
+    }
+
 # Google auth endpoint
 @app.post("/auth/google")
-async def google_auth(body: TokenBody):
+async def google_auth(body: TokenBody, background_tasks: BackgroundTasks, db: Database = Depends(get_db)):
     try:
         # Since frontend authenticates via Firebase Client SDK and sends the Firebase ID token,
         # we verify it using Firebase Admin SDK instead of Google OAuth2 verification.
-        decoded_token = firebase_auth.verify_id_token(body.id_token)
+        decoded_token = token_auth.cached_claims(body.id_token)
+        if decoded_token is None:
+            decoded_token = await run_blocking(token_auth.verify_id_token, body.id_token)
         user_id = decoded_token['uid']  # Firebase unique user ID
         email = decoded_token.get('email')
         name = decoded_token.get('name')
@@ -58,11 +175,16 @@ async def google_auth(body: TokenBody):
         print(f"✅ Google Auth Success: {name} ({email})")
 
         # Check and initialize user data in Firestore
-        db_client.check_user_exists(user_id, email, name)
+        success, result = await run_blocking(db.check_user_exists, user_id, email, name)
+        # Moving a legacy account's expenses can take a while; don't hold the login for it
+        migration_pending = success and result == "Migration pending"
+        if migration_pending:
+            background_tasks.add_task(db.migrate_legacy_user, user_id)
 
         return {
             "status": "success",
-            "user": {"id": user_id, "name": name, "email": email}
+            "user": {"id": user_id, "name": name, "email": email},
+            "migration_pending": migration_pending,
         }
     except Exception as e:
         print(f"❌ Token verification failed: {e}")
@@ -70,18 +192,27 @@ async def google_auth(body: TokenBody):
 
 # Parse expense with gemini AI to get structured data
 @app.post("/parse_expense")
-async def parse_expense(request: ParseRequestModel, user_id: str = Depends(get_current_user_id)):
+async def parse_expense(
+    request: ParseRequestModel,
+    user_id: str = Depends(get_current_user_id),
+    db: Database = Depends(get_db),
+    parser: GeminiParser = Depends(get_parser),
+):
     # get user settings from firestore
-    success, user_info = db_client.get_user_info(user_id)
+    success, user_info = await run_blocking(db.get_user_info, user_id)
     if not success:
         raise HTTPException(status_code=404, detail=f"User not found: {user_id}")
     user_categories = user_info.get("categories", [])
     user_currency = user_info.get("currency", "USD")
+    # The user's own history decides categories it is confident about; a failed load just skips it
+    model_loaded, category_model = await run_blocking(db.get_category_model, user_id)
     
-    success, parsed_data = expense_parser.parse_text(
+    success, parsed_data = await run_blocking(
+        parser.parse_text,
         request.text, 
         categories=user_categories, 
-        default_currency=user_currency
+        default_currency=user_currency,
+        category_model=category_model if model_loaded else None,
     )
     if not success:
         raise HTTPException(status_code=500, detail=f"AI Parsing Error: {parsed_data}")
@@ -90,32 +221,52 @@ async def parse_expense(request: ParseRequestModel, user_id: str = Depends(get_c
         "data": parsed_data
     }
 
+# Read an image upload in chunks, rejecting it once it passes the size cap.
+# By now Starlette has already received and spooled the request body (to disk past 1 MB), so
+# this bounds the bytes held in memory, not what was uploaded; BodySizeLimitMiddleware refuses
+# oversized requests before their body is read.
+async def read_image_upload(file: UploadFile) -> bytes:
+    chunks = []
+    size = 0
+    while chunk := await file.read(UPLOAD_CHUNK_BYTES):
+        size += len(chunk)
+        if size > IMAGE_MAX_UPLOAD_BYTES:
+            raise HTTPException(status_code=413, detail="Image is too large.")
+        chunks.append(chunk)
+    return b"".join(chunks)
+
 # Parse expense from image with gemini AI to get structured data
 # 這個API 目前還用不到...
 @app.post("/parse_expense_image")
 async def parse_expense_image(
     file: UploadFile = File(...), 
-    user_id: str = Depends(get_current_user_id)
+    user_id: str = Depends(get_current_user_id),
+    db: Database = Depends(get_db),
+    parser: GeminiParser = Depends(get_parser),
 ):
     # 1. 防呆：檢查檔案格式
     if not file.content_type.startswith("image/"):
         raise HTTPException(status_code=400, detail="Uploaded file must be an image.")
 
     # 2. 拿使用者偏好設定
-    success, user_info = db_client.get_user_info(user_id)
+    success, user_info = await run_blocking(db.get_user_info, user_id)
     if not success:
         raise HTTPException(status_code=404, detail=f"User not found: {user_id}")
     
     user_categories = user_info.get("categories", [])
     user_currency = user_info.get("currency", "USD")
 
-    try:
-        # 3. 讀取圖檔資料與格式
-        image_bytes = await file.read()
-        file_content_type = file.content_type
+    # 3. 讀取圖檔 (限制大小), 縮圖並重新編碼
+    image_bytes = await read_image_upload(file)
+    processed, result = await run_blocking(preprocess_image, image_bytes, file.content_type)
+    if not processed:
+        raise HTTPException(status_code=400, detail=result)
+    image_bytes, file_content_type = result
 
+    try:
         # 4. 呼叫 GeminiParser 解析
-        parse_success, parsed_data = expense_parser.parse_image(
+        parse_success, parsed_data = await run_blocking(
+            parser.parse_image,
             image_bytes=image_bytes,
             content_type=file_content_type,
             categories=user_categories,
@@ -125,6 +276,10 @@ async def parse_expense_image(
         if not parse_success:
             raise HTTPException(status_code=500, detail=f"AI Image Parsing Error: {parsed_data}")
 
+        model_loaded, category_model = await run_blocking(db.get_category_model, user_id)
+        if model_loaded:
+            apply_category_model([parsed_data], category_model, user_categories or DEFAULT_PARSE_CATEGORIES)
+
         return {
             "status": "success",
             "data": parsed_data
@@ -133,11 +288,81 @@ async def parse_expense_image(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Server Error: {str(e)}")
 
+# Parse many receipt images in one request (e.g. a month of receipts from ReceiptScanner).
+# Images are parsed concurrently and each result is streamed as a Server-Sent Event as soon
+# as it is ready, in completion order; `index` is the file's position in the upload:
+#   event: result  data: {"index": 0, "filename": "...", "status": "success", "data": {...}}
+#   event: result  data: {"index": 1, "filename": "...", "status": "error", "detail": "..."}
+#   event: done    data: {"total": 2, "succeeded": 1, "failed": 1, "total_ms": ...}
+@app.post("/parse_expense_images")
+async def parse_expense_images(
+    files: List[UploadFile] = File(...),
+    user_id: str = Depends(get_current_user_id),
+    db: Database = Depends(get_db),
+    parser: GeminiParser = Depends(get_parser),
+):
+    started = time.perf_counter()
+    if len(files) > IMAGE_BATCH_MAX_FILES:
+        raise HTTPException(status_code=400, detail=f"Upload at most {IMAGE_BATCH_MAX_FILES} images at a time.")
+
+    success, user_info = await run_blocking(db.get_user_info, user_id)
+    if not success:
+        raise HTTPException(status_code=404, detail=f"User not found: {user_id}")
+    user_categories = user_info.get("categories", [])
+    user_currency = user_info.get("currency", "USD")
+    model_loaded, category_model = await run_blocking(db.get_category_model, user_id)
+
+    # Each file is read and preprocessed inside its parse slot, so at most IMAGE_BATCH_CONCURRENCY
+    # images are in memory at once; a bad file fails on its own and the rest are still parsed
+    async def read_one(file):
+        if not (file.content_type or "").startswith("image/"):
+            return False, "Uploaded file must be an image."
+        try:
+            image_bytes = await read_image_upload(file)
+        except HTTPException as e:
+            return False, e.detail
+        return await run_blocking(preprocess_image, image_bytes, file.content_type)
+
+    # Only the Gemini call runs after the rate-limit wait, which happens on the event loop
+    def parse_one(upload):
+        image_bytes, content_type = upload
+        parse_success, parsed_data = parser.parse_image(
+            image_bytes=image_bytes,
+            content_type=content_type,
+            categories=user_categories,
+            default_currency=user_currency,
+        )
+        if parse_success and model_loaded:
+            apply_category_model([parsed_data], category_model, user_categories or DEFAULT_PARSE_CATEGORIES)
+        return parse_success, parsed_data
+
+    async def events():
+        succeeded = 0
+        async for index, parse_success, data in parse_images_as_completed(
+            files, parse_one, read=read_one, limiter=gemini_image_limiter
+        ):
+            filename = files[index].filename
+            if parse_success:
+                succeeded += 1
+                yield sse_event("result", {"index": index, "filename": filename, "status": "success", "data": data})
+            else:
+                yield sse_event("result", {"index": index, "filename": filename, "status": "error", "detail": data})
+        yield sse_event("done", {
+            "total": len(files),
+            "succeeded": succeeded,
+            "failed": len(files) - succeeded,
+            "total_ms": round((time.perf_counter() - started) * 1000, 1),
+        })
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
 # Create expense in user's database record(firebase firestore)
 @app.post("/expense/create")
-async def create_expense_data(request: ExpenseRecord, user_id: str = Depends(get_current_user_id)):
+async def create_expense_data(request: ExpenseRecord, user_id: str = Depends(get_current_user_id), db: Database = Depends(get_db)):
     expense_data = request.model_dump()  # Convert Pydantic model to dict
-    db_success, db_result = db_client.create_user_record(user_id, expense_data)
+    # Checked before the write so the new record doesn't match itself; a failed check doesn't block saving
+    found, duplicates = await run_blocking(db.find_possible_duplicates, user_id, [expense_data])
+    db_success, db_result = await run_blocking(db.create_user_record, user_id, expense_data)
     
     if not db_success:
         raise HTTPException(status_code=500, detail=f"Database Error: {db_result}")
@@ -147,29 +372,205 @@ async def create_expense_data(request: ExpenseRecord, user_id: str = Depends(get
         "message": "Expense recorded to your personal account!",
         "user_id": user_id,
         "data": expense_data, 
-        "db_id": db_result   
+        "db_id": db_result,
+        "possible_duplicates": duplicates[0] if found else [],
     }
 
-# Read expense from database
-@app.get("/expense")
-async def read_expense_data(user_id: str = Depends(get_current_user_id)):
-    print(f"[DEBUG] Received request for user_id: {user_id}")
-    success, result = db_client.read_user_record(user_id)
-    
+# Create many expenses in one round trip (e.g. a multi-expense sentence from /parse_expense)
+# Invalid items are skipped and reported by index; valid ones are written in Firestore batches.
+MAX_BATCH_EXPENSES = 2000
+
+@app.post("/expense/batch")
+async def create_expense_batch(request: ExpenseBatchRequest, user_id: str = Depends(get_current_user_id), db: Database = Depends(get_db)):
+    if not request.expenses:
+        raise HTTPException(status_code=400, detail="No expenses provided.")
+    if len(request.expenses) > MAX_BATCH_EXPENSES:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_EXPENSES} expenses per batch.")
+
+    valid_records = []
+    valid_indexes = []
+    errors = []
+    for index, item in enumerate(request.expenses):
+        try:
+            valid_records.append(ExpenseRecord.model_validate(item).model_dump())
+            valid_indexes.append(index)
+        except ValidationError as e:
+            errors.append({
+                "index": index,
+                "detail": [
+                    {"field": ".".join(str(part) for part in err["loc"]), "message": err["msg"]}
+                    for err in e.errors()
+                ],
+            })
+
+    ids = [None] * len(request.expenses)
+    possible_duplicates = [[] for _ in request.expenses]
+    if valid_records:
+        found, duplicates = await run_blocking(db.find_possible_duplicates, user_id, valid_records)
+        if found:
+            # Matches inside this batch refer to positions in the request, like `ids`
+            for index, matches in zip(valid_indexes, duplicates):
+                possible_duplicates[index] = [
+                    {**match, "index": valid_indexes[match["index"]]} if "index" in match else match
+                    for match in matches
+                ]
+        db_success, db_result = await run_blocking(db.create_user_records, user_id, valid_records)
+        if not db_success:
+            raise HTTPException(status_code=500, detail=f"Database Error: {db_result}")
+        for index, record_id in zip(valid_indexes, db_result):
+            ids[index] = record_id
+
+    return {
+        "status": "success",
+        "message": f"{len(valid_records)} of {len(request.expenses)} expenses recorded.",
+        "ids": ids,
+        "data": [{**record, "id": ids[index]} for record, index in zip(valid_records, valid_indexes)],
+        "errors": errors,
+        "possible_duplicates": possible_duplicates,
+    }
+
+# Bulk import from a CSV or OFX/QFX statement
+# The upload is spooled to a temp file in fixed-size chunks and processed in the background,
+# so memory stays flat regardless of file size. Poll GET /expense/import/{job_id} for progress.
+# `signed_amounts=true` marks a CSV bank statement whose positive amounts are credits (skipped).
+@app.post("/expense/import")
+async def import_expenses(
+    background_tasks: BackgroundTasks,
+    file: UploadFile = File(...),
+    signed_amounts: bool = False,
+    user_id: str = Depends(get_current_user_id),
+    db: Database = Depends(get_db),
+    parser: GeminiParser = Depends(get_parser),
+):
+    file_format = detect_format(file.filename, file.content_type)
+    if file_format is None:
+        raise HTTPException(status_code=400, detail="Upload a .csv, .ofx or .qfx file.")
+
+    success, user_info = await run_blocking(db.get_user_info, user_id)
     if not success:
-        print(f"[ERROR] Database error: {result}")
-        raise HTTPException(status_code=500, detail=f"Database Error: {result}")
-    
-    print(f"[DEBUG] Returning data for user_id: {user_id}, data: {result}")
+        raise HTTPException(status_code=404, detail=f"User not found: {user_id}")
+
+    fd, path = tempfile.mkstemp(prefix="import_", suffix=f".{file_format}")
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as spool:
+            while chunk := await file.read(UPLOAD_CHUNK_BYTES):
+                size += len(chunk)
+                if size > MAX_IMPORT_BYTES:
+                    raise HTTPException(status_code=413, detail="Import file is too large.")
+                spool.write(chunk)
+    except BaseException:
+        os.remove(path)
+        raise
+
+    job = ImportJob(user_id=user_id, filename=file.filename, file_format=file_format, signed_amounts=signed_amounts)
+    await run_blocking(db.save_import_job, user_id, job.job_id, job.to_dict())
+    background_tasks.add_task(
+        run_import_job,
+        job,
+        path,
+        user_info.get("categories", []),
+        user_info.get("currency", "USD"),
+        db,
+        parser,
+    )
     return {
         "status": "success",
-        "data": result
+        "job_id": job.job_id,
+        "data": job.to_dict(),
+    }
+
+# Get bulk import progress
+@app.get("/expense/import/{job_id}")
+async def get_import_status(job_id: str, user_id: str = Depends(get_current_user_id), db: Database = Depends(get_db)):
+    success, result = await run_blocking(db.get_import_job, user_id, job_id)
+    if not success:
+        status_code = 404 if result == "Import job not found" else 500
+        raise HTTPException(status_code=status_code, detail=f"Database Error: {result}")
+    return {
+        "status": "success",
+        "data": result,
     }
 
+# Read expense from database
+# Without `limit` the full (filtered) history is returned for backward compatibility.
+# With `limit` one page is returned, newest first, plus an opaque `next_cursor` for the next page.
+# `fields=date,amount,category` returns only those fields (plus id), read with a Firestore field mask;
+# `layout=columns` returns parallel arrays instead of one object per record (see app/core/projection.py).
+# `format=msgpack` (or Accept: application/msgpack) sends MessagePack instead of JSON, and the body
+# is gzipped when Accept-Encoding allows it (see app/core/encoding.py).
+@app.get("/expense")
+async def read_expense_data(
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    category: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=500),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    layout: str = "records",
+    response_format: Optional[str] = Query(None, alias="format"),
+    accept: Optional[str] = Header(None),
+    accept_encoding: Optional[str] = Header(None),
+    user_id: str = Depends(get_current_user_id),
+    db: Database = Depends(get_db),
+):
+    for value in (start_date, end_date):
+        if value:
+            try:
+                Date.fromisoformat(value)
+            except ValueError:
+                raise HTTPException(status_code=400, detail="start_date and end_date must use YYYY-MM-DD format.")
+    if layout not in LIST_LAYOUTS:
+        raise HTTPException(status_code=400, detail=f"layout must be one of: {', '.join(LIST_LAYOUTS)}.")
+    fields_ok, fields = parse_fields(fields)
+    if not fields_ok:
+        raise HTTPException(status_code=400, detail=fields)
+    format_ok, response_format = negotiate_format(response_format, accept)
+    if not format_ok:
+        raise HTTPException(status_code=400, detail=response_format)
+
+    if limit is None:
+        if cursor:
+            raise HTTPException(status_code=400, detail="cursor requires limit.")
+        success, result = await run_blocking(
+            db.read_user_record,
+            user_id, start_date=start_date, end_date=end_date, category=category, fields=fields
+        )
+        next_cursor = None
+    else:
+        success, result = await run_blocking(
+            db.read_user_record_page,
+            user_id,
+            limit=limit,
+            start_date=start_date,
+            end_date=end_date,
+            category=category,
+            cursor=cursor,
+            fields=fields,
+        )
+        if success:
+            result, next_cursor = result["records"], result["next_cursor"]
+
+    if not success:
+        print(f"[ERROR] Database error: {result}")
+        status_code = 400 if result == "Invalid cursor" else 500
+        raise HTTPException(status_code=status_code, detail=f"Database Error: {result}")
+
+    def encode():
+        payload = {
+            "status": "success",
+            "data": to_columns(result, fields) if layout == "columns" else result,
+            "next_cursor": next_cursor,
+        }
+        return encode_response(payload, response_format, accepts_gzip(accept_encoding))
+
+    body, media_type, headers = await run_blocking(encode)
+    return Response(content=body, media_type=media_type, headers=headers)
+
 # Update expense data from user 
 @app.put("/expense/{record_id}")
-async def update_expense_data(record_id: str, data: dict, user_id: str = Depends(get_current_user_id)):
-    success, result = db_client.update_user_record(user_id, record_id, data)
+async def update_expense_data(record_id: str, data: dict, user_id: str = Depends(get_current_user_id), db: Database = Depends(get_db)):
+    success, result = await run_blocking(db.update_user_record, user_id, record_id, data)
     
     if not success:
         raise HTTPException(status_code=500, detail=f"Database Error: {result}")
@@ -181,8 +582,8 @@ async def update_expense_data(record_id: str, data: dict, user_id: str = Depends
 
 # Delete expense from user 
 @app.delete("/expense/{record_id}")
-async def delete_expense_data(record_id: str, user_id: str = Depends(get_current_user_id)):
-    success, result = db_client.delete_user_record(user_id, record_id)
+async def delete_expense_data(record_id: str, user_id: str = Depends(get_current_user_id), db: Database = Depends(get_db)):
+    success, result = await run_blocking(db.delete_user_record, user_id, record_id)
     
     if not success:
         raise HTTPException(status_code=500, detail=f"Database Error: {result}")
@@ -193,8 +594,8 @@ async def delete_expense_data(record_id: str, user_id: str = Depends(get_current
 
 # Get user information 
 @app.get("/user_data")
-async def get_user_info(user_id: str = Depends(get_current_user_id)):
-    success, result = db_client.get_user_info(user_id)
+async def get_user_info(user_id: str = Depends(get_current_user_id), db: Database = Depends(get_db)):
+    success, result = await run_blocking(db.get_user_info, user_id)
     
     if not success:
         status_code = 404 if result == "User not found" else 500
@@ -207,7 +608,7 @@ async def get_user_info(user_id: str = Depends(get_current_user_id)):
 
 # Update user information
 @app.put("/user_data")
-async def update_user_info(body: UserUpdate, user_id: str = Depends(get_current_user_id)):
+async def update_user_info(body: UserUpdate, user_id: str = Depends(get_current_user_id), db: Database = Depends(get_db)):
     # Filter out None values to only update provided fields
     body_dict = body.model_dump()
     update_data = {k: v for k, v in body_dict.items() if v is not None}
@@ -215,7 +616,7 @@ async def update_user_info(body: UserUpdate, user_id: str = Depends(get_current_
     if not update_data:
         raise HTTPException(status_code=400, detail="No data provided for update")
         
-    success, result = db_client.update_user_info(user_id, update_data)
+    success, result = await run_blocking(db.update_user_info, user_id, update_data)
     
     if not success:
         raise HTTPException(status_code=500, detail=f"Database Error: {result}")
@@ -226,38 +627,174 @@ async def update_user_info(body: UserUpdate, user_id: str = Depends(get_current_
     }
 
 # 聊天端口 讓ai讀取紀錄和使用者問題並回應
-@app.post("/expense/chat")
-async def chat_about_expenses(request: ChatRequestModel, user_id: str = Depends(get_current_user_id)):
-    """Answer an expense question with the browser-managed conversation context."""
+async def _chat_request_context(request: ChatRequestModel, user_id: str, db: Database):
+    """Validate a chat request and build (question, expense_context, history) for Gemini."""
     question = request.message.strip()
     if not question:
         raise HTTPException(status_code=400, detail="A question is required.")
 
-    user_success, user_info = db_client.get_user_info(user_id)
+    user_success, user_info = await run_blocking(db.get_user_info, user_id)
     if not user_success:
         raise HTTPException(status_code=404, detail=f"User not found: {user_id}")
 
-    expenses_success, expenses = db_client.read_user_record(user_id)
-    if not expenses_success:
-        raise HTTPException(status_code=500, detail=f"Database Error: {expenses}")
-
+    # Aggregates + question-relevant records instead of the whole history (see chat_context)
     history = [message.model_dump() for message in request.history]
-    success, answer = expense_parser.answer_expense_question(
+    context_success, result = await run_blocking(
+        build_chat_context,
+        db,
+        user_id,
+        user_info,
+        question,
+        history,
+        Date.today(),
+    )
+    if not context_success:
+        raise HTTPException(status_code=500, detail=result)
+    expense_context, history = result
+    return question, expense_context, history
+
+@app.post("/expense/chat")
+async def chat_about_expenses(
+    request: ChatRequestModel,
+    user_id: str = Depends(get_current_user_id),
+    db: Database = Depends(get_db),
+    parser: GeminiParser = Depends(get_parser),
+):
+    """Answer an expense question with the browser-managed conversation context."""
+    question, expense_context, history = await _chat_request_context(request, user_id, db)
+
+    success, answer = await run_blocking(
+        parser.answer_expense_question,
         question=question,
         history=history,
-        expenses=expenses,
-        user_info=user_info,
+        expense_context=expense_context,
     )
     if not success:
         raise HTTPException(status_code=500, detail=answer)
 
     return {"status": "success", "answer": answer}
 
+# Same request as /expense/chat, answered as Server-Sent Events while Gemini generates it.
+# Events and the time-to-first-token report are described in app/core/chat_stream.py.
+@app.post("/expense/chat/stream")
+async def stream_chat_about_expenses(
+    request: ChatRequestModel,
+    user_id: str = Depends(get_current_user_id),
+    db: Database = Depends(get_db),
+    parser: GeminiParser = Depends(get_parser),
+):
+    started = time.perf_counter()
+    # Validation and context errors are still plain HTTP errors, before the stream starts
+    question, expense_context, history = await _chat_request_context(request, user_id, db)
+
+    chunks = parser.stream_expense_question(
+        question=question,
+        history=history,
+        expense_context=expense_context,
+    )
+    return StreamingResponse(
+        stream_chat_events(chunks, started),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS,
+    )
+
+# Period report: week / month / ytd / custom, compared with the previous window.
+# `trend` adds the totals of the last N windows; every window is computed in one scan.
+MAX_REPORT_TREND = 36
+
+@app.get("/report")
+async def get_period_report(
+    period: str = "month",
+    date: Optional[str] = None,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    trend: int = Query(0, ge=0, le=MAX_REPORT_TREND),
+    user_id: str = Depends(get_current_user_id),
+    db: Database = Depends(get_db),
+):
+    if period not in REPORT_PERIODS:
+        raise HTTPException(status_code=400, detail=f"period must be one of: {', '.join(REPORT_PERIODS)}.")
+    try:
+        reference_date = Date.fromisoformat(date) if date else Date.today()
+        start_date = Date.fromisoformat(start) if start else None
+        end_date = Date.fromisoformat(end) if end else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="date, start and end must use YYYY-MM-DD format.")
+    if period == "custom":
+        if start_date is None or end_date is None or end_date < start_date:
+            raise HTTPException(status_code=400, detail="custom period needs start <= end.")
+        reference_date = end_date
+
+    user_success, user_info = await run_blocking(db.get_user_info, user_id)
+    if not user_success:
+        raise HTTPException(status_code=404, detail=f"User not found: {user_id}")
+
+    # Cached report columns when the expense cache is warm; otherwise only the span
+    # covered by the windows is read (pushed down to Firestore)
+    windows = period_windows(period, reference_date, max(trend, 2), start=start_date, end=end_date)
+    expenses_success, expenses = await run_blocking(
+        db.read_expense_columns,
+        user_id,
+        start_date=windows[0][0].isoformat(),
+        end_date=windows[-1][1].isoformat(),
+    )
+    if not expenses_success:
+        raise HTTPException(status_code=500, detail=f"Database Error: {expenses}")
+
+    report = await run_blocking(
+        build_period_report,
+        expenses=expenses,
+        period=period,
+        reference_date=reference_date,
+        primary_currency=user_info.get("currency") or "USD",
+        trend=trend,
+        start=start_date,
+        end=end_date,
+    )
+    return {
+        "status": "success",
+        "data": report,
+    }
+
+# Get pre-aggregated monthly rollups (per-category and per-day sums per currency)
+@app.get("/rollups")
+async def get_rollups(start: str, end: str, user_id: str = Depends(get_current_user_id), db: Database = Depends(get_db)):
+    for value in (start, end):
+        try:
+            Date.fromisoformat(f"{value}-01")
+        except ValueError:
+            raise HTTPException(status_code=400, detail="start and end must use YYYY-MM format.")
+    user_success, user_info = await run_blocking(db.get_user_info, user_id)
+    if not user_success:
+        raise HTTPException(status_code=404, detail=f"User not found: {user_id}")
+    if not user_info.get("rollups_built"):
+        await run_blocking(db.rebuild_rollups, user_id)
+
+    success, result = await run_blocking(db.read_rollups, user_id, start, end)
+    if not success:
+        raise HTTPException(status_code=500, detail=f"Database Error: {result}")
+    return {
+        "status": "success",
+        "data": result,
+    }
+
+# Recompute the current user's rollups from raw expenses (repairs drift)
+@app.post("/rollups/rebuild")
+async def rebuild_rollups(user_id: str = Depends(get_current_user_id), db: Database = Depends(get_db)):
+    success, result = await run_blocking(db.rebuild_rollups, user_id)
+    if not success:
+        raise HTTPException(status_code=500, detail=f"Database Error: {result}")
+    return {
+        "status": "success",
+        "message": f"Rebuilt {result} monthly rollups",
+    }
+
 # Generate and save weekly report
 @app.post("/report/weekly/generate")
 async def generate_and_save_weekly_report(
     request: WeeklyReportRequest,
-    user_id: str = Depends(get_current_user_id)
+    user_id: str = Depends(get_current_user_id),
+    db: Database = Depends(get_db),
 ):
     try:
         reference_date = (
@@ -270,38 +807,36 @@ async def generate_and_save_weekly_report(
             status_code=400,
             detail="date must use YYYY-MM-DD format.",
         )
-    user_success, user_info = db_client.get_user_info(user_id)
+    user_success, user_info = await run_blocking(db.get_user_info, user_id)
     if not user_success:
         raise HTTPException(
             status_code=404,
             detail=f"User not found: {user_id}",
         )
-    expenses_success, expenses = db_client.read_user_record(user_id)
-    if not expenses_success:
-        raise HTTPException(
-            status_code=500,
-            detail=f"Database Error: {expenses}",
-        )
-    primary_currency = user_info.get("currency") or "USD"
-    report = build_weekly_report(
-        expenses=expenses,
-        reference_date=reference_date,
-        primary_currency=primary_currency,
-    )
     recipient_email = request.recipient_email or user_info.get("email")
-    save_success, result = db_client.save_weekly_report(
-        user_id=user_id,
-        report=report,
-        recipient_email=recipient_email,
+    report_success, report = await run_blocking(
+        generate_weekly_report,
+        db,
+        user_id,
+        user_info,
+        reference_date,
+        recipient_email,
     )
-    if not save_success:
+    if not report_success:
         raise HTTPException(
             status_code=500,
-            detail=f"Database Error: {result}",
+            detail=report,
         )
 
     # Send weekly report email
-    email_success, email_msg = send_weekly_report_email(recipient_email, report)
+    email_success, email_msg = await run_blocking(send_weekly_report_email, recipient_email, report)
+    await run_blocking(
+        db.mark_weekly_report_email,
+        user_id,
+        report["week_start"],
+        "sent" if email_success else "failed",
+        email_msg,
+    )
     if not email_success:
         return {
             "status": "success",
@@ -316,6 +851,41 @@ async def generate_and_save_weekly_report(
     }
 
 
+# Scheduled fan-out for Cloud Scheduler: deliver the weekly report to every subscribed user.
+# Authenticated with the shared SCHEDULER_TOKEN instead of a Firebase user token.
+# Each call works for at most `max_seconds`, checkpoints, and returns "partial" if
+# there is more to do; calling again resumes and never re-sends a finished user.
+# The default stays well below Cloud Scheduler's 180s attempt deadline, so a run isn't still
+# going when the scheduler retries; an overlapping call gets status "busy" (see the run lease).
+SCHEDULER_TOKEN = os.getenv("SCHEDULER_TOKEN")
+
+@app.post("/internal/weekly-reports/run")
+async def run_scheduled_weekly_reports(
+    date: Optional[str] = None,
+    max_seconds: float = Query(150, gt=0, le=3300),
+    workers: Optional[int] = Query(None, ge=1, le=64),
+    x_scheduler_token: Optional[str] = Header(None),
+    db: Database = Depends(get_db),
+):
+    if not SCHEDULER_TOKEN or not hmac.compare_digest((x_scheduler_token or "").encode(), SCHEDULER_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Invalid scheduler token")
+    try:
+        reference_date = Date.fromisoformat(date) if date else last_completed_week(Date.today())
+    except ValueError:
+        raise HTTPException(status_code=400, detail="date must use YYYY-MM-DD format.")
+
+    options = {"max_seconds": max_seconds}
+    if workers:
+        options["workers"] = workers
+    success, result = await run_blocking(run_weekly_report_fanout, db, reference_date, **options)
+    if not success:
+        raise HTTPException(status_code=500, detail=f"Database Error: {result}")
+    return {
+        "status": "success",
+        "data": result,
+    }
+
+
 # test case if you want
 # 1. I spent 50 dollars on groceries yesterday.
 # 2. Bought a new laptop for 1200 USD last week.
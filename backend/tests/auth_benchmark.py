@@ -0,0 +1,85 @@
+"""
+Microbenchmark of the get_current_user_id dependency with the token cache on and off.
+
+Firebase's network key fetch is taken out of the picture: tokens are signed with a
+local RSA key and verified with google.auth.jwt.decode against that key, which is
+the same signature check firebase_admin runs once its certificates are cached.
+"""
+import asyncio
+import os
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from google.auth import crypt, jwt
+
+from app.core import auth as token_auth
+from app.main import get_current_user_id
+
+ITERATIONS = 2000
+PROJECT_ID = "bench-project"
+
+
+def make_signed_token():
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    private_pem = private_key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    )
+    public_pem = private_key.public_key().public_bytes(
+        serialization.Encoding.PEM,
+        serialization.PublicFormat.SubjectPublicKeyInfo,
+    )
+    signer = crypt.RSASigner.from_string(private_pem, key_id="bench-key")
+    now = int(time.time())
+    payload = {
+        "iss": f"https://securetoken.google.com/{PROJECT_ID}",
+        "aud": PROJECT_ID,
+        "sub": "bench_user",
+        "iat": now,
+        "exp": now + 3600,
+    }
+    token = jwt.encode(signer, payload).decode("utf-8")
+    return token, {"bench-key": public_pem}
+
+
+def run_dependency(header, iterations):
+    async def loop():
+        start = time.perf_counter()
+        for _ in range(iterations):
+            await get_current_user_id(header)
+        return time.perf_counter() - start
+    return asyncio.run(loop())
+
+
+def main():
+    token, certs = make_signed_token()
+
+    def local_verify(id_token):
+        claims = jwt.decode(id_token, certs=certs, audience=PROJECT_ID)
+        claims["uid"] = claims["sub"]
+        return claims
+
+    token_auth.firebase_auth.verify_id_token = local_verify
+    header = f"Bearer {token}"
+
+    for enabled in (False, True):
+        token_auth.TOKEN_CACHE_ENABLED = enabled
+        elapsed = run_dependency(header, ITERATIONS)
+        label = "on " if enabled else "off"
+        print(
+            f"token cache {label}: {ITERATIONS} calls in {elapsed:.3f}s "
+            f"({elapsed / ITERATIONS * 1e6:.1f} us/call)"
+        )
+    print(f"cache stats: {token_auth.token_cache.stats()}")
+
+
+if __name__ == "__main__":
+    main()
+
+# cd backend
+# PYTHONPATH=. python3 tests/auth_benchmark.py
@@ -0,0 +1,46 @@
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from app.core import auth as token_auth
+
+
+class PrewarmPublicKeysTests(unittest.TestCase):
+    def fake_client(self, calls):
+        return SimpleNamespace(_token_verifier=SimpleNamespace(request=calls.append))
+
+    def test_supported_version_fetches_through_the_verifier(self):
+        calls = []
+        with mock.patch.object(token_auth.firebase_admin, "__version__", "7.7.0"), \
+                mock.patch.object(token_auth, "get_firebase_app"), \
+                mock.patch.object(token_auth.firebase_auth, "_get_client", return_value=self.fake_client(calls)):
+            self.assertEqual(token_auth.prewarm_public_keys(), (True, "Public keys refreshed"))
+        self.assertEqual(len(calls), 1)
+        self.assertIn("securetoken@system.gserviceaccount.com", calls[0])
+
+    def test_unknown_version_is_skipped_silently(self):
+        calls = []
+        with mock.patch.object(token_auth.firebase_admin, "__version__", "99.0.0"), \
+                mock.patch.object(token_auth, "get_firebase_app"), \
+                mock.patch.object(token_auth.firebase_auth, "_get_client", return_value=self.fake_client(calls)), \
+                mock.patch("builtins.print") as printed, \
+                mock.patch.object(token_auth.threading, "Thread") as thread:
+            success, message = token_auth.prewarm_public_keys()
+            token_auth.start_public_key_refresher()
+        self.assertFalse(success)
+        self.assertIn("99.0.0", message)
+        self.assertEqual(calls, [])
+        printed.assert_not_called()
+        thread.assert_not_called()
+
+    def test_verifier_without_a_request_is_skipped(self):
+        with mock.patch.object(token_auth, "get_firebase_app"), \
+                mock.patch.object(token_auth.firebase_auth, "_get_client", return_value=SimpleNamespace()), \
+                mock.patch("builtins.print") as printed:
+            success, _ = token_auth.prewarm_public_keys()
+        self.assertFalse(success)
+        printed.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
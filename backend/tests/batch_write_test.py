@@ -0,0 +1,101 @@
+import asyncio
+import unittest
+
+import httpx
+
+from app.core.database import Database
+from app.main import MAX_BATCH_EXPENSES, app, get_current_user_id, get_db
+from fake_firestore import FakeFirestore
+
+
+def expense(n, day):
+    return {"item": f"Item {n}", "amount": 10 + n, "category": "Food", "date": day, "currency": "TWD", "note": ""}
+
+
+class CreateUserRecordsTests(unittest.TestCase):
+    def setUp(self):
+        self.store = FakeFirestore()
+        self.db = Database(client=self.store)
+
+    def docs(self, collection):
+        prefix = f"users/u1/{collection}/"
+        return [path for path in self.store.docs if path.startswith(prefix) and "/" not in path[len(prefix):]]
+
+    def test_chunk_spanning_hundreds_of_months_stays_under_the_batch_limit(self):
+        # 400 records, one per month since 1990: 400 expense + 400 rollup + 400 index writes
+        records = [expense(n, f"{1990 + n // 12}-{n % 12 + 1:02d}-15") for n in range(400)]
+        commits = self.store.commits
+
+        success, ids = self.db.create_user_records("u1", records)
+
+        self.assertTrue(success, ids)
+        self.assertEqual(len(ids), 400)
+        self.assertEqual(self.store.commits - commits, 3)  # 500 + 500 + 200 operations
+        self.assertEqual(len(self.docs("expenses")), 400)
+        self.assertEqual(len(self.docs("rollups")), 400)
+        self.assertEqual(len(self.docs("dedup")), 400)
+        self.assertEqual(self.store.docs["users/u1/rollups/2023-04"]["currencies"]["TWD"]["total"], 10 + 399)
+
+
+class ExpenseBatchEndpointTests(unittest.TestCase):
+    def setUp(self):
+        self.store = FakeFirestore()
+        database = Database(client=self.store)
+        app.dependency_overrides[get_db] = lambda: database
+        app.dependency_overrides[get_current_user_id] = lambda: "u1"
+
+    def tearDown(self):
+        app.dependency_overrides.clear()
+
+    def post(self, expenses):
+        async def request():
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                return await client.post("/expense/batch", json={"expenses": expenses})
+        return asyncio.run(request())
+
+    def expense_ids(self):
+        return {path.rsplit("/", 1)[-1] for path in self.store.docs if path.startswith("users/u1/expenses/")}
+
+    def test_invalid_rows_are_reported_and_the_rest_saved(self):
+        response = self.post([
+            expense(0, "2026-08-01"),
+            {"item": "No amount", "category": "Food", "date": "2026-08-02"},
+            expense(2, "2026-08-03"),
+            {"item": "Bad amount", "amount": "lots", "category": "Food", "date": "2026-08-04"},
+        ])
+
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(body["message"], "2 of 4 expenses recorded.")
+        self.assertEqual([error["index"] for error in body["errors"]], [1, 3])
+        self.assertEqual(body["errors"][0]["detail"][0]["field"], "amount")
+        self.assertIsNone(body["ids"][1])
+        self.assertIsNone(body["ids"][3])
+        self.assertEqual(self.expense_ids(), {body["ids"][0], body["ids"][2]})
+        self.assertEqual([record["item"] for record in body["data"]], ["Item 0", "Item 2"])
+
+    def test_large_batch_is_written_in_chunks(self):
+        expenses = [expense(n, f"2026-{n % 12 + 1:02d}-10") for n in range(950)]
+        expenses[500] = {"item": "Broken", "amount": 5, "category": "Food"}
+        commits = self.store.commits
+
+        response = self.post(expenses)
+
+        body = response.json()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(body["message"], "949 of 950 expenses recorded.")
+        self.assertEqual(len(self.expense_ids()), 949)
+        self.assertEqual(self.expense_ids(), {record_id for record_id in body["ids"] if record_id})
+        # 949 records in chunks of 400: three commits, each with its rollup and index writes
+        self.assertEqual(self.store.commits - commits, 3)
+        self.assertEqual(body["data"][-1], {**expenses[-1], "id": body["ids"][-1]})
+
+    def test_rejects_empty_and_oversized_batches(self):
+        self.assertEqual(self.post([]).status_code, 400)
+        self.assertEqual(self.post([expense(1, "2026-08-01")] * (MAX_BATCH_EXPENSES + 1)).status_code, 400)
+        self.assertEqual(self.expense_ids(), set())
+
+
+if __name__ == "__main__":
+    unittest.main()
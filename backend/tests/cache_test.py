@@ -0,0 +1,106 @@
+import unittest
+
+from app.core.cache import ExpenseCache, TokenCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class ExpenseCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.cache = ExpenseCache(max_users=2, ttl_seconds=60, clock=self.clock)
+        self.records = [
+            {"id": "a", "item": "Lunch", "amount": 100, "date": "2026-08-10"},
+            {"id": "b", "item": "Train", "amount": 50, "date": "2026-08-11"},
+        ]
+
+    def test_hit_miss_and_ttl_expiry(self):
+        self.assertIsNone(self.cache.get("u1"))
+        self.cache.set("u1", self.records)
+        self.assertEqual(self.cache.get("u1"), self.records)
+
+        # TTL 過期後視為 miss 並計入 eviction
+        self.clock.now = 61
+        self.assertIsNone(self.cache.get("u1"))
+
+        stats = self.cache.stats()
+        self.assertEqual(stats["hits"], 1)
+        self.assertEqual(stats["misses"], 2)
+        self.assertEqual(stats["evictions"], 1)
+
+    def test_lru_eviction(self):
+        self.cache.set("u1", self.records)
+        self.cache.set("u2", self.records)
+        self.cache.get("u1")  # u2 變成最久未使用
+        self.cache.set("u3", self.records)
+
+        self.assertIsNone(self.cache.get("u2"))
+        self.assertIsNotNone(self.cache.get("u1"))
+        self.assertEqual(self.cache.stats()["evictions"], 1)
+
+    def test_update_and_remove_patch_cached_list(self):
+        self.cache.set("u1", self.records)
+        self.cache.update_record("u1", "a", {"amount": 120})
+        self.cache.remove_record("u1", "b")
+
+        self.assertEqual(
+            self.cache.get("u1"),
+            [{"id": "a", "item": "Lunch", "amount": 120, "date": "2026-08-10"}],
+        )
+        # 原本傳入的資料不應被修改
+        self.assertEqual(self.records[0]["amount"], 100)
+
+    def test_derived_value_is_built_once_per_cached_list(self):
+        builds = []
+
+        def build(records):
+            builds.append(len(records))
+            return sum(record["amount"] for record in records)
+
+        self.assertIsNone(self.cache.get_derived("u1", build))
+        self.cache.set("u1", self.records)
+        self.assertEqual(self.cache.get_derived("u1", build), 150)
+        self.assertEqual(self.cache.get_derived("u1", build), 150)
+        self.assertEqual(builds, [2])
+
+        # 寫入後重新計算
+        self.cache.update_record("u1", "a", {"amount": 120})
+        self.assertEqual(self.cache.get_derived("u1", build), 170)
+        self.assertEqual(builds, [2, 2])
+
+    def test_load_racing_with_write_is_not_cached(self):
+        version = self.cache.version()
+        self.cache.invalidate("u1")  # 讀取 Firestore 期間有寫入
+        self.cache.set("u1", self.records, version=version)
+        self.assertIsNone(self.cache.get("u1"))
+
+
+class TokenCacheTests(unittest.TestCase):
+    def test_entry_expires_at_token_exp(self):
+        clock = FakeClock()
+        cache = TokenCache(clock=clock)
+        cache.set("token-1", {"uid": "u1", "exp": 100})
+
+        clock.now = 99
+        self.assertEqual(cache.get("token-1")["uid"], "u1")
+        clock.now = 100
+        self.assertIsNone(cache.get("token-1"))
+
+    def test_already_expired_token_is_not_cached(self):
+        clock = FakeClock()
+        clock.now = 50
+        cache = TokenCache(clock=clock)
+        cache.set("token-1", {"uid": "u1", "exp": 10})
+        self.assertEqual(cache.stats()["size"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
+
+# PYTHONPATH=. python3 tests/cache_test.py
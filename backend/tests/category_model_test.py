@@ -0,0 +1,144 @@
+import unittest
+from datetime import date
+from unittest import mock
+
+from app.core.category_model import (
+    CategoryModel,
+    CategoryModelCache,
+    apply_category_model,
+    build_model,
+    model_deltas,
+    tokens_to_prune,
+)
+from app.core.database import Database
+from app.core.local_parser import LOCAL_PARSE_MIN_CONFIDENCE, parse_locally
+from fake_firestore import FakeFirestore
+
+CATEGORIES = ["Food", "Transport", "Shopping", "Bills", "Entertainment", "Others"]
+TODAY = date(2026, 8, 19)
+
+
+def history(*pairs):
+    return [{"item": item, "category": category} for item, category in pairs]
+
+
+class CategoryModelTests(unittest.TestCase):
+    def test_deltas_count_merchants_and_words(self):
+        deltas = model_deltas(added=history(("Dentist visit", "Bills")))
+        self.assertEqual(deltas["categories"], {"Bills": 1})
+        self.assertEqual(set(deltas["tokens"]), {"=dentist visit", "dentist", "visit"})
+
+    def test_unchanged_update_has_no_deltas(self):
+        record = {"item": "bus", "category": "Transport", "amount": 15}
+        deltas = model_deltas(added=[{**record, "amount": 20}], removed=[record])
+        self.assertEqual(deltas, {"categories": {}, "tokens": {}})
+
+    def test_merchant_match_wins(self):
+        model = CategoryModel(build_model(history(
+            ("dentist", "Bills"), ("dentist", "Bills"), ("dentist", "Bills"), ("dentist", "Others"),
+        )))
+        self.assertEqual(model.predict("Dentist", CATEGORIES), ("Bills", 0.75))
+
+    def test_words_generalise_to_new_items(self):
+        model = CategoryModel(build_model(history(
+            ("7-eleven snacks", "Food"), ("7-eleven drinks", "Food"), ("7-eleven bread", "Food"),
+            ("uber home", "Transport"), ("uber airport", "Transport"),
+        )))
+        category, confidence = model.predict("7-eleven onigiri", CATEGORIES)
+        self.assertEqual(category, "Food")
+        self.assertGreaterEqual(confidence, 0.75)
+
+    def test_no_evidence_and_removed_categories(self):
+        model = CategoryModel(build_model(history(("gym", "Fitness"), ("gym", "Fitness"), ("book", "Shopping"))))
+        # Seen once only
+        self.assertEqual(model.predict("book", CATEGORIES), (None, 0.0))
+        # "Fitness" is no longer one of the user's categories
+        self.assertEqual(model.predict("gym", CATEGORIES), (None, 0.0))
+
+    def test_corrections_shift_the_prediction(self):
+        model = CategoryModel(build_model(history(("costco", "Food"), ("costco", "Food"))))
+        self.assertEqual(model.predict("costco", CATEGORIES)[0], "Food")
+        for _ in range(2):
+            old = {"item": "costco", "category": "Food"}
+            model.apply(model_deltas(added=[{**old, "category": "Shopping"}], removed=[old]))
+        self.assertEqual(model.predict("costco", CATEGORIES), ("Shopping", 1.0))
+
+    def test_apply_overrides_confident_predictions(self):
+        model = CategoryModel(build_model(history(("netflix", "Bills"), ("netflix", "Bills"))))
+        expenses = [
+            {"item": "Netflix", "category": "Entertainment"},
+            {"item": "popcorn", "category": "Food"},
+        ]
+        self.assertEqual(apply_category_model(expenses, model, CATEGORIES), 1)
+        self.assertEqual([e["category"] for e in expenses], ["Bills", "Food"])
+        self.assertEqual(apply_category_model(expenses, None, CATEGORIES), 0)
+
+    def test_local_parser_uses_the_model(self):
+        # Unknown to the keyword table, so the fast path would defer to Gemini
+        self.assertLess(parse_locally("dentist 800", CATEGORIES, "TWD", TODAY)[0], LOCAL_PARSE_MIN_CONFIDENCE)
+
+        model = CategoryModel(build_model(history(("dentist", "Bills"), ("dentist", "Bills"))))
+        confidence, expenses = parse_locally("dentist 800", CATEGORIES, "TWD", TODAY, category_model=model)
+        self.assertGreaterEqual(confidence, LOCAL_PARSE_MIN_CONFIDENCE)
+        self.assertEqual(expenses[0]["category"], "Bills")
+
+    def test_rare_tokens_are_pruned_past_the_cap(self):
+        tokens = {f"w{n}": {"Food": n} for n in range(1, 11)}
+        tokens["gone"] = {"Food": 0}
+        self.assertEqual(tokens_to_prune(tokens, max_tokens=11), [])
+        # Down to 80% of the cap: the emptied key and the least seen go first
+        self.assertEqual(tokens_to_prune(tokens, max_tokens=10), ["gone", "w1", "w2"])
+
+        model = build_model(history(*[(f"item {n}", "Food") for n in range(10)]), max_tokens=10)
+        self.assertEqual(len(model["tokens"]), 8)
+        self.assertIn("item", model["tokens"])
+
+
+class CategoryModelStorageTests(unittest.TestCase):
+    def setUp(self):
+        self.store = FakeFirestore()
+        self.db = Database(client=self.store)
+        self.model_path = "users/u1/models/category"
+        self.expense = {"item": "Lunch box", "amount": 90, "category": "Food", "date": "2026-08-19", "currency": "TWD", "note": ""}
+
+    def test_model_write_failure_does_not_fail_the_expense(self):
+        failing = mock.Mock()
+        failing.set.side_effect = RuntimeError("document too large")
+        with mock.patch.object(self.db, "_category_model_ref", return_value=failing):
+            success, expense_id = self.db.create_user_record("u1", self.expense)
+
+        self.assertTrue(success)
+        self.assertIn(f"users/u1/expenses/{expense_id}", self.store.docs)
+        self.assertNotIn(self.model_path, self.store.docs)
+
+    def test_model_document_stays_bounded(self):
+        self.db.get_category_model("u1")
+        with mock.patch("app.core.database.tokens_to_prune", lambda tokens: tokens_to_prune(tokens, max_tokens=20)):
+            for n in range(12):
+                self.db.create_user_record("u1", {**self.expense, "item": f"shop{n} lunch"})
+
+        tokens = self.store.docs[self.model_path]["tokens"]
+        self.assertLessEqual(len(tokens), 20)
+        self.assertEqual(tokens["lunch"], {"Food": 12})
+        self.assertEqual(set(tokens), set(self.db.get_category_model("u1")[1].tokens))
+
+
+class CategoryModelCacheTests(unittest.TestCase):
+    def test_writes_update_the_cached_model(self):
+        now = [0.0]
+        cache = CategoryModelCache(max_users=1, ttl_seconds=60, clock=lambda: now[0])
+        cache.set("u1", CategoryModel(build_model([])))
+        cache.apply("u1", model_deltas(added=history(("bus", "Transport"), ("bus", "Transport"))))
+        self.assertEqual(cache.get("u1").predict("bus", CATEGORIES)[0], "Transport")
+        # Users without a loaded model are skipped; it is built from Firestore on next use
+        cache.apply("u2", model_deltas(added=history(("bus", "Transport"))))
+        self.assertIsNone(cache.get("u2"))
+
+        cache.set("u2", CategoryModel())
+        self.assertIsNone(cache.get("u1"))
+        now[0] += 61
+        self.assertIsNone(cache.get("u2"))
+
+
+if __name__ == "__main__":
+    unittest.main()
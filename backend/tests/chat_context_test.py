@@ -0,0 +1,123 @@
+import json
+import unittest
+from datetime import date, timedelta
+
+from app.core.chat_context import (
+    CHAT_CONTEXT_TOKEN_BUDGET,
+    build_chat_context,
+    estimate_tokens,
+    question_category,
+    question_date_range,
+    trim_history,
+)
+from app.core.rollups import build_rollups
+
+TODAY = date(2026, 8, 19)
+CATEGORIES = ["Food", "Transport", "Shopping", "Bills", "Entertainment", "Other"]
+
+
+def make_expenses(years: int) -> list[dict]:
+    expenses = []
+    day = TODAY - timedelta(days=365 * years)
+    index = 0
+    while day <= TODAY:
+        for slot in range(3):
+            index += 1
+            expenses.append({
+                "id": f"e{index:06d}",
+                "item": f"Item {index}",
+                "amount": 50 + (index % 40) * 10,
+                "currency": "TWD",
+                "category": CATEGORIES[(index + slot) % len(CATEGORIES)],
+                "date": day.isoformat(),
+                "note": "",
+            })
+        day += timedelta(days=1)
+    return expenses
+
+
+class FakeDatabase:
+    def __init__(self, expenses):
+        self.expenses = expenses
+        self.rollups = list(build_rollups(expenses).values())
+        self.page_calls = []
+
+    def rebuild_rollups(self, user_id):
+        return True, len(self.rollups)
+
+    def read_rollups(self, user_id, start_period, end_period):
+        return True, [r for r in self.rollups if start_period <= r["period"] <= end_period]
+
+    def read_user_record_page(self, user_id, limit, start_date=None, end_date=None, category=None, cursor=None):
+        self.page_calls.append({"limit": limit, "start_date": start_date, "end_date": end_date, "category": category})
+        matching = [
+            e for e in self.expenses
+            if (not category or e["category"] == category)
+            and (not start_date or e["date"] >= start_date)
+            and (not end_date or e["date"] <= end_date)
+        ]
+        matching.sort(key=lambda e: (e["date"], e["id"]), reverse=True)
+        return True, {"records": matching[:limit], "next_cursor": "more" if len(matching) > limit else None}
+
+
+class QuestionScopeTests(unittest.TestCase):
+    def test_date_ranges(self):
+        self.assertEqual(question_date_range("How much did I spend last month?", TODAY), (date(2026, 7, 1), date(2026, 7, 31)))
+        self.assertEqual(question_date_range("上個月花了多少", TODAY), (date(2026, 7, 1), date(2026, 7, 31)))
+        self.assertEqual(question_date_range("spending on 2026-08-03", TODAY), (date(2026, 8, 3), date(2026, 8, 3)))
+        self.assertEqual(question_date_range("what about 2025-02", TODAY), (date(2025, 2, 1), date(2025, 2, 28)))
+        # A month name without a year means its latest occurrence
+        self.assertEqual(question_date_range("December groceries", TODAY), (date(2025, 12, 1), date(2025, 12, 31)))
+        self.assertEqual(question_date_range("3月的餐費", TODAY), (date(2026, 3, 1), date(2026, 3, 31)))
+        self.assertEqual(question_date_range("total for 2024", TODAY), (date(2024, 1, 1), date(2024, 12, 31)))
+        self.assertIsNone(question_date_range("may I save more?", TODAY))
+
+    def test_category_by_name_or_keyword(self):
+        self.assertEqual(question_category("How much on transport?", CATEGORIES), "Transport")
+        self.assertEqual(question_category("How much coffee did I buy", CATEGORIES), "Food")
+        self.assertIsNone(question_category("How am I doing?", CATEGORIES))
+
+    def test_trim_history_keeps_newest_turns(self):
+        history = [{"role": "user" if i % 2 == 0 else "assistant", "content": f"turn {i} " + "x" * 400} for i in range(40)]
+        trimmed = trim_history(history, budget=1000)
+        self.assertLess(len(trimmed), len(history))
+        self.assertEqual(trimmed, history[-len(trimmed):])
+        self.assertLessEqual(sum(estimate_tokens(json.dumps(m)) for m in trimmed), 1000)
+
+
+class BuildChatContextTests(unittest.TestCase):
+    user_info = {"currency": "TWD", "categories": CATEGORIES, "rollups_built": True}
+
+    def context_tokens(self, years: int, question: str):
+        db = FakeDatabase(make_expenses(years))
+        success, (context, _) = build_chat_context(db, "u1", self.user_info, question, [], TODAY)
+        self.assertTrue(success)
+        return db, context, estimate_tokens(json.dumps(context, ensure_ascii=False))
+
+    def test_prompt_size_stays_flat_as_history_grows(self):
+        _, _, three_years = self.context_tokens(3, "How am I doing?")
+        _, context, ten_years = self.context_tokens(10, "How am I doing?")
+
+        # Only the folded yearly totals grow, by one small entry per year
+        self.assertLess(ten_years, three_years * 1.25)
+        self.assertLessEqual(ten_years, CHAT_CONTEXT_TOKEN_BUDGET)
+        self.assertEqual(len(context["monthly_totals"]), 24)
+        self.assertTrue(context["yearly_totals"])
+        self.assertEqual(context["matching_records"], [])
+
+    def test_question_scope_fetches_only_matching_records(self):
+        db, context, _ = self.context_tokens(3, "How much did I spend on Food last month?")
+
+        self.assertEqual(
+            db.page_calls[-1],
+            {"limit": 100, "start_date": "2026-07-01", "end_date": "2026-07-31", "category": "Food"},
+        )
+        self.assertTrue(context["matching_records"])
+        self.assertTrue(all(r["category"] == "Food" and r["date"].startswith("2026-07") for r in context["matching_records"]))
+        # Totals for the window come from rollups even when records are capped
+        expected = sum(e["amount"] for e in db.expenses if e["date"].startswith("2026-07"))
+        self.assertEqual(context["question_scope"]["totals"]["total"], expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
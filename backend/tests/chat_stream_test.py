@@ -0,0 +1,59 @@
+import asyncio
+import json
+import unittest
+
+from app.core.chat_stream import ChatStreamStats, sse_event, stream_chat_events
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+async def fake_chunks(clock, parts, fail_after=None):
+    for index, text in enumerate(parts):
+        if fail_after is not None and index == fail_after:
+            raise RuntimeError("quota exceeded")
+        clock.now += 0.25
+        yield text
+
+
+def collect(chunks, clock, stats):
+    async def run():
+        return [event async for event in stream_chat_events(chunks, 100.0, stats, clock=clock)]
+    return [parse(event) for event in asyncio.run(run())]
+
+
+def parse(event):
+    lines = event.rstrip("\n").split("\n")
+    return lines[0].removeprefix("event: "), json.loads(lines[1].removeprefix("data: "))
+
+
+class ChatStreamTests(unittest.TestCase):
+    def test_sse_framing(self):
+        self.assertEqual(sse_event("token", {"text": "午餐"}), 'event: token\ndata: {"text": "午餐"}\n\n')
+
+    def test_tokens_then_done_with_ttft(self):
+        clock, stats = FakeClock(), ChatStreamStats()
+        events = collect(fake_chunks(clock, ["", "You spent ", "1,200 TWD."]), clock, stats)
+
+        self.assertEqual(events[:2], [("token", {"text": "You spent "}), ("token", {"text": "1,200 TWD."})])
+        self.assertEqual(events[2], ("done", {"ttft_ms": 500.0, "total_ms": 750.0, "chars": 20}))
+        self.assertEqual(stats.stats(), {"streams": 1, "errors": 0, "ttft_ms_p50": 500.0, "ttft_ms_p95": 500.0})
+
+    def test_errors_end_the_stream(self):
+        clock, stats = FakeClock(), ChatStreamStats()
+        events = collect(fake_chunks(clock, ["Partial", "never"], fail_after=1), clock, stats)
+        self.assertEqual(events[0], ("token", {"text": "Partial"}))
+        self.assertEqual(events[1], ("error", {"detail": "Chat response error: quota exceeded"}))
+
+        events = collect(fake_chunks(clock, ["", ""]), clock, stats)
+        self.assertEqual(events, [("error", {"detail": "Gemini returned an empty response."})])
+        self.assertEqual(stats.stats()["errors"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
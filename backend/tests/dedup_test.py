@@ -0,0 +1,58 @@
+import unittest
+
+from app.core.dedup import build_index, candidate_keys, find_duplicates, fingerprint, index_writes
+
+
+def expense(item, amount, day, currency="TWD"):
+    return {"item": item, "amount": amount, "date": day, "currency": currency, "category": "Food"}
+
+
+class DedupIndexTests(unittest.TestCase):
+    def setUp(self):
+        stored = [
+            ("e1", expense("Starbucks Latte", 150, "2026-08-31")),
+            ("e2", expense("Uber", 320, "2026-08-30")),
+        ]
+        self.buckets = {period: doc["buckets"] for period, doc in build_index(stored).items()}
+
+    def test_fingerprint_normalizes_item_amount_and_currency(self):
+        self.assertEqual(
+            fingerprint(expense("Starbucks  latte!", "150.0", "2026-08-31", "twd")),
+            fingerprint(expense("starbucks latte", 150, "2026-08-31")),
+        )
+        self.assertIsNone(fingerprint({"item": "no date", "amount": 1}))
+
+    def test_window_crosses_month_boundaries(self):
+        keys = candidate_keys(expense("coffee", 4.5, "2026-09-01", "USD"))
+        self.assertEqual(keys, [
+            ("2026-08", "2026-08-31|450|USD"),
+            ("2026-09", "2026-09-01|450|USD"),
+            ("2026-09", "2026-09-02|450|USD"),
+        ])
+
+    def test_near_identical_items_within_a_day_match(self):
+        hints = [find_duplicates([record], self.buckets)[0] for record in (
+            expense("starbucks latte", 150, "2026-09-01"),   # logged again the next day
+            expense("Starbucks lattes", 150, "2026-08-31"),  # slightly different text
+            expense("starbucks latte", 155, "2026-08-31"),   # different amount
+            expense("starbucks latte", 150, "2026-09-02"),   # two days later
+            expense("Coffee", 150, "2026-08-31"),            # different item
+        )]
+        self.assertEqual([[match.get("id") for match in matches] for matches in hints], [["e1"], ["e1"], [], [], []])
+        self.assertEqual(hints[0][0], {
+            "id": "e1", "item": "starbucks latte", "date": "2026-08-31", "amount": 150.0, "currency": "TWD",
+        })
+
+    def test_duplicates_within_the_same_batch(self):
+        hints = find_duplicates([expense("Lunch", 120, "2026-08-10"), expense("lunch", 120, "2026-08-11")], {})
+        self.assertEqual(hints[0], [])
+        self.assertEqual(hints[1][0]["index"], 0)
+
+    def test_updates_move_the_entry(self):
+        old = expense("Uber", 320, "2026-08-30")
+        writes = index_writes(added=[("e2", {**old, "amount": 300})], removed=[("e2", old)])
+        self.assertEqual(writes, {"2026-08": {"2026-08-30|32000|TWD": {"e2": None}, "2026-08-30|30000|TWD": {"e2": "uber"}}})
+
+
+if __name__ == "__main__":
+    unittest.main()
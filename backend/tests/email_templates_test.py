@@ -0,0 +1,70 @@
+import unittest
+
+from app.core.email_templates import render_cache, render_weekly_report, report_hash
+
+
+def make_report(**overrides):
+    report = {
+        "week_start": "2026-08-10",
+        "week_end": "2026-08-16",
+        "currency": "TWD",
+        "expense_count": 3,
+        "total": 1580.0,
+        "previous_week_total": 2100.0,
+        "change_amount": -520.0,
+        "change_percent": -24.8,
+        "category_totals": [
+            {"category": "Food", "amount": 680.0},
+            {"category": "Transport", "amount": 400.0},
+        ],
+        "largest_expense": {"item": "Concert Ticket", "amount": 350.0, "date": "2026-08-12", "category": "Entertainment"},
+        "top_spending_day": {"date": "2026-08-15", "amount": 680.0},
+    }
+    report.update(overrides)
+    return report
+
+
+class WeeklyReportTemplateTests(unittest.TestCase):
+    def test_renders_summary_partials_and_text_fallback(self):
+        text, html = render_weekly_report(make_report())
+
+        self.assertIn("Weekly Change: -520.0 TWD (24.8%)", text)
+        self.assertIn("2026-08-10 ~ 2026-08-16", html)
+        self.assertIn(">FOOD<", html)
+        self.assertIn("680.0 TWD", html)
+        self.assertIn("<strong>Concert Ticket</strong> (ENTERTAINMENT)", html)
+        self.assertIn("Top Spending Day", html)
+
+    def test_empty_week_has_no_rows_or_insights(self):
+        text, html = render_weekly_report(make_report(
+            total=0.0, change_amount=0.0, change_percent=None,
+            category_totals=[], largest_expense=None, top_spending_day=None,
+        ))
+
+        self.assertIn("Weekly Change: 0.0 TWD (N/A)", text)
+        self.assertIn("NO EXPENSES RECORDED", html)
+        self.assertNotIn(">Notable Insights</h2>", html)
+
+    def test_user_text_is_escaped_in_html_only(self):
+        largest = {"item": "<b>Fish & Chips</b>", "amount": 10.0, "date": "2026-08-12", "category": "Food"}
+        text, html = render_weekly_report(make_report(largest_expense=largest))
+
+        self.assertIn("&lt;b&gt;Fish &amp; Chips&lt;/b&gt;", html)
+        self.assertNotIn("<b>Fish", html)
+
+    def test_identical_reports_hit_the_render_cache(self):
+        report = make_report(total=1234.5)
+        first = render_weekly_report(report)
+        hits = render_cache.stats()["hits"]
+
+        # Same content in a different key order is the same report
+        reordered = dict(reversed(list(report.items())))
+        self.assertEqual(report_hash(reordered), report_hash(report))
+        self.assertIs(render_weekly_report(reordered), first)
+        self.assertEqual(render_cache.stats()["hits"], hits + 1)
+
+        self.assertIsNot(render_weekly_report(make_report(total=1234.6)), first)
+
+
+if __name__ == "__main__":
+    unittest.main()
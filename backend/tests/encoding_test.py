@@ -0,0 +1,84 @@
+import asyncio
+import gzip
+import json
+import unittest
+from datetime import datetime, timezone
+
+import httpx
+import msgpack
+
+from app.core.database import Database
+from app.core.encoding import accepts_gzip, encode_response, negotiate_format
+from app.core.projection import from_columns
+from app.main import app, get_current_user_id, get_db
+from fake_firestore import FakeFirestore
+
+
+class NegotiationTests(unittest.TestCase):
+    def test_query_parameter_wins_over_accept(self):
+        self.assertEqual(negotiate_format("json", "application/msgpack"), (True, "json"))
+        self.assertEqual(negotiate_format(None, "application/x-msgpack, */*;q=0.1"), (True, "msgpack"))
+        self.assertEqual(negotiate_format(None, "application/json, text/plain, */*"), (True, "json"))
+        self.assertFalse(negotiate_format("arrow", None)[0])
+
+    def test_gzip_quality_values(self):
+        self.assertTrue(accepts_gzip("gzip, deflate, br"))
+        self.assertTrue(accepts_gzip("br;q=1.0, *;q=0.5"))
+        self.assertFalse(accepts_gzip("gzip;q=0"))
+        self.assertFalse(accepts_gzip("identity"))
+        self.assertFalse(accepts_gzip(None))
+
+    def test_small_bodies_are_not_compressed(self):
+        created = datetime(2026, 8, 1, 12, 30, tzinfo=timezone.utc)
+        body, media_type, headers = encode_response({"created_at": created}, "json", gzip_ok=True)
+        self.assertEqual(json.loads(body), {"created_at": "2026-08-01T12:30:00+00:00"})
+        self.assertEqual(media_type, "application/json")
+        self.assertNotIn("Content-Encoding", headers)
+
+
+class ExpenseEndpointTests(unittest.TestCase):
+    def setUp(self):
+        store = FakeFirestore()
+        for n in range(200):
+            store.docs[f"users/u1/expenses/e{n:03d}"] = {
+                "item": f"Lunch {n}", "amount": n + 0.5, "category": ["Food", "Bills"][n % 2],
+                "date": f"2026-08-{n % 28 + 1:02d}", "currency": "TWD", "note": "",
+            }
+        database = Database(client=store)
+        app.dependency_overrides[get_db] = lambda: database
+        app.dependency_overrides[get_current_user_id] = lambda: "u1"
+
+    def tearDown(self):
+        app.dependency_overrides.clear()
+
+    def get(self, params=None, headers=None):
+        async def request():
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                return await client.get("/expense", params=params, headers=headers or {})
+        return asyncio.run(request())
+
+    def test_default_response_is_unchanged_json(self):
+        response = self.get(headers={"Accept-Encoding": "identity"})
+        self.assertEqual(response.headers["content-type"], "application/json")
+        self.assertNotIn("content-encoding", response.headers)
+        self.assertEqual(response.json()["data"][3]["item"], "Lunch 3")
+
+    def test_msgpack_columns_gzipped(self):
+        response = self.get(
+            params={"layout": "columns"},
+            headers={"Accept": "application/msgpack", "Accept-Encoding": "gzip"},
+        )
+        self.assertEqual(response.headers["content-type"], "application/msgpack")
+        self.assertEqual(response.headers["content-encoding"], "gzip")
+        payload = msgpack.unpackb(response.content)  # httpx already gunzipped the body
+        self.assertEqual(payload["data"]["category"]["values"], ["Food", "Bills"])
+        self.assertEqual(from_columns(payload["data"])[3]["item"], "Lunch 3")
+        self.assertLess(int(response.headers["content-length"]), len(gzip.compress(self.get().content)))
+
+    def test_unknown_format_is_rejected(self):
+        self.assertEqual(self.get(params={"format": "arrow"}).status_code, 400)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,370 @@
+"""
+In-memory stand-in for the subset of the Firestore client that Database uses, for tests
+and benchmarks that run without the emulator. Counts document reads the way Firestore
+bills them: one per document returned, and one for a get or query that returns nothing.
+With latency set, every round trip (get, query, batch commit) sleeps that many seconds,
+and write_latency adds a per-write cost to batch commits, which makes concurrent commits
+measurable in benchmarks.
+"""
+import bisect
+import itertools
+import threading
+import time
+from datetime import datetime, timezone
+
+from firebase_admin import firestore
+
+_auto_ids = itertools.count(1)
+
+
+def _clone(value):
+    if isinstance(value, dict):
+        return {key: _clone(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_clone(item) for item in value]
+    return value
+
+
+class _Documents(dict):
+    """{document path: data}, indexed by parent collection so queries don't scan everything."""
+
+    def __init__(self):
+        super().__init__()
+        self.collections = {}
+
+    def __setitem__(self, path, data):
+        self.collections.setdefault(path.rsplit("/", 1)[0], set()).add(path)
+        super().__setitem__(path, data)
+
+    def setdefault(self, path, default=None):
+        if path not in self:
+            self[path] = default
+        return self[path]
+
+    def pop(self, path, *default):
+        self.collections.get(path.rsplit("/", 1)[0], set()).discard(path)
+        return super().pop(path, *default)
+
+    def __delitem__(self, path):
+        self.pop(path)
+
+
+def _resolve(value, current=None):
+    if value is firestore.SERVER_TIMESTAMP:
+        return datetime.now(timezone.utc)
+    if isinstance(value, firestore.Increment):
+        return (current or 0) + value.value
+    if isinstance(value, dict):
+        return {key: _resolve(item) for key, item in value.items()}
+    return _clone(value)
+
+
+def _merge(target: dict, data: dict):
+    for key, value in data.items():
+        if value is firestore.DELETE_FIELD:
+            target.pop(key, None)
+        elif isinstance(value, dict) and isinstance(target.get(key), dict):
+            _merge(target[key], value)
+        elif isinstance(value, dict):
+            target[key] = {}
+            _merge(target[key], value)
+        else:
+            target[key] = _resolve(value, target.get(key))
+
+
+def _field(data: dict, path: str):
+    for part in path.split("."):
+        if not isinstance(data, dict) or part not in data:
+            return None
+        data = data[part]
+    return data
+
+
+class FakeSnapshot:
+    def __init__(self, reference, data):
+        self.reference = reference
+        self.id = reference.id
+        self._data = data
+
+    @property
+    def exists(self):
+        return self._data is not None
+
+    def to_dict(self):
+        return _clone(self._data)
+
+    def get(self, field):
+        return _field(self._data or {}, field)
+
+
+class FakeDocumentReference:
+    def __init__(self, store, path):
+        self._store = store
+        self.path = path
+        self.id = path.rsplit("/", 1)[-1]
+
+    def collection(self, name):
+        return FakeCollectionReference(self._store, f"{self.path}/{name}")
+
+    def get(self, transaction=None):
+        self._store.round_trip()
+        self._store.reads += 1
+        return FakeSnapshot(self, _clone(self._store.docs.get(self.path)))
+
+    def set(self, data, merge=False):
+        if merge:
+            _merge(self._store.docs.setdefault(self.path, {}), data)
+        else:
+            self._store.docs[self.path] = {}
+            _merge(self._store.docs[self.path], data)
+        self._store.writes += 1
+
+    def update(self, data):
+        if self.path not in self._store.docs:
+            raise KeyError(f"No document to update: {self.path}")
+        for dotted, value in data.items():
+            *parents, leaf = dotted.split(".")
+            target = self._store.docs[self.path]
+            for part in parents:
+                target = target.setdefault(part, {})
+            if value is firestore.DELETE_FIELD:
+                target.pop(leaf, None)
+            else:
+                target[leaf] = _resolve(value, target.get(leaf))  # the field is replaced, not merged
+        self._store.writes += 1
+
+    def delete(self):
+        self._store.docs.pop(self.path, None)
+        self._store.writes += 1
+
+
+class FakeQuery:
+    def __init__(self, store, path, filters=(), fields=None, orders=(), limit=None, start_after=None):
+        self._store = store
+        self._path = path
+        self._filters = tuple(filters)
+        self._fields = fields
+        self._orders = tuple(orders)
+        self._limit = limit
+        self._start_after = start_after
+
+    def _copy(self, **changes):
+        state = {
+            "filters": self._filters, "fields": self._fields, "orders": self._orders,
+            "limit": self._limit, "start_after": self._start_after, **changes,
+        }
+        return FakeQuery(self._store, self._path, **state)
+
+    def where(self, field, op, value):
+        return self._copy(filters=self._filters + ((field, op, value),))
+
+    def select(self, fields):
+        return self._copy(fields=list(fields))
+
+    def order_by(self, field, direction=firestore.Query.ASCENDING):
+        return self._copy(orders=self._orders + ((field, direction),))
+
+    def limit(self, count):
+        return self._copy(limit=count)
+
+    def start_after(self, values):
+        return self._copy(start_after=values)
+
+    def _sort_key(self, path, data):
+        return tuple(
+            path.rsplit("/", 1)[-1] if field == "__name__" else _field(data, field)
+            for field, _ in self._orders
+        )
+
+    def _paged_by_id(self):
+        """Fast path for the unfiltered ID-ordered pagination query: bisect instead of scanning."""
+        with self._store.lock:
+            paths = sorted(self._store.docs.collections.get(self._path, ()))
+            start = 0
+            if self._start_after is not None:
+                cursor = self._start_after
+                cursor = cursor.id if isinstance(cursor, FakeSnapshot) else cursor["__name__"]
+                start = bisect.bisect_right(paths, f"{self._path}/{cursor}")
+            end = len(paths) if self._limit is None else start + self._limit
+            return [(path, self._store.docs[path]) for path in paths[start:end]]
+
+    def stream(self):
+        if not self._filters and self._orders == (("__name__", firestore.Query.ASCENDING),):
+            matches = self._paged_by_id()
+        else:
+            matches = self._scan()
+        self._store.round_trip()
+        self._store.reads += max(1, len(matches))
+        for path, data in matches:
+            if self._fields is not None:
+                data = {field: _field(data, field) for field in self._fields if _field(data, field) is not None}
+            yield FakeSnapshot(FakeDocumentReference(self._store, path), _clone(data))
+
+    def _scan(self):
+        with self._store.lock:
+            # Firestore returns documents in ID order unless the query orders them otherwise
+            docs = [(path, self._store.docs[path]) for path in sorted(self._store.docs.collections.get(self._path, ()))]
+        matches = [
+            (path, data) for path, data in docs
+            if all(_matches(_field(data, field), op, value) for field, op, value in self._filters)
+        ]
+        descending = [direction == firestore.Query.DESCENDING for _, direction in self._orders]
+        for position in reversed(range(len(self._orders))):
+            matches.sort(key=lambda match: self._sort_key(*match)[position], reverse=descending[position])
+        if self._start_after is not None:
+            values = self._start_after
+            if isinstance(values, FakeSnapshot):
+                values = [values.id if field == "__name__" else values.get(field) for field, _ in self._orders]
+            elif isinstance(values, dict):
+                values = [values[field] for field, _ in self._orders]
+            cursor = tuple(values)
+            matches = [
+                match for match in matches
+                if _after(self._sort_key(*match), cursor, descending)
+            ]
+        if self._limit is not None:
+            matches = matches[:self._limit]
+        return matches
+
+    def get(self):
+        return list(self.stream())
+
+    def count(self):
+        return FakeAggregationQuery(self)
+
+
+class FakeAggregationQuery:
+    def __init__(self, query):
+        self._query = query
+
+    def get(self):
+        store = self._query._store
+        reads = store.reads
+        count = sum(1 for _ in self._query.stream())
+        store.reads = reads + 1 + count // 1000  # billed per 1000 index entries
+        return [[_AggregationResult(count)]]
+
+
+class _AggregationResult:
+    def __init__(self, value):
+        self.value = value
+
+
+def _matches(actual, op, expected):
+    if op == "==":
+        return actual == expected
+    if actual is None:
+        return False
+    return {
+        ">=": actual >= expected, "<=": actual <= expected,
+        ">": actual > expected, "<": actual < expected,
+    }[op]
+
+
+def _after(key, cursor, descending):
+    for value, bound, reverse in zip(key, cursor, descending):
+        if value != bound:
+            return value < bound if reverse else value > bound
+    return False
+
+
+class FakeCollectionReference(FakeQuery):
+    def __init__(self, store, path):
+        super().__init__(store, path)
+        self.id = path.rsplit("/", 1)[-1]
+
+    def document(self, document_id=None):
+        return FakeDocumentReference(self._store, f"{self._path}/{document_id or f'auto{next(_auto_ids)}'}")
+
+    def list_documents(self):
+        return [
+            FakeDocumentReference(self._store, path) for path in list(self._store.docs.collections.get(self._path, ()))
+        ]
+
+
+class FakeWriteBatch:
+    def __init__(self, store):
+        self._store = store
+        self._writes = []
+
+    def set(self, reference, data, merge=False):
+        self._writes.append(lambda: reference.set(data, merge=merge))
+
+    def update(self, reference, data):
+        self._writes.append(lambda: reference.update(data))
+
+    def delete(self, reference):
+        self._writes.append(reference.delete)
+
+    def commit(self):
+        if len(self._writes) > 500:
+            raise ValueError("A write batch can contain at most 500 operations")
+        self._store.round_trip(writes=len(self._writes))
+        with self._store.lock:
+            for write in self._writes:
+                write()
+            self._store.commits += 1
+        self._writes = []
+
+
+class FakeTransaction(FakeWriteBatch):
+    """
+    Transaction for firestore.transactional: transactions run one at a time (a real one
+    would be retried on contention instead), and their writes apply on commit.
+    """
+
+    _read_only = False
+    _max_attempts = 1
+    _id = b"fake"
+
+    def _clean_up(self):
+        self._writes = []
+
+    def _begin(self, retry_id=None):
+        self._store.transaction_lock.acquire()
+        self._locked = True
+
+    def _end(self):
+        if getattr(self, "_locked", False):
+            self._locked = False
+            self._store.transaction_lock.release()
+
+    def _commit(self):
+        try:
+            self.commit()
+        finally:
+            self._end()
+
+    def _rollback(self):
+        self._writes = []
+        self._end()
+
+
+class FakeFirestore:
+    def __init__(self, latency=0.0, write_latency=0.0):
+        self.docs = _Documents()  # "users/u1/expenses/e1" -> data
+        self.latency = latency
+        self.write_latency = write_latency
+        self.lock = threading.Lock()
+        self.transaction_lock = threading.Lock()
+        self.reads = 0
+        self.writes = 0
+        self.commits = 0
+
+    def round_trip(self, writes=0):
+        delay = self.latency + self.write_latency * writes
+        if delay:
+            time.sleep(delay)
+
+    def collection(self, path):
+        return FakeCollectionReference(self, path)
+
+    def batch(self):
+        return FakeWriteBatch(self)
+
+    def transaction(self):
+        return FakeTransaction(self)
+
+    def get_all(self, references):
+        for reference in references:
+            yield reference.get()
@@ -0,0 +1,93 @@
+"""
+Benchmark: GET /expense payload for a 10k-row history in each response encoding.
+
+Encodes the same synthetic history (Firestore-style 20-character IDs, created_at
+timestamps, mostly empty notes) as the current per-record JSON and as the alternatives
+in app/core/encoding.py: columns layout (category/currency dictionary-encoded), JSON or
+MessagePack, with and without gzip. Reports bytes on the wire, the reduction against
+per-record JSON, server encode time and client decode time (Python, for comparison only).
+"""
+import gzip
+import json
+import os
+import random
+import string
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import msgpack
+
+from app.core.encoding import encode_response
+from app.core.projection import from_columns, to_columns
+
+ROW_COUNT = 10_000
+RUNS = 5
+CATEGORIES = ["Food", "Transport", "Shopping", "Bills", "Entertainment", "Other"]
+ITEMS = ["Starbucks Latte", "MRT", "Lunch box", "Uber", "Netflix", "Groceries", "Electricity bill", "Movie tickets"]
+NOTES = ["", "", "", "", "with team", "reimbursable"]
+
+
+def history(seed: int = 1) -> list[dict]:
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    records = []
+    for _ in range(ROW_COUNT):
+        created = start + timedelta(seconds=rng.randint(0, 2 * 365 * 86400))
+        records.append({
+            "id": "".join(rng.choices(string.ascii_letters + string.digits, k=20)),
+            "item": rng.choice(ITEMS),
+            "amount": round(rng.uniform(20, 3000), rng.choice([0, 2])),
+            "category": rng.choice(CATEGORIES),
+            "date": created.date().isoformat(),
+            "currency": rng.choice(["TWD", "TWD", "TWD", "USD", "JPY"]),
+            "note": rng.choice(NOTES),
+            "created_at": created,
+        })
+    return records
+
+
+def timed(function) -> tuple:
+    times = []
+    for _ in range(RUNS):
+        started = time.perf_counter()
+        result = function()
+        times.append(time.perf_counter() - started)
+    return result, sorted(times)[len(times) // 2]
+
+
+def decode(body: bytes, response_format: str, gzipped: bool, layout: str) -> list[dict]:
+    if gzipped:
+        body = gzip.decompress(body)
+    payload = msgpack.unpackb(body) if response_format == "msgpack" else json.loads(body)
+    return from_columns(payload["data"]) if layout == "columns" else payload["data"]
+
+
+def main():
+    records = history()
+    print(f"GET /expense payload, {ROW_COUNT:,} rows (median of {RUNS})")
+    print(f"  {'encoding':<30} {'bytes':>10} {'vs JSON':>8} {'encode':>9} {'decode':>9}")
+    baseline = None
+    for layout in ("records", "columns"):
+        for response_format in ("json", "msgpack"):
+            for gzip_ok in (False, True):
+                def encode():
+                    data = to_columns(records) if layout == "columns" else records
+                    return encode_response({"status": "success", "data": data, "next_cursor": None}, response_format, gzip_ok)
+
+                (body, _, headers), encode_seconds = timed(encode)
+                gzipped = "Content-Encoding" in headers
+                decoded, decode_seconds = timed(lambda: decode(body, response_format, gzipped, layout))
+                assert len(decoded) == ROW_COUNT and decoded[0]["item"] == records[0]["item"]
+                baseline = baseline or len(body)
+                label = f"{layout} {response_format}{' + gzip' if gzipped else ''}"
+                print(
+                    f"  {label:<30} {len(body):>10,} {baseline / len(body):>7.1f}x "
+                    f"{encode_seconds * 1000:>7.1f}ms {decode_seconds * 1000:>7.1f}ms"
+                )
+
+
+if __name__ == "__main__":
+    main()
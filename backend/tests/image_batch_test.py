@@ -0,0 +1,156 @@
+import asyncio
+import io
+import threading
+import time
+import unittest
+
+import httpx
+from PIL import Image
+
+from app.core.concurrency import RateLimiter
+from app.core.image_batch import parse_images_as_completed
+from app.main import app, get_current_user_id, get_db, get_parser
+
+
+class ParseImagesTests(unittest.TestCase):
+    def collect(self, images, parse_one, concurrency):
+        async def run():
+            return [result async for result in parse_images_as_completed(images, parse_one, concurrency)]
+        return asyncio.run(run())
+
+    def collect_read(self, images, read, concurrency):
+        async def run():
+            return [
+                result
+                async for result in parse_images_as_completed(images, lambda data: (True, data), concurrency, read=read)
+            ]
+        return asyncio.run(run())
+
+    def test_results_stream_in_completion_order(self):
+        delays = [0.3, 0.05, 0.15]
+        results = self.collect(delays, lambda delay: (time.sleep(delay), (True, delay))[1], concurrency=3)
+        self.assertEqual([index for index, _, _ in results], [1, 2, 0])
+
+    def test_concurrency_is_bounded(self):
+        lock = threading.Lock()
+        running = peak = 0
+
+        def parse_one(image):
+            nonlocal running, peak
+            with lock:
+                running += 1
+                peak = max(peak, running)
+            time.sleep(0.05)
+            with lock:
+                running -= 1
+            return True, image
+
+        results = self.collect(list(range(8)), parse_one, concurrency=2)
+        self.assertEqual(sorted(data for _, _, data in results), list(range(8)))
+        self.assertEqual(peak, 2)
+
+    def test_failures_are_isolated(self):
+        def parse_one(image):
+            if image == "corrupt":
+                raise ValueError("cannot identify image")
+            if image == "blurry":
+                return False, "Image Parsing Error: no total found"
+            return True, {"item": image}
+
+        results = sorted(self.collect(["a", "corrupt", "blurry", "b"], parse_one, concurrency=4))
+        self.assertEqual(results, [
+            (0, True, {"item": "a"}),
+            (1, False, "cannot identify image"),
+            (2, False, "Image Parsing Error: no total found"),
+            (3, True, {"item": "b"}),
+        ])
+
+    def test_reads_happen_inside_the_concurrency_limit(self):
+        reading = peak = 0
+
+        async def read(image):
+            nonlocal reading, peak
+            reading += 1
+            peak = max(peak, reading)
+            await asyncio.sleep(0.02)
+            reading -= 1
+            if image == "huge":
+                return False, "Image is too large."
+            return True, image.upper()
+
+        results = sorted(self.collect_read(["a", "huge", "b", "c", "d"], read, concurrency=2))
+        self.assertEqual(results[:3], [(0, True, "A"), (1, False, "Image is too large."), (2, True, "B")])
+        self.assertLessEqual(peak, 2)
+
+
+    def test_rate_limit_waits_on_the_event_loop_not_in_the_pool(self):
+        limiter = RateLimiter(rate=20, burst=1)
+        calls = []
+
+        def parse_one(image):
+            calls.append((time.monotonic(), threading.current_thread().name))
+            return True, image
+
+        async def run():
+            return [
+                result
+                async for result in parse_images_as_completed(list(range(5)), parse_one, 5, limiter=limiter)
+            ]
+
+        started = time.monotonic()
+        results = asyncio.run(run())
+        self.assertEqual(sorted(data for _, _, data in results), list(range(5)))
+        # One token up front, then one every 0.05s; parse_one itself never waits
+        self.assertGreaterEqual(time.monotonic() - started, 0.19)
+        times = sorted(at for at, _ in calls)
+        self.assertTrue(all(later - earlier >= 0.04 for earlier, later in zip(times, times[1:])))
+        self.assertTrue(all(name.startswith("blocking-io") for _, name in calls))
+
+
+class FakeDatabase:
+    def get_user_info(self, user_id):
+        return True, {"categories": ["Food", "Others"], "currency": "TWD"}
+
+    def get_category_model(self, user_id):
+        return False, "no model"
+
+
+class FakeParser:
+    def parse_image(self, image_bytes, content_type, categories, default_currency):
+        return True, {"item": "Receipt", "amount": len(image_bytes) > 0, "currency": default_currency}
+
+
+class ParseImagesEndpointTests(unittest.TestCase):
+    def setUp(self):
+        app.dependency_overrides[get_db] = FakeDatabase
+        app.dependency_overrides[get_parser] = FakeParser
+        app.dependency_overrides[get_current_user_id] = lambda: "u1"
+
+    def tearDown(self):
+        app.dependency_overrides.clear()
+
+    def test_files_are_read_while_the_response_streams(self):
+        png = io.BytesIO()
+        Image.new("RGB", (40, 30), "white").save(png, format="PNG")
+        files = [
+            ("files", ("a.png", png.getvalue(), "image/png")),
+            ("files", ("notes.txt", b"hello", "text/plain")),
+            ("files", ("b.png", png.getvalue(), "image/png")),
+        ]
+
+        async def request():
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                return await client.post("/parse_expense_images", files=files)
+
+        body = asyncio.run(request()).text
+        statuses = {
+            line.split('"filename": "')[1].split('"')[0]: '"status": "success"' in line
+            for line in body.splitlines() if line.startswith("data:") and "filename" in line
+        }
+        self.assertEqual(statuses, {"a.png": True, "notes.txt": False, "b.png": True})
+        self.assertIn('"succeeded": 2', body)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,61 @@
+import io
+import unittest
+
+from PIL import Image
+
+from app.core.images import IMAGE_MAX_DIMENSION, preprocess_image
+
+ORIENTATION = 0x0112
+
+
+def photo(size=(4000, 3000), mode="RGB", fmt="JPEG", orientation=None):
+    image = Image.new(mode, size, "white" if mode != "RGBA" else (255, 255, 255, 0))
+    exif = Image.Exif()
+    exif[0x010F] = "PhoneMaker"
+    if orientation:
+        exif[ORIENTATION] = orientation
+    output = io.BytesIO()
+    if fmt == "JPEG":
+        image.save(output, format=fmt, exif=exif.tobytes())
+    else:
+        image.save(output, format=fmt)
+    return output.getvalue()
+
+
+class PreprocessImageTests(unittest.TestCase):
+    def open(self, data):
+        return Image.open(io.BytesIO(data))
+
+    def test_downscales_and_strips_exif(self):
+        original = photo()
+        ok, (data, content_type) = preprocess_image(original)
+        self.assertTrue(ok)
+        self.assertEqual(content_type, "image/jpeg")
+        image = self.open(data)
+        self.assertEqual(max(image.size), IMAGE_MAX_DIMENSION)
+        self.assertEqual(len(image.getexif()), 0)
+        self.assertLess(len(data), len(original))
+
+    def test_auto_orients(self):
+        # Orientation 6: stored landscape, displayed portrait
+        ok, (data, _) = preprocess_image(photo(orientation=6))
+        width, height = self.open(data).size
+        self.assertLess(width, height)
+
+    def test_small_images_are_not_upscaled(self):
+        ok, (data, _) = preprocess_image(photo(size=(640, 480)))
+        self.assertEqual(self.open(data).size, (640, 480))
+
+    def test_transparent_png_becomes_jpeg(self):
+        ok, (data, content_type) = preprocess_image(photo(size=(800, 600), mode="RGBA", fmt="PNG"), "image/png")
+        self.assertTrue(ok)
+        self.assertEqual((content_type, self.open(data).mode), ("image/jpeg", "RGB"))
+
+    def test_unreadable_images(self):
+        self.assertEqual(preprocess_image(b"not an image"), (False, "Unsupported or corrupt image."))
+        # HEIC can't be decoded here but Gemini reads it, so it is passed through
+        self.assertEqual(preprocess_image(b"heic bytes", "image/heic"), (True, (b"heic bytes", "image/heic")))
+
+
+if __name__ == "__main__":
+    unittest.main()
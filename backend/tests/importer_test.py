@@ -0,0 +1,158 @@
+import io
+import os
+import tempfile
+import unittest
+
+from app.core.importer import ImportJob, iter_ofx_rows, normalize_row, run_import_job
+
+
+class FakeDatabase:
+    def __init__(self):
+        self.saved = []
+        self.jobs = {}
+
+    def create_user_records(self, user_id, records):
+        self.saved.extend(records)
+        return True, [f"id{i}" for i in range(len(records))]
+
+    def find_possible_duplicates(self, user_id, records):
+        saved = {(r["item"], r["amount"], r["date"]) for r in self.saved}
+        return True, [
+            [{"id": "existing"}] if (r["item"], r["amount"], r["date"]) in saved else []
+            for r in records
+        ]
+
+    def save_import_job(self, user_id, job_id, job):
+        self.jobs[job_id] = job
+        return True, job_id
+
+
+class FakeParser:
+    def __init__(self):
+        self.calls = []
+
+    def categorize_items(self, items, categories=None):
+        self.calls.append(items)
+        return True, ["Shopping"] * len(items)
+
+
+class ImporterTests(unittest.TestCase):
+    categories = ["Food", "Transport", "Shopping", "Other"]
+
+    def write_temp(self, content: str, suffix: str) -> str:
+        fd, path = tempfile.mkstemp(suffix=suffix)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(content)
+        return path
+
+    def test_csv_import_uses_ai_only_for_unmapped_rows(self):
+        path = self.write_temp(
+            "Date,Description,Amount,Currency\n"
+            "2026-08-10,Starbucks,150,TWD\n"
+            "2026/08/11,Uber ride,-320,TWD\n"
+            "2026-08-12,Mystery shop,99,\n"
+            "not-a-date,Broken,10,TWD\n"
+            "2026-08-13,Zero,0,TWD\n",
+            ".csv",
+        )
+        db, parser = FakeDatabase(), FakeParser()
+        job = ImportJob(user_id="u1", filename="s.csv", file_format="csv")
+        run_import_job(job, path, self.categories, "TWD", db, parser)
+
+        self.assertEqual(job.status, "completed")
+        self.assertEqual(job.rows_read, 5)
+        self.assertEqual(job.imported, 3)
+        self.assertEqual(job.failed, 1)
+        self.assertEqual(job.skipped, 1)
+        self.assertEqual(job.ai_categorized, 1)
+        # 只有無法對應分類的那一列才送給 Gemini
+        self.assertEqual(parser.calls, [["Mystery shop"]])
+        self.assertEqual([r["category"] for r in db.saved], ["Food", "Transport", "Shopping"])
+        self.assertEqual(db.saved[1]["amount"], 320.0)
+        self.assertEqual(db.saved[1]["date"], "2026-08-11")
+        self.assertFalse(os.path.exists(path))
+
+    def test_reimported_rows_are_flagged_as_possible_duplicates(self):
+        content = "Date,Description,Amount,Currency\n2026-08-10,Starbucks,150,TWD\n2026-08-11,Uber ride,320,TWD\n"
+        db = FakeDatabase()
+        run_import_job(ImportJob("u1", "a.csv", "csv"), self.write_temp(content, ".csv"), self.categories, "TWD", db, None)
+        job = ImportJob(user_id="u1", filename="b.csv", file_format="csv")
+        run_import_job(job, self.write_temp(content, ".csv"), self.categories, "TWD", db, None)
+
+        # Still imported; the rows are reported for the user to review
+        self.assertEqual(job.imported, 2)
+        self.assertEqual(job.possible_duplicates, 2)
+        self.assertEqual([d["row"] for d in job.duplicates], [2, 3])
+
+    def test_plain_csv_with_a_refund_imports_every_row(self):
+        path = self.write_temp("Date,Description,Amount\n2026-08-01,Lunch,120\n2026-08-02,Coffee,80\n2026-08-03,Refund,-500\n", ".csv")
+        db = FakeDatabase()
+        job = ImportJob(user_id="u1", filename="plain.csv", file_format="csv")
+        run_import_job(job, path, self.categories, "TWD", db, None)
+
+        self.assertEqual([(r["item"], r["amount"]) for r in db.saved], [("Lunch", 120.0), ("Coffee", 80.0), ("Refund", 500.0)])
+        self.assertEqual(job.skipped, 0)
+
+    def test_signed_csv_imports_debits_and_skips_credits(self):
+        path = self.write_temp(
+            "\ufeffDate,Description,Amount\n"
+            "2026-08-01,Salary,50000\n"
+            "2026-08-02,Starbucks,-150\n"
+            "2026-08-03,Refund,(0)\n"
+            "2026-08-04,Uber ride,-320.50\n"
+            "2026-08-05,Transfer in,1200\n",
+            ".csv",
+        )
+        db = FakeDatabase()
+        job = ImportJob(user_id="u1", filename="bank.csv", file_format="csv", signed_amounts=True)
+        run_import_job(job, path, self.categories, "TWD", db, None)
+
+        self.assertEqual(job.status, "completed")
+        self.assertEqual((job.rows_read, job.imported, job.skipped), (5, 2, 3))
+        self.assertEqual([(r["item"], r["amount"]) for r in db.saved], [("Starbucks", 150.0), ("Uber ride", 320.5)])
+
+    def test_csv_debit_and_type_columns(self):
+        content = (
+            "Date,Description,Debit,Credit\n"
+            "2026-08-02,Starbucks,150,\n"
+            "2026-08-03,Salary,,50000\n"
+        )
+        db = FakeDatabase()
+        run_import_job(ImportJob("u1", "a.csv", "csv"), self.write_temp(content, ".csv"), self.categories, "TWD", db, None)
+        self.assertEqual([(r["item"], r["amount"]) for r in db.saved], [("Starbucks", 150.0)])
+
+        content = (
+            "Date,Description,Amount,Type\n"
+            "2026-08-02,Starbucks,150,DEBIT\n"
+            "2026-08-03,Salary,50000,Credit\n"
+            "2026-08-04,Uber ride,-320,\n"
+        )
+        db = FakeDatabase()
+        job = ImportJob("u1", "b.csv", "csv")
+        run_import_job(job, self.write_temp(content, ".csv"), self.categories, "TWD", db, None)
+        self.assertEqual([(r["item"], r["amount"]) for r in db.saved], [("Starbucks", 150.0), ("Uber ride", 320.0)])
+        self.assertEqual(job.skipped, 1)
+
+    def test_ofx_rows_keep_only_debits(self):
+        ofx = (
+            "OFXHEADER:100\nDATA:OFXSGML\n\n<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS><CURDEF>USD\n"
+            "<BANKTRANLIST>\n"
+            "<STMTTRN><TRNTYPE>DEBIT<DTPOSTED>20260810120000<TRNAMT>-4.50<NAME>Coffee Bean<MEMO>latte</STMTTRN>\n"
+            "<STMTTRN><TRNTYPE>CREDIT<DTPOSTED>20260811<TRNAMT>1000.00<NAME>Salary</STMTTRN>\n"
+            "</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>\n"
+        )
+        # 用很小的 chunk 確保跨 chunk 的標籤也能正確解析
+        rows = list(iter_ofx_rows(io.BytesIO(ofx.encode("utf-8")), chunk_size=7))
+
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(
+            rows[0][1],
+            {"date": "2026-08-10", "amount": "4.5", "item": "Coffee Bean", "note": "latte", "currency": "USD"},
+        )
+        self.assertIsNone(normalize_row(rows[1][1], self.categories, "USD"))
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
+
+# PYTHONPATH=. python3 tests/importer_test.py
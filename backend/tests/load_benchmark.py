@@ -0,0 +1,94 @@
+"""
+Load benchmark: p99 latency of GET /user_data while /parse_expense calls are in flight.
+
+Firestore and Gemini are replaced by fakes that sleep like the real clients do
+(blocking, synchronous), so the numbers only reflect how the event loop is shared.
+Before the blocking calls were moved off-loop, every /user_data request queued
+behind the in-flight Gemini sleeps; now its p99 should stay close to the idle baseline.
+"""
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import httpx
+
+from app.main import app, get_current_user_id, get_db, get_parser
+
+FIRESTORE_LATENCY = 0.01   # seconds per document read
+GEMINI_LATENCY = 0.5       # seconds per generate_content
+PARSE_CONCURRENCY = 16
+USER_DATA_REQUESTS = 200
+
+
+class FakeDatabase:
+    def get_user_info(self, user_id):
+        time.sleep(FIRESTORE_LATENCY)
+        return True, {"id": user_id, "categories": ["Food"], "currency": "USD"}
+
+    def get_category_model(self, user_id):
+        return False, "no model"
+
+
+class FakeParser:
+    def parse_text(self, user_input, categories=None, default_currency=None, category_model=None):
+        time.sleep(GEMINI_LATENCY)
+        return True, [{"item": user_input, "amount": 1.0, "category": "Food",
+                       "currency": default_currency, "date": "2026-01-01", "note": ""}]
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def measure_user_data(client, count):
+    latencies = []
+    for _ in range(count):
+        start = time.perf_counter()
+        response = await client.get("/user_data")
+        latencies.append(time.perf_counter() - start)
+        assert response.status_code == 200, response.text
+    return latencies
+
+
+async def keep_parsing(client, stop):
+    while not stop.is_set():
+        response = await client.post("/parse_expense", json={"text": "coffee 150"})
+        assert response.status_code == 200, response.text
+
+
+async def run():
+    database, parser = FakeDatabase(), FakeParser()
+    app.dependency_overrides[get_db] = lambda: database
+    app.dependency_overrides[get_parser] = lambda: parser
+    app.dependency_overrides[get_current_user_id] = lambda: "bench_user"
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        idle = await measure_user_data(client, USER_DATA_REQUESTS)
+
+        stop = asyncio.Event()
+        parsers = [asyncio.create_task(keep_parsing(client, stop)) for _ in range(PARSE_CONCURRENCY)]
+        await asyncio.sleep(GEMINI_LATENCY / 2)
+        loaded = await measure_user_data(client, USER_DATA_REQUESTS)
+        stop.set()
+        await asyncio.gather(*parsers)
+
+    for label, samples in (("idle", idle), (f"{PARSE_CONCURRENCY} parses in flight", loaded)):
+        print(
+            f"GET /user_data [{label}]: "
+            f"p50={statistics.median(samples) * 1000:.1f}ms "
+            f"p99={percentile(samples, 99) * 1000:.1f}ms"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(run())
+
+# cd backend
+# PYTHONPATH=. python3 tests/load_benchmark.py
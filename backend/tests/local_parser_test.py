@@ -0,0 +1,79 @@
+import json
+import os
+import unittest
+from datetime import date, timedelta
+
+from app.core.local_parser import LOCAL_PARSE_MIN_CONFIDENCE, parse_locally
+
+TODAY = date(2026, 8, 19)
+CATEGORIES = ["Food", "Transport", "Shopping", "Bills", "Entertainment", "Others"]
+
+
+class LocalParserTests(unittest.TestCase):
+    def parse(self, text, currency="TWD"):
+        return parse_locally(text, CATEGORIES, currency, TODAY)
+
+    def test_amount_currency_date_and_category(self):
+        confidence, expenses = self.parse("uber 15 USD yesterday")
+        self.assertGreaterEqual(confidence, LOCAL_PARSE_MIN_CONFIDENCE)
+        self.assertEqual(expenses, [{
+            "item": "uber", "amount": 15.0, "category": "Transport",
+            "currency": "USD", "date": "2026-08-18", "note": "",
+        }])
+
+    def test_dollar_sign_follows_the_users_currency(self):
+        self.assertEqual(self.parse("coffee $4.50")[1][0]["currency"], "TWD")
+        confidence, expenses = self.parse("coffee $4.50", currency="EUR")
+        self.assertEqual(expenses[0]["currency"], "USD")
+        self.assertLess(confidence, 1.0)
+
+    def test_trailing_currency_symbol(self):
+        confidence, expenses = self.parse("coffee 4.50€")
+        self.assertEqual((expenses[0]["item"], expenses[0]["currency"]), ("coffee", "EUR"))
+        self.assertGreaterEqual(confidence, LOCAL_PARSE_MIN_CONFIDENCE)
+        # A symbol that isn't next to the amount, or two different ones, is ambiguous
+        self.assertEqual(self.parse("€ coffee 4.50 bought $"), (0.0, []))
+        self.assertEqual(self.parse("£4.50€ coffee"), (0.0, []))
+
+    def test_item_keeps_original_casing(self):
+        confidence, expenses = self.parse("Starbucks Latte 150")
+        self.assertEqual(expenses[0]["item"], "Starbucks Latte")
+        self.assertEqual(expenses[0]["category"], "Food")
+
+    def test_conflicting_dates_are_left_to_gemini(self):
+        self.assertEqual(self.parse("movie 300 yesterday today"), (0.0, []))
+        self.assertEqual(self.parse("taxi 200 2 days ago yesterday"), (0.0, []))
+        self.assertEqual(self.parse("day before yesterday taxi 200")[1][0]["date"], "2026-08-17")
+
+    def test_unknown_category_lowers_confidence(self):
+        confidence, expenses = self.parse("dentist 800")
+        self.assertEqual(expenses[0]["category"], "Others")
+        self.assertLess(confidence, LOCAL_PARSE_MIN_CONFIDENCE)
+
+    def test_ambiguous_inputs_are_left_to_gemini(self):
+        for text in ("lunch 120 and coffee 50", "dinner on 8/3 300", "last friday karaoke 600", "午餐120和飲料50", "tickets 2 x 350"):
+            self.assertEqual(self.parse(text), (0.0, []), text)
+
+    def test_labelled_corpus_has_no_wrong_accepts(self):
+        with open(os.path.join(os.path.dirname(__file__), "parse_corpus.json"), encoding="utf-8") as f:
+            corpus = json.load(f)
+        accepted = 0
+        for case in corpus["cases"]:
+            confidence, expenses = parse_locally(case["text"], corpus["categories"], corpus["default_currency"], TODAY)
+            if confidence < LOCAL_PARSE_MIN_CONFIDENCE:
+                continue
+            accepted += 1
+            self.assertIsNotNone(case["expected"], case["text"])
+            self.assertEqual(
+                [(e["item"], e["amount"], e["category"], e["currency"], e["date"]) for e in expenses],
+                [
+                    (e["item"], e["amount"], e["category"], e["currency"], (TODAY + timedelta(days=e["date_offset"])).isoformat())
+                    for e in case["expected"]
+                ],
+                case["text"],
+            )
+        self.assertGreaterEqual(accepted / len(corpus["cases"]), 0.6)
+
+
+if __name__ == "__main__":
+    unittest.main()
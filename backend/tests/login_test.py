@@ -0,0 +1,58 @@
+import unittest
+
+from app.core.database import Database
+from fake_firestore import FakeFirestore
+
+
+def expense(item, amount, day, category="Food"):
+    return {"item": item, "amount": amount, "date": day, "category": category, "currency": "USD"}
+
+
+class LoginPathTests(unittest.TestCase):
+    def setUp(self):
+        self.store = FakeFirestore()
+        self.db = Database(client=self.store)
+
+    def login(self, user_id="uid-1", email="ann@example.com"):
+        self.store.reads = 0
+        return self.db.check_user_exists(user_id, email, "Ann")
+
+    def test_returning_user_costs_one_document_read(self):
+        self.assertEqual(self.login(), (True, "User initialized"))
+        self.assertTrue(self.store.docs["users/uid-1"]["legacy_checked"])
+
+        self.assertEqual(self.login(), (True, "User exists"))
+        self.assertEqual(self.store.reads, 1)
+
+    def test_users_from_before_the_marker_are_checked_once(self):
+        self.store.docs["users/uid-1"] = {"email": "ann@example.com", "categories": ["Food"]}
+
+        self.assertEqual(self.login(), (True, "User exists"))
+        self.assertEqual(self.store.reads, 2)  # user doc + legacy email query (matches only itself)
+        self.assertEqual(self.login(), (True, "User exists"))
+        self.assertEqual(self.store.reads, 1)
+
+    def test_legacy_expenses_move_in_the_background_job(self):
+        self.store.docs["users/google-sub"] = {"email": "ann@example.com", "currency": "TWD", "categories": ["Food", "Rent"]}
+        self.store.docs["users/google-sub/expenses/e1"] = expense("Lunch", 120, "2026-08-10")
+        self.store.docs["users/google-sub/expenses/e2"] = expense("Rent", 9000, "2026-08-01", "Rent")
+
+        self.assertEqual(self.login(), (True, "Migration pending"))
+        user = self.store.docs["users/uid-1"]
+        self.assertEqual((user["currency"], user["categories"]), ("TWD", ["Food", "Rent"]))
+        self.assertEqual(user["legacy_migration"], {"from": "google-sub", "status": "pending"})
+        self.assertNotIn("users/uid-1/expenses/e1", self.store.docs)
+
+        self.assertEqual(self.db.migrate_legacy_user("uid-1"), (True, 2))
+        self.assertEqual(self.store.docs["users/uid-1/expenses/e2"]["amount"], 9000)
+        self.assertFalse([path for path in self.store.docs if path.startswith("users/google-sub")])
+        self.assertEqual(self.store.docs["users/uid-1/rollups/2026-08"]["currencies"]["USD"]["total"], 9120)
+        self.assertEqual(self.store.docs["users/uid-1"]["legacy_migration"]["status"], "completed")
+
+        self.assertEqual(self.db.migrate_legacy_user("uid-1"), (True, "Nothing to migrate"))
+        self.assertEqual(self.login(), (True, "User exists"))
+        self.assertEqual(self.store.reads, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
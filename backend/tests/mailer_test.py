@@ -0,0 +1,193 @@
+import asyncio
+import smtplib
+import socket
+import unittest
+from unittest import mock
+
+from app.core.concurrency import RateLimiter
+from app.core.mailer import SMTPConnectionPool, SMTPMailer, is_transient
+
+try:
+    from aiosmtpd.controller import Controller
+except ImportError:  # local stand-in server is a dev-only dependency
+    Controller = None
+
+
+class RecordingHandler:
+    def __init__(self):
+        self.messages = []
+        self.sessions = set()
+        self.fail_next = []
+
+    async def handle_DATA(self, server, session, envelope):
+        if self.fail_next:
+            return self.fail_next.pop(0)
+        self.sessions.add(id(session))
+        self.messages.append(envelope.rcpt_tos)
+        return "250 OK"
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class RateLimiterTests(unittest.TestCase):
+    def test_bucket_spaces_out_messages(self):
+        clock = FakeClock()
+        limiter = RateLimiter(rate=5, burst=2, clock=clock, sleep=clock.sleep)
+        for _ in range(12):
+            limiter.acquire()
+        # 2 burst tokens, then one every 0.2s
+        self.assertAlmostEqual(clock.now, 2.0)
+
+    def test_async_acquire_sleeps_on_the_event_loop(self):
+        clock = FakeClock()
+        limiter = RateLimiter(rate=5, burst=2, clock=clock, sleep=clock.sleep)
+        waits = []
+
+        async def fake_sleep(seconds):
+            waits.append(seconds)
+            clock.sleep(seconds)
+
+        async def run():
+            with mock.patch("app.core.concurrency.asyncio.sleep", fake_sleep):
+                for _ in range(4):
+                    await limiter.acquire_async()
+
+        asyncio.run(run())
+        self.assertEqual(len(waits), 2)
+        self.assertAlmostEqual(clock.now, 0.4)
+
+    def test_transient_classification(self):
+        self.assertTrue(is_transient(smtplib.SMTPDataError(451, b"try later")))
+        self.assertTrue(is_transient(smtplib.SMTPServerDisconnected()))
+        self.assertFalse(is_transient(smtplib.SMTPDataError(550, b"no such user")))
+        self.assertFalse(is_transient(smtplib.SMTPRecipientsRefused({"a@example.com": (550, b"no")})))
+
+
+class FakeServer:
+    def __init__(self):
+        self.messages = []
+
+    def sendmail(self, from_addr, to_addrs, message):
+        self.messages.append(to_addrs)
+
+    def quit(self):
+        pass
+
+
+class FlakyConnectPool(SMTPConnectionPool):
+    """Pool whose first connects fail with the given errors, then hand out a FakeServer."""
+
+    def __init__(self, errors):
+        super().__init__(host="127.0.0.1", port=25, size=1, use_tls=False)
+        self.errors = list(errors)
+        self.server = FakeServer()
+
+    def _connect(self):
+        if self.errors:
+            raise self.errors.pop(0)
+        self.connections_opened += 1
+        return {"server": self.server, "last_used": 0.0, "sent": 0}
+
+
+class ConnectFailureTests(unittest.TestCase):
+    def test_connect_errors_are_retried(self):
+        pool = FlakyConnectPool([smtplib.SMTPConnectError(421, b"busy"), ConnectionRefusedError()])
+        mailer = SMTPMailer(pool, backoff_seconds=0, sleep=lambda _: None)
+
+        mailer.send("from@example.com", ["a@example.com"], "hello")
+
+        self.assertEqual(pool.server.messages, [["a@example.com"]])
+        self.assertEqual(mailer.stats()["retries"], 2)
+        self.assertEqual(mailer.stats()["failed"], 0)
+        mailer.close()
+
+    def test_exhausted_and_permanent_connect_errors_count_as_failed(self):
+        pool = FlakyConnectPool([smtplib.SMTPConnectError(421, b"busy")] * 3)
+        mailer = SMTPMailer(pool, max_retries=2, backoff_seconds=0, sleep=lambda _: None)
+        with self.assertRaises(smtplib.SMTPConnectError):
+            mailer.send("from@example.com", ["a@example.com"], "hello")
+
+        pool.errors = [smtplib.SMTPAuthenticationError(535, b"bad credentials")]
+        with self.assertRaises(smtplib.SMTPAuthenticationError):
+            mailer.send("from@example.com", ["a@example.com"], "hello")
+
+        self.assertEqual(mailer.stats()["failed"], 2)
+        self.assertEqual(mailer.stats()["retries"], 2)
+        # Every failed connect gave its pool slot back
+        mailer.send("from@example.com", ["b@example.com"], "hello")
+        self.assertEqual(pool.server.messages, [["b@example.com"]])
+        mailer.close()
+
+
+@unittest.skipUnless(Controller, "aiosmtpd is not installed")
+class SMTPMailerTests(unittest.TestCase):
+    def setUp(self):
+        self.handler = RecordingHandler()
+        port = free_port()
+        self.controller = Controller(self.handler, hostname="127.0.0.1", port=port)
+        self.controller.start()
+        self.pool = SMTPConnectionPool(
+            host="127.0.0.1",
+            port=port,
+            size=2,
+            use_tls=False,
+        )
+        self.mailer = SMTPMailer(self.pool, backoff_seconds=0, sleep=lambda _: None)
+        self.message = "Subject: test\r\n\r\nhello\r\n"
+
+    def tearDown(self):
+        self.mailer.close()
+        self.controller.stop()
+
+    def test_sessions_are_reused_across_messages(self):
+        futures = [
+            self.mailer.submit("from@example.com", [f"user{i}@example.com"], self.message)
+            for i in range(50)
+        ]
+        for future in futures:
+            future.result(timeout=10)
+
+        self.assertEqual(len(self.handler.messages), 50)
+        self.assertLessEqual(self.pool.connections_opened, 2)
+        self.assertEqual(self.mailer.stats()["sent"], 50)
+
+    def test_reconnects_after_server_drops_connection(self):
+        self.mailer.send("from@example.com", ["a@example.com"], self.message)
+        # Simulate the relay closing an idle session
+        idle = self.pool._idle.get_nowait()
+        idle["server"].sock.shutdown(socket.SHUT_RDWR)
+        self.pool._idle.put(idle)
+
+        self.mailer.send("from@example.com", ["b@example.com"], self.message)
+        self.assertEqual(len(self.handler.messages), 2)
+        self.assertEqual(self.pool.connections_opened, 2)
+        self.assertEqual(self.mailer.stats()["retries"], 1)
+
+    def test_retries_transient_and_gives_up_on_permanent_errors(self):
+        self.handler.fail_next = ["451 Try again later"]
+        self.mailer.send("from@example.com", ["a@example.com"], self.message)
+        self.assertEqual(len(self.handler.messages), 1)
+
+        self.handler.fail_next = ["554 Rejected"]
+        with self.assertRaises(smtplib.SMTPDataError):
+            self.mailer.send("from@example.com", ["b@example.com"], self.message)
+        self.assertEqual(self.mailer.stats()["failed"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -4,8 +4,11 @@ import os
 # Add backend directory to sys.path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
+from dotenv import load_dotenv
+load_dotenv()
+
 from app.core.database import Database
-from app.core.parser import expense_parser # Import parser to test it
+from app.core.parser import get_expense_parser # Import parser to test it
 
 def main():
     print("--- Starting Dynamic Category Test in index.py ---")
@@ -38,7 +41,7 @@ def main():
     print(f"  Input: '{test_input}'")
     print(f"  Custom Categories: {custom_cats}")
     
-    success, result = expense_parser.parse_text(test_input, categories=custom_cats)
+    success, result = get_expense_parser().parse_text(test_input, categories=custom_cats)
     
     if success:
         print("  [SUCCESS] Parse Result:")
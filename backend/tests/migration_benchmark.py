@@ -0,0 +1,142 @@
+"""
+Benchmark: legacy account migration with 50k expenses.
+
+Compares the previous serial loop (200 expenses per batch, copy + delete in the same
+batch, one commit at a time) with run_legacy_migration (cursor pages, parallel batch
+commits, checkpoint per page, count verification before the delete phase), then
+interrupts a migration halfway and resumes it from the checkpoint.
+
+Runs against the Firestore emulator when FIRESTORE_EMULATOR_HOST is set
+(e.g. `gcloud emulators firestore start --host-port=localhost:8080`), otherwise against
+the in-memory fake with simulated latencies: a fixed cost per round trip plus a cost
+per write in a batch commit (a 400-write commit then takes about 220 ms).
+"""
+import os
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.core.database import Database
+from app.core.migration import MIGRATION_BATCH_SIZE, MIGRATION_WORKERS, run_legacy_migration
+from fake_firestore import FakeFirestore
+
+EXPENSE_COUNT = 50_000
+SIMULATED_LATENCY = 0.02  # seconds per round trip for the in-memory fake
+SIMULATED_WRITE_LATENCY = 0.0005  # seconds per write in a batch commit
+CATEGORIES = ["Food", "Transport", "Shopping", "Bills", "Entertainment", "Other"]
+
+
+def firestore_client():
+    """A client for one scenario: the emulator, or a fresh in-memory store."""
+    if os.getenv("FIRESTORE_EMULATOR_HOST"):
+        from google.cloud import firestore
+        return firestore.Client(project=os.getenv("GCLOUD_PROJECT", "demo-expense-tracker")), "emulator"
+    label = f"in-memory fake, {SIMULATED_LATENCY * 1000:.0f} ms round trips + {SIMULATED_WRITE_LATENCY * 1000:.1f} ms per write"
+    return FakeFirestore(latency=SIMULATED_LATENCY, write_latency=SIMULATED_WRITE_LATENCY), label
+
+
+def seed(db, run):
+    """A legacy account with EXPENSE_COUNT expenses and a new user with a pending migration."""
+    old_id, new_id = f"bench-legacy-{run}", f"bench-uid-{run}"
+    rng = random.Random(run)
+    expenses = [
+        (f"e{n:06d}", {
+            "item": f"Item {rng.randint(1, 500)}",
+            "amount": round(rng.uniform(1, 500), 2),
+            "date": f"2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+            "category": rng.choice(CATEGORIES),
+            "currency": "TWD",
+            "note": "",
+        })
+        for n in range(EXPENSE_COUNT)
+    ]
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        list(executor.map(
+            lambda start: db.copy_expenses(old_id, expenses[start:start + 500]),
+            range(0, EXPENSE_COUNT, 500),
+        ))
+    db.db.collection("users").document(old_id).set({"email": f"{run}@example.com"})
+    db.db.collection("users").document(new_id).set(
+        {"email": f"{run}@example.com", "legacy_migration": {"from": old_id, "status": "pending"}}
+    )
+    return old_id, new_id
+
+
+# The previous migration loop (one serial batch at a time), kept for comparison
+def legacy_serial_migration(db, old_id, new_id):
+    old_expenses_ref = db.db.collection("users").document(old_id).collection("expenses")
+    new_expenses_ref = db.db.collection("users").document(new_id).collection("expenses")
+    batch = db.db.batch()
+    count = 0
+    for exp_doc in old_expenses_ref.stream():
+        batch.set(new_expenses_ref.document(exp_doc.id), exp_doc.to_dict())
+        batch.delete(exp_doc.reference)
+        count += 1
+        if count >= 200:
+            batch.commit()
+            batch = db.db.batch()
+            count = 0
+    if count > 0:
+        batch.commit()
+    db.rebuild_expense_indexes(new_id)
+    db.db.collection("users").document(old_id).delete()
+
+
+def engine_migration(db, new_id):
+    migration = db.db.collection("users").document(new_id).get().to_dict()["legacy_migration"]
+    return run_legacy_migration(db, new_id, migration)
+
+
+def main():
+    db = Database(client=firestore_client()[0])
+    print(f"Legacy migration of {EXPENSE_COUNT:,} expenses ({firestore_client()[1]})")
+
+    old_id, new_id = seed(db, "serial")
+    started = time.perf_counter()
+    legacy_serial_migration(db, old_id, new_id)
+    serial = time.perf_counter() - started
+    print(f"  previous serial loop (200/batch)  {serial:6.1f} s  (no checkpoint, no verification)")
+
+    db = Database(client=firestore_client()[0])
+    old_id, new_id = seed(db, "engine")
+    started = time.perf_counter()
+    success, migration = engine_migration(db, new_id)
+    engine = time.perf_counter() - started
+    assert success, migration
+    print(
+        f"  run_legacy_migration              {engine:6.1f} s  "
+        f"({MIGRATION_WORKERS} workers x {MIGRATION_BATCH_SIZE}/batch, checkpointed and verified)"
+    )
+    print(f"    copied {migration['copied']:,}, deleted {migration['deleted']:,}, {serial / engine:.1f}x faster")
+
+    # Crash halfway through the copy phase, then resume
+    db = Database(client=firestore_client()[0])
+    old_id, new_id = seed(db, "resume")
+    copy_expenses = db.copy_expenses
+    calls = []
+
+    def crashing_copy(user_id, expenses):
+        calls.append(len(expenses))
+        if len(calls) == EXPENSE_COUNT // MIGRATION_BATCH_SIZE // 2:
+            return False, "simulated crash"
+        return copy_expenses(user_id, expenses)
+
+    db.copy_expenses = crashing_copy
+    engine_migration(db, new_id)
+    checkpoint = db.db.collection("users").document(new_id).get().to_dict()["legacy_migration"]
+    db.copy_expenses = copy_expenses
+    calls.clear()
+    success, migration = engine_migration(db, new_id)
+    assert success, migration
+    success, target_count = db.count_expenses(new_id)
+    print(
+        f"  crash after {checkpoint['copied']:,} copied -> resumed from cursor {checkpoint['cursor']}: "
+        f"{migration['copied']:,} copied, {target_count:,} under the new ID"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+import unittest
+
+from app.core.database import Database
+from app.core.migration import run_legacy_migration
+from fake_firestore import FakeFirestore
+
+EXPENSE_COUNT = 23
+
+
+class LegacyMigrationTests(unittest.TestCase):
+    def setUp(self):
+        self.store = FakeFirestore()
+        self.db = Database(client=self.store)
+        self.store.docs["users/google-sub"] = {"email": "ann@example.com"}
+        self.store.docs["users/uid-1"] = {"email": "ann@example.com", "legacy_migration": {"from": "google-sub", "status": "pending"}}
+        for n in range(EXPENSE_COUNT):
+            self.store.docs[f"users/google-sub/expenses/e{n:03d}"] = {
+                "item": f"Lunch {n}", "amount": 100 + n, "date": "2026-08-10", "category": "Food", "currency": "USD",
+            }
+
+    def migrate(self):
+        migration = self.store.docs["users/uid-1"]["legacy_migration"]
+        return run_legacy_migration(self.db, "uid-1", migration, workers=2, batch_size=5)
+
+    def expense_ids(self, user_id):
+        prefix = f"users/{user_id}/expenses/"
+        return sorted(path[len(prefix):] for path in self.store.docs if path.startswith(prefix))
+
+    def test_pages_are_copied_in_parallel_batches_then_the_source_is_deleted(self):
+        success, migration = self.migrate()
+
+        self.assertTrue(success)
+        self.assertEqual(
+            {key: migration[key] for key in ("status", "phase", "copied", "deleted")},
+            {"status": "completed", "phase": "delete", "copied": EXPENSE_COUNT, "deleted": EXPENSE_COUNT},
+        )
+        self.assertEqual(len(self.expense_ids("uid-1")), EXPENSE_COUNT)
+        self.assertFalse([path for path in self.store.docs if path.startswith("users/google-sub")])
+        self.assertEqual(self.store.docs["users/uid-1"]["legacy_migration"]["status"], "completed")
+        self.assertEqual(self.store.docs["users/uid-1/rollups/2026-08"]["currencies"]["USD"]["count"], EXPENSE_COUNT)
+
+    def test_a_crashed_run_resumes_from_the_checkpoint(self):
+        copy_expenses = self.db.copy_expenses
+        copied_ids = []
+        crash = [True]
+
+        def flaky_copy(user_id, expenses):
+            if crash[0] and expenses[0][0] == "e010":
+                return False, "deadline exceeded"
+            copied_ids.extend(expense_id for expense_id, _ in expenses)
+            return copy_expenses(user_id, expenses)
+
+        self.db.copy_expenses = flaky_copy
+        self.assertEqual(self.migrate(), (False, "deadline exceeded"))
+        checkpoint = self.store.docs["users/uid-1"]["legacy_migration"]
+        self.assertEqual((checkpoint["status"], checkpoint["cursor"], checkpoint["copied"]), ("failed", "e009", 10))
+        self.assertEqual(len(self.expense_ids("google-sub")), EXPENSE_COUNT)
+
+        copied_ids.clear()
+        crash[0] = False
+        success, migration = self.migrate()
+        self.assertTrue(success)
+        self.assertEqual(copied_ids[0], "e010")  # the first page is not copied again
+        self.assertEqual(migration["copied"], EXPENSE_COUNT)
+        self.assertNotIn("error", self.store.docs["users/uid-1"]["legacy_migration"])
+        self.assertEqual(len(self.expense_ids("uid-1")), EXPENSE_COUNT)
+
+    def test_count_mismatch_keeps_the_source(self):
+        copy_expenses = self.db.copy_expenses
+        self.db.copy_expenses = lambda user_id, expenses: copy_expenses(user_id, [
+            (expense_id, record) for expense_id, record in expenses if expense_id != "e004"
+        ])
+
+        success, message = self.migrate()
+
+        self.assertFalse(success)
+        self.assertIn("Count mismatch", message)
+        self.assertEqual(len(self.expense_ids("google-sub")), EXPENSE_COUNT)
+        self.assertIn("users/google-sub", self.store.docs)
+
+    def test_login_during_a_migration_skips_the_legacy_query(self):
+        self.store.reads = 0
+        self.assertEqual(self.db.check_user_exists("uid-1", "ann@example.com", "Ann"), (True, "Migration pending"))
+        self.assertEqual(self.store.reads, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
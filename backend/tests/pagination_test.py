@@ -0,0 +1,116 @@
+import asyncio
+import base64
+import unittest
+
+import httpx
+
+from app.core.database import Database, decode_cursor, encode_cursor
+from app.main import app, get_current_user_id, get_db
+from fake_firestore import FakeFirestore
+
+# (id, date, category): several records share a date, so the __name__ tiebreak decides their order
+EXPENSES = [
+    ("e01", "2026-08-01", "Food"), ("e02", "2026-08-03", "Bills"), ("e03", "2026-08-03", "Food"),
+    ("e04", "2026-08-03", "Food"), ("e05", "2026-08-05", "Food"), ("e06", "2026-08-05", "Bills"),
+    ("e07", "2026-08-07", "Food"), ("e08", "2026-08-03", "Bills"), ("e09", "2026-08-09", "Food"),
+]
+
+
+class ReadUserRecordPageTests(unittest.TestCase):
+    def setUp(self):
+        self.store = FakeFirestore()
+        for expense_id, day, category in EXPENSES:
+            self.store.docs[f"users/u1/expenses/{expense_id}"] = {
+                "item": f"Item {expense_id}", "amount": 100, "category": category,
+                "date": day, "currency": "TWD", "note": "",
+            }
+        self.db = Database(client=self.store)
+
+    def walk(self, limit, **filters):
+        ids, cursor, pages = [], None, 0
+        while True:
+            success, page = self.db.read_user_record_page("u1", limit=limit, cursor=cursor, **filters)
+            self.assertTrue(success, page)
+            self.assertLessEqual(len(page["records"]), limit)
+            ids.extend(record["id"] for record in page["records"])
+            pages += 1
+            cursor = page["next_cursor"]
+            if cursor is None:
+                return ids, pages
+
+    def expected(self, keep=lambda day, category: True):
+        matching = [(day, expense_id) for expense_id, day, category in EXPENSES if keep(day, category)]
+        return [expense_id for _, expense_id in sorted(matching, reverse=True)]
+
+    def test_walks_every_record_once_across_date_ties(self):
+        for limit in (1, 2, 3, 4):
+            ids, pages = self.walk(limit)
+            self.assertEqual(ids, self.expected(), f"limit={limit}")
+            self.assertEqual(pages, -(-len(EXPENSES) // limit), f"limit={limit}")
+
+    def test_last_page_has_no_next_cursor(self):
+        success, page = self.db.read_user_record_page("u1", limit=len(EXPENSES))
+        self.assertTrue(success)
+        self.assertEqual(len(page["records"]), len(EXPENSES))
+        self.assertIsNone(page["next_cursor"])
+
+        success, page = self.db.read_user_record_page("u1", limit=len(EXPENSES) - 1)
+        self.assertIsNotNone(page["next_cursor"])
+        success, page = self.db.read_user_record_page("u1", limit=2, cursor=page["next_cursor"])
+        self.assertEqual((len(page["records"]), page["next_cursor"]), (1, None))
+
+    def test_filters_apply_to_every_page(self):
+        ids, _ = self.walk(2, category="Food", start_date="2026-08-03", end_date="2026-08-07")
+        self.assertEqual(ids, self.expected(lambda day, category: category == "Food" and "2026-08-03" <= day <= "2026-08-07"))
+
+        ids, _ = self.walk(1, category="Bills")
+        self.assertEqual(ids, ["e06", "e08", "e02"])
+
+    def test_cursor_round_trip_and_malformed_cursors(self):
+        self.assertEqual(decode_cursor(encode_cursor("2026-08-03", "e04")), ("2026-08-03", "e04"))
+        for cursor in ("not-a-cursor", "e30=", base64.urlsafe_b64encode(b"[1, 2]").decode(), "日期"):
+            with self.assertRaises(ValueError, msg=cursor):
+                decode_cursor(cursor)
+            self.assertEqual(self.db.read_user_record_page("u1", limit=2, cursor=cursor), (False, "Invalid cursor"))
+
+
+class ExpensePageEndpointTests(unittest.TestCase):
+    def setUp(self):
+        store = FakeFirestore()
+        for expense_id, day, category in EXPENSES:
+            store.docs[f"users/u1/expenses/{expense_id}"] = {"item": expense_id, "amount": 1, "category": category, "date": day}
+        database = Database(client=store)
+        app.dependency_overrides[get_db] = lambda: database
+        app.dependency_overrides[get_current_user_id] = lambda: "u1"
+
+    def tearDown(self):
+        app.dependency_overrides.clear()
+
+    def get(self, params):
+        async def request():
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                return await client.get("/expense", params=params)
+        return asyncio.run(request())
+
+    def test_pages_through_the_endpoint(self):
+        ids, cursor = [], None
+        while True:
+            response = self.get({"limit": 4, **({"cursor": cursor} if cursor else {})})
+            self.assertEqual(response.status_code, 200)
+            ids.extend(record["id"] for record in response.json()["data"])
+            cursor = response.json()["next_cursor"]
+            if cursor is None:
+                break
+        self.assertEqual(len(ids), len(EXPENSES))
+        self.assertEqual(len(set(ids)), len(EXPENSES))
+
+    def test_malformed_cursor_is_a_client_error(self):
+        for cursor in ("garbage", "e30=", "%%%"):
+            response = self.get({"limit": 2, "cursor": cursor})
+            self.assertEqual(response.status_code, 400, cursor)
+        self.assertEqual(self.get({"cursor": encode_cursor("2026-08-03", "e04")}).status_code, 400)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,97 @@
+import os
+import tempfile
+import unittest
+from datetime import date
+
+from app.core.cache import ParseResultCache
+from app.core.parse_cache import cache_key, is_relative_input, pack_expenses, unpack_expenses
+
+CATEGORIES = ["Food", "Transport", "Others"]
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+class ParseCacheKeyTests(unittest.TestCase):
+    def test_normalized_input_shares_a_key(self):
+        today = date(2026, 8, 19)
+        key = cache_key("Coffee 150", CATEGORIES, "twd", today)
+        self.assertEqual(cache_key("  coffee   150 ", list(reversed(CATEGORIES)), "TWD", today), key)
+        self.assertNotEqual(cache_key("coffee 150", CATEGORIES, "USD", today), key)
+        self.assertNotEqual(cache_key("coffee 150", CATEGORIES + ["Pets"], "TWD", today), key)
+
+    def test_relative_inputs_are_reused_across_days(self):
+        self.assertTrue(is_relative_input("bus 15 yesterday"))
+        self.assertEqual(
+            cache_key("bus 15 yesterday", CATEGORIES, "TWD", date(2026, 8, 19)),
+            cache_key("bus 15 yesterday", CATEGORIES, "TWD", date(2026, 8, 20)),
+        )
+
+    def test_calendar_dates_are_only_reused_the_same_day(self):
+        for text in ("lunch 120 on 8/3", "dinner last friday 300", "rent march 15000", "3月5號 午餐 100"):
+            self.assertFalse(is_relative_input(text), text)
+            self.assertNotEqual(
+                cache_key(text, CATEGORIES, "TWD", date(2026, 8, 19)),
+                cache_key(text, CATEGORIES, "TWD", date(2026, 8, 20)),
+            )
+
+    def test_dates_are_reanchored_on_hit(self):
+        parsed = [
+            {"item": "bus", "amount": 15.0, "date": "2026-08-18", "category": "Transport", "currency": "TWD", "note": ""},
+            {"item": "coffee", "amount": 150.0, "date": "2026-08-19", "category": "Food", "currency": "TWD", "note": ""},
+        ]
+        packed = pack_expenses(parsed, date(2026, 8, 19))
+        self.assertEqual([e["date_offset"] for e in packed], [-1, 0])
+
+        # The next day "yesterday" and "today" move with the anchor
+        self.assertEqual(
+            [e["date"] for e in unpack_expenses(packed, date(2026, 9, 1))],
+            ["2026-08-31", "2026-09-01"],
+        )
+        self.assertEqual(unpack_expenses(packed, date(2026, 8, 19)), parsed)
+
+
+class ParseResultCacheTests(unittest.TestCase):
+    def test_lru_ttl_and_saved_latency(self):
+        clock = FakeClock()
+        cache = ParseResultCache(max_entries=2, ttl_seconds=60, clock=clock)
+        cache.set("a", [1], cost_seconds=0.8)
+        cache.set("b", [2], cost_seconds=0.5)
+        self.assertEqual(cache.get("a"), [1])
+        cache.set("c", [3])  # evicts "b", the least recently used
+
+        self.assertIsNone(cache.get("b"))
+        clock.now += 61
+        self.assertIsNone(cache.get("a"))
+
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 2))
+        self.assertAlmostEqual(stats["hit_rate"], 1 / 3, places=3)
+        self.assertAlmostEqual(stats["saved_latency_seconds"], 0.8)
+
+    def test_sqlite_backend_survives_restart(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "parse_cache.sqlite3")
+            clock = FakeClock()
+            first = ParseResultCache(max_entries=2, ttl_seconds=60, sqlite_path=path, clock=clock)
+            for key in ("a", "b", "c"):
+                first.set(key, [{"item": key, "date_offset": 0}], cost_seconds=1.0)
+            first.close()
+
+            restarted = ParseResultCache(max_entries=2, ttl_seconds=60, sqlite_path=path, clock=clock)
+            self.assertEqual(restarted.get("c"), [{"item": "c", "date_offset": 0}])
+            # Bounded on disk too
+            self.assertIsNone(restarted.get("a"))
+            clock.now += 61
+            self.assertIsNone(restarted.get("b"))
+            self.assertEqual(restarted.stats()["saved_latency_seconds"], 1.0)
+            restarted.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
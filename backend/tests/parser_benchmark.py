@@ -0,0 +1,112 @@
+"""
+Benchmark: local fast-path parser vs Gemini on the labelled corpus in parse_corpus.json.
+
+For the local path it reports coverage (inputs answered without Gemini), accuracy on
+the inputs it accepted, wrongly accepted inputs, and per-call latency.
+When GEMINI_API_KEY is set, the same corpus is sent to Gemini (fast path and response
+cache disabled) for accuracy and latency of the LLM path.
+
+Case fields: expected is a list of expenses with date_offset relative to today, or null
+for inputs that only check the fast path declines them.
+"""
+import json
+import os
+import statistics
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.core.local_parser import LOCAL_PARSE_MIN_CONFIDENCE, parse_locally
+
+CORPUS_PATH = os.path.join(os.path.dirname(__file__), "parse_corpus.json")
+REPEAT = 200
+
+
+def load_corpus():
+    with open(CORPUS_PATH, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def matches(expected: list[dict], actual: list[dict], today: date) -> bool:
+    if len(expected) != len(actual):
+        return False
+    for want, got in zip(expected, actual):
+        if (
+            str(got.get("item", "")).strip().lower() != want["item"].lower()
+            or abs(float(got.get("amount", 0)) - want["amount"]) > 1e-6
+            or got.get("category") != want["category"]
+            or (got.get("currency") or "").upper() != want["currency"]
+            or got.get("date") != (today + timedelta(days=want["date_offset"])).isoformat()
+        ):
+            return False
+    return True
+
+
+def run_local(corpus, today):
+    accepted = correct = wrong_accepts = 0
+    mistakes = []
+    for case in corpus["cases"]:
+        confidence, expenses = parse_locally(case["text"], corpus["categories"], corpus["default_currency"], today)
+        if confidence < LOCAL_PARSE_MIN_CONFIDENCE:
+            continue
+        accepted += 1
+        if case["expected"] is not None and matches(case["expected"], expenses, today):
+            correct += 1
+        else:
+            wrong_accepts += 1
+            mistakes.append((case["text"], expenses))
+
+    started = time.perf_counter()
+    for _ in range(REPEAT):
+        for case in corpus["cases"]:
+            parse_locally(case["text"], corpus["categories"], corpus["default_currency"], today)
+    per_call = (time.perf_counter() - started) / (REPEAT * len(corpus["cases"]))
+
+    total = len(corpus["cases"])
+    print("Local fast path")
+    print(f"  coverage         {accepted}/{total} ({accepted / total:.0%}) answered without Gemini")
+    print(f"  accuracy         {correct}/{accepted} ({correct / max(accepted, 1):.0%}) of accepted inputs")
+    print(f"  latency          {per_call * 1e6:.1f} µs/call")
+    for text, expenses in mistakes:
+        print(f"  WRONG  {text!r} -> {expenses}")
+
+
+def run_gemini(corpus, today):
+    from app.core import parser
+
+    # Measure the LLM itself: no fast path, no cached answers
+    parser.LOCAL_PARSE_ENABLED = False
+    parser.PARSE_CACHE_ENABLED = False
+    graded = correct = failed = 0
+    latencies = []
+    for case in corpus["cases"]:
+        started = time.perf_counter()
+        success, expenses = parser.get_expense_parser().parse_text(case["text"], corpus["categories"], corpus["default_currency"])
+        latencies.append(time.perf_counter() - started)
+        if not success:
+            failed += 1
+            continue
+        if case["expected"] is not None:
+            graded += 1
+            correct += matches(case["expected"], expenses, today)
+
+    print("Gemini")
+    print(f"  accuracy         {correct}/{graded} ({correct / max(graded, 1):.0%}), {failed} errors")
+    print(f"  latency          median {statistics.median(latencies) * 1000:.0f} ms, "
+          f"max {max(latencies) * 1000:.0f} ms")
+
+
+def main():
+    corpus = load_corpus()
+    today = date.today()
+    run_local(corpus, today)
+    if os.getenv("GEMINI_API_KEY"):
+        run_gemini(corpus, today)
+    else:
+        print("Gemini: skipped (set GEMINI_API_KEY to measure the LLM path)")
+
+
+if __name__ == "__main__":
+    main()
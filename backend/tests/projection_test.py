@@ -0,0 +1,83 @@
+import unittest
+
+from app.core.database import Database
+from app.core.projection import from_columns, parse_fields, to_columns
+from fake_firestore import FakeFirestore
+
+
+class ProjectionTests(unittest.TestCase):
+    def setUp(self):
+        self.store = FakeFirestore()
+        self.db = Database(client=self.store)
+        for n, day in enumerate(["2026-08-01", "2026-08-02", "2026-08-03"]):
+            self.store.docs[f"users/u1/expenses/e{n}"] = {
+                "item": f"Lunch {n}", "amount": 100 + n, "category": "Food", "date": day,
+                "currency": "TWD", "note": "a long note " * 20,
+            }
+
+    def test_parse_fields(self):
+        self.assertEqual(parse_fields(None), (True, None))
+        self.assertEqual(parse_fields("date, amount,id,date"), (True, ["date", "amount"]))
+        success, message = parse_fields("date,password")
+        self.assertFalse(success)
+        self.assertIn("password", message)
+
+    def test_columns_layout(self):
+        records = [
+            {"id": "a", "date": "2026-08-01", "amount": 1.5, "category": "Food"},
+            {"id": "b", "date": "2026-08-02", "category": "Bills"},
+            {"id": "c", "date": "2026-08-02", "amount": 3, "category": "Food"},
+        ]
+        columns = to_columns(records, ["date", "amount", "category"])
+        self.assertEqual(columns, {
+            "fields": ["id", "date", "amount", "category"],
+            "id": ["a", "b", "c"], "date": ["2026-08-01", "2026-08-02", "2026-08-02"], "amount": [1.5, None, 3],
+            "category": {"values": ["Food", "Bills"], "codes": [0, 1, 0]},
+        })
+        self.assertEqual(from_columns(columns)[1], {"id": "b", "date": "2026-08-02", "amount": None, "category": "Bills"})
+        self.assertEqual(to_columns(records)["fields"], ["id", "amount", "category", "date"])
+        self.assertEqual(to_columns([], ["date"]), {"fields": ["id", "date"], "id": [], "date": []})
+
+    def test_unhashable_values_are_encoded(self):
+        # PUT /expense/{id} doesn't validate the body, so a category can be stored as a list
+        records = [
+            {"id": "a", "category": "Food"},
+            {"id": "b", "category": ["Food", "Gifts"]},
+            {"id": "c", "category": "Food"},
+            {"id": "d", "category": ["Food", "Gifts"]},
+        ]
+        columns = to_columns(records, ["category"])
+        self.assertEqual(columns["category"], {
+            "values": ["Food", ["Food", "Gifts"], ["Food", "Gifts"]], "codes": [0, 1, 0, 2],
+        })
+        self.assertEqual([record["category"] for record in from_columns(columns)], [r["category"] for r in records])
+
+    def test_uncached_reads_use_a_field_mask_and_are_not_cached(self):
+        success, records = self.db.read_user_record("u1", fields=["date", "amount"])
+
+        self.assertTrue(success)
+        self.assertEqual(records[0], {"id": "e0", "date": "2026-08-01", "amount": 100})
+        self.assertIsNone(self.db.expense_cache.get("u1"))
+
+    def test_cached_reads_are_projected(self):
+        self.db.read_user_record("u1")
+        self.store.reads = 0
+
+        success, records = self.db.read_user_record("u1", start_date="2026-08-02", fields=["category"])
+
+        self.assertTrue(success)
+        self.assertEqual(records, [{"id": "e1", "category": "Food"}, {"id": "e2", "category": "Food"}])
+        self.assertEqual(self.store.reads, 0)
+        self.assertIn("note", self.db.expense_cache.get("u1")[0])
+
+    def test_pages_keep_their_cursor_without_the_date_field(self):
+        success, page = self.db.read_user_record_page("u1", limit=2, fields=["amount"])
+        self.assertTrue(success)
+        self.assertEqual(page["records"], [{"id": "e2", "amount": 102}, {"id": "e1", "amount": 101}])
+
+        success, page = self.db.read_user_record_page("u1", limit=2, fields=["amount"], cursor=page["next_cursor"])
+        self.assertEqual(page, {"records": [{"id": "e0", "amount": 100}], "next_cursor": None})
+
+
+if __name__ == "__main__":
+    unittest.main()
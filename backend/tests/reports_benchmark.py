@@ -0,0 +1,87 @@
+"""
+Benchmark: GET /report?period=week on the columns the expense cache keeps for the user
+(a warm /report: Database.read_expense_columns) vs building them from dicts (cold).
+
+Generates 100k and 1M synthetic expenses, checks that both paths match the dict-based
+build_weekly_report, then prints all three timings.
+"""
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.core.cache import ExpenseCache
+from app.core.reports import ExpenseColumns, build_period_report, build_weekly_report
+
+SIZES = (100_000, 1_000_000)
+REFERENCE_DATE = date(2026, 8, 16)
+CATEGORIES = ["Food", "Transport", "Shopping", "Bills", "Entertainment", "Other", ""]
+CURRENCIES = ["TWD", "TWD", "TWD", "USD", "", None]
+
+
+def synthetic_expenses(size: int, seed: int = 42) -> list[dict]:
+    rng = random.Random(seed)
+    start = REFERENCE_DATE - timedelta(days=3 * 365)
+    expenses = []
+    for i in range(size):
+        expense = {
+            "item": f"item-{i % 500}",
+            "amount": round(rng.uniform(1, 2000), 2),
+            "category": rng.choice(CATEGORIES),
+            "currency": rng.choice(CURRENCIES),
+            "date": (start + timedelta(days=rng.randrange(3 * 365 + 1))).isoformat(),
+            "note": "",
+        }
+        if i % 997 == 0:
+            expense["date"] = "not-a-date"
+        if i % 1009 == 0:
+            expense["amount"] = "n/a"
+        expenses.append(expense)
+    return expenses
+
+
+def timed(func, repeat: int = 3):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def weekly_figures(report: dict) -> dict:
+    keys = ("expense_count", "total", "category_totals", "largest_expense", "top_spending_day")
+    return {key: report[key] for key in keys} | {
+        "previous_total": report.get("previous_total", report.get("previous_week_total"))
+    }
+
+
+def main():
+    for size in SIZES:
+        expenses = synthetic_expenses(size)
+        dict_time, dict_report = timed(lambda: build_weekly_report(expenses, REFERENCE_DATE, "TWD"))
+        cold_time, cold_report = timed(lambda: build_period_report(expenses, "week", REFERENCE_DATE, "TWD"))
+        cache = ExpenseCache()
+        cache.set("bench_user", expenses)
+        cache.get_derived("bench_user", ExpenseColumns)  # first report after a load builds the columns
+        warm_time, warm_report = timed(
+            lambda: build_period_report(cache.get_derived("bench_user", ExpenseColumns), "week", REFERENCE_DATE, "TWD")
+        )
+
+        assert weekly_figures(dict_report) == weekly_figures(cold_report) == weekly_figures(warm_report), "reports differ"
+        print(
+            f"{size:>9,} expenses: dicts {dict_time * 1000:8.1f}ms | "
+            f"columns, cold (build + report) {cold_time * 1000:8.1f}ms | "
+            f"columns, warm (cached) {warm_time * 1000:8.2f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
+
+# cd backend
+# PYTHONPATH=. python3 tests/reports_benchmark.py
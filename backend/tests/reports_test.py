@@ -1,7 +1,8 @@
 import unittest
 from datetime import date
 
-from app.core.reports import build_weekly_report
+from app.core.reports import build_period_report, build_weekly_report, build_weekly_report_from_rollups, period_windows
+from app.core.rollups import build_rollups, rollup_deltas, summarize_rollups
 
 
 class WeeklyReportTests(unittest.TestCase):
@@ -10,8 +11,11 @@ class WeeklyReportTests(unittest.TestCase):
         # 本週：2026-08-10 ~ 2026-08-16
         # 上週：2026-08-03 ~ 2026-08-09
         self.reference_date = date(2026, 8, 16)
+        self.expenses = self.expenses_fixture()
 
-        self.expenses = [
+    @staticmethod
+    def expenses_fixture():
+        return [
             # 本週 TWD
             {
                 "item": "Lunch",
@@ -112,6 +116,118 @@ class WeeklyReportTests(unittest.TestCase):
         self.assertIsNone(report["top_spending_day"])
 
 
+class PeriodReportTests(unittest.TestCase):
+    def setUp(self):
+        self.reference_date = date(2026, 8, 16)
+        self.expenses = WeeklyReportTests.expenses_fixture()
+
+    def test_week_period_matches_weekly_report(self):
+        weekly = build_weekly_report(self.expenses, self.reference_date, "TWD")
+        report = build_period_report(self.expenses, "week", self.reference_date, "TWD")
+
+        self.assertEqual(report["start"], weekly["week_start"])
+        self.assertEqual(report["end"], weekly["week_end"])
+        for key in ("expense_count", "total", "change_amount", "change_percent",
+                    "category_totals", "largest_expense", "top_spending_day"):
+            self.assertEqual(report[key], weekly[key])
+        self.assertEqual(report["previous_total"], weekly["previous_week_total"])
+
+    def test_unhashable_category_does_not_break_the_report(self):
+        expenses = self.expenses + [
+            {"item": "Gift box", "amount": 40, "category": ["Gifts"], "currency": "TWD", "date": "2026-08-11"},
+        ]
+        report = build_period_report(expenses, "week", self.reference_date, "TWD")
+
+        self.assertEqual(report["total"], 190.0)
+        self.assertEqual(report["category_totals"][-1], {"category": ["Gifts"], "amount": 40.0})
+
+    def test_month_trend_in_one_report(self):
+        expenses = self.expenses + [
+            {"item": "Rent", "amount": 9000, "category": "Bills", "currency": "TWD", "date": "2026-07-01"},
+        ]
+        report = build_period_report(expenses, "month", self.reference_date, "TWD", trend=3)
+
+        self.assertEqual((report["start"], report["end"]), ("2026-08-01", "2026-08-31"))
+        self.assertEqual(report["total"], 225.0)
+        self.assertEqual(report["previous_total"], 9000.0)
+        self.assertEqual(
+            [(item["start"], item["total"]) for item in report["trend"]],
+            [("2026-06-01", 0.0), ("2026-07-01", 9000.0), ("2026-08-01", 225.0)],
+        )
+
+    def test_ytd_and_custom_windows(self):
+        # 閏年 2/29 對應前一年的 2/28
+        self.assertEqual(
+            period_windows("ytd", date(2028, 2, 29), 2),
+            [(date(2027, 1, 1), date(2027, 2, 28)), (date(2028, 1, 1), date(2028, 2, 29))],
+        )
+        self.assertEqual(
+            period_windows("custom", date(2026, 8, 16), 2, start=date(2026, 8, 11), end=date(2026, 8, 16)),
+            [(date(2026, 8, 5), date(2026, 8, 10)), (date(2026, 8, 11), date(2026, 8, 16))],
+        )
+
+
+class RollupTests(unittest.TestCase):
+    def setUp(self):
+        self.reference_date = date(2026, 8, 16)
+        self.expenses = WeeklyReportTests.expenses_fixture()
+
+    def test_report_from_rollups_matches_raw_report(self):
+        rollups = list(build_rollups(self.expenses).values())
+        week_expenses = [e for e in self.expenses if "2026-08-10" <= e["date"] <= "2026-08-16"]
+
+        for currency in ("TWD", "USD"):
+            self.assertEqual(
+                build_weekly_report_from_rollups(rollups, week_expenses, self.reference_date, currency),
+                build_weekly_report(self.expenses, self.reference_date, currency),
+            )
+
+    def test_report_from_rollups_matches_week_period_report_on_edge_rows(self):
+        expenses = [
+            # 本週：金額錯誤的紀錄仍計入筆數、金額為零的分類仍列出、同分時保留原順序
+            {"item": "Scan", "amount": "n/a", "category": "Food", "currency": "TWD", "date": "2026-08-10"},
+            {"item": "Free sample", "amount": 0, "category": "Gifts", "date": "2026-08-11"},
+            {"item": "Bus", "amount": 30, "category": "Transport", "currency": "TWD", "date": "2026-08-12"},
+            {"item": "Tea", "amount": 30, "category": "Drinks", "currency": "TWD", "date": "2026-08-11"},
+            # 上週
+            {"item": "Coffee", "amount": 75, "category": "Food", "currency": "TWD", "date": "2026-08-04"},
+            {"item": "Broken", "amount": None, "category": "Food", "currency": "TWD", "date": "2026-08-05"},
+        ]
+        only_zero = [{"item": "Free sample", "amount": 0, "category": "Gifts", "date": "2026-08-11"}]
+
+        for rows in (expenses, only_zero):
+            rollups = list(build_rollups(rows).values())
+            week_expenses = [e for e in rows if "2026-08-10" <= e["date"] <= "2026-08-16"]
+            report = build_weekly_report_from_rollups(rollups, week_expenses, self.reference_date, "TWD")
+            period = build_period_report(rows, "week", self.reference_date, "TWD")
+
+            self.assertEqual(report["previous_week_total"], period["previous_total"])
+            for key in ("expense_count", "total", "change_amount", "change_percent",
+                        "category_totals", "largest_expense", "top_spending_day"):
+                self.assertEqual(report[key], period[key], key)
+
+        self.assertEqual(report["expense_count"], 1)
+        self.assertEqual(report["category_totals"], [{"category": "Gifts", "amount": 0.0}])
+        self.assertEqual(report["top_spending_day"], {"date": "2026-08-11", "amount": 0.0})
+
+    def test_signed_deltas_cancel_out(self):
+        lunch = self.expenses[0]
+        edited = {**lunch, "amount": 130, "category": "Snacks"}
+        # 建立 → 修改 → 刪除，彙總應回到零
+        steps = [
+            rollup_deltas(added=[lunch]),
+            rollup_deltas(added=[edited], removed=[lunch]),
+            rollup_deltas(removed=[edited]),
+        ]
+        rollups = [{"currencies": step["2026-08"]} for step in steps]
+        summary = summarize_rollups(rollups, date(2026, 8, 1), date(2026, 8, 31), "TWD")
+
+        self.assertEqual(summary["total"], 0.0)
+        self.assertEqual(summary["count"], 0)
+        self.assertEqual(summary["categories"], {})
+        self.assertEqual(summary["days"], {})
+
+
 if __name__ == "__main__":
     unittest.main(verbosity=2)
     
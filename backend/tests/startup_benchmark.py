@@ -0,0 +1,90 @@
+"""
+Benchmark: cold-start cost of the API process.
+
+1. `import app.main` in a fresh interpreter (median of several runs). Firebase, Firestore
+   and Gemini clients are no longer built at import, and the Gemini SDK is no longer imported.
+   NumPy, Pillow and Jinja are imported during the lifespan warm-up instead.
+2. Time from spawning uvicorn until the first HTTP response, plus that first request's
+   latency (GET /metrics, which needs no clients).
+3. With FIREBASE_CONFIG / GEMINI_API_KEY set, the cost of creating the clients, which
+   used to be paid inside the import and now happens in the startup warm-up or first use.
+"""
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+RUNS = 5
+
+
+def run_python(code: str) -> float:
+    output = subprocess.run(
+        [sys.executable, "-c", code], cwd=BACKEND_DIR, capture_output=True, text=True, check=True,
+    ).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def timed_import(module: str) -> float:
+    return statistics.median(
+        run_python(f"import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)")
+        for _ in range(RUNS)
+    )
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def time_to_first_response():
+    port = free_port()
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR,
+    )
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}") as client:
+            while True:
+                try:
+                    request_started = time.perf_counter()
+                    response = client.get("/metrics")
+                    break
+                except httpx.TransportError:
+                    if server.poll() is not None:
+                        raise RuntimeError("uvicorn exited during startup")
+                    time.sleep(0.01)
+            first_request = time.perf_counter() - request_started
+            return time.perf_counter() - started, first_request, response.status_code
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    print(f"import app.main            {timed_import('app.main') * 1000:.0f} ms (median of {RUNS})")
+    print(f"  google.genai (now lazy)  {timed_import('google.genai') * 1000:.0f} ms")
+    print(f"  numpy, PIL, jinja2 (warm-up)  {timed_import('numpy, PIL.Image, jinja2') * 1000:.0f} ms")
+
+    ready, first_request, status = time_to_first_response()
+    print(f"uvicorn spawn -> first response  {ready * 1000:.0f} ms")
+    print(f"  first request (GET /metrics)   {first_request * 1000:.1f} ms, status {status}")
+
+    if os.getenv("FIREBASE_CONFIG") and os.getenv("GEMINI_API_KEY"):
+        clients = run_python(
+            "import time; from app.main import create_clients; "
+            "t = time.perf_counter(); create_clients(); print(time.perf_counter() - t)"
+        )
+        print(f"client creation (off the import path)  {clients * 1000:.0f} ms")
+    else:
+        print("client creation: skipped (set FIREBASE_CONFIG and GEMINI_API_KEY to measure)")
+
+
+if __name__ == "__main__":
+    main()
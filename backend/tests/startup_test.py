@@ -0,0 +1,42 @@
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+from app.core import parse_cache as parse_cache_module
+from app.core.cache import ParseResultCache
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+class StartupTests(unittest.TestCase):
+    def test_importing_the_app_defers_heavy_libraries(self):
+        # msgpack is not checked: firebase_admin's HTTP cache imports it anyway
+        output = subprocess.run(
+            [sys.executable, "-c", "import sys, app.main; print(sorted(m for m in ('numpy', 'PIL', 'jinja2') if m in sys.modules))"],
+            cwd=BACKEND_DIR, capture_output=True, text=True, check=True,
+        ).stdout
+        self.assertEqual(output.strip().splitlines()[-1], "[]")
+
+    def test_parse_cache_file_is_opened_at_startup(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "parse_cache.sqlite3")
+            cache = ParseResultCache(max_entries=10, ttl_seconds=60)
+            with mock.patch.object(parse_cache_module, "parse_cache", cache), \
+                    mock.patch.object(parse_cache_module, "PARSE_CACHE_SQLITE_PATH", path):
+                self.assertFalse(cache.stats()["persistent"])
+                self.assertFalse(os.path.exists(path))
+                parse_cache_module.open_parse_cache()
+            self.assertTrue(cache.stats()["persistent"])
+            cache.set("key", {"expenses": []})
+            cache.close()
+
+            restarted = ParseResultCache(max_entries=10, ttl_seconds=60, sqlite_path=path)
+            self.assertEqual(restarted.get("key"), {"expenses": []})
+            restarted.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -6,7 +6,7 @@ import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from app.main import app, get_current_user_id
-from app.core.database import db_client
+from app.core.database import get_db_client
 
 # 1. 建立測試客戶端
 client = TestClient(app)
@@ -16,7 +16,7 @@ TEST_USER_ID = "test_user_new_002"
 
 # 3. 確保該 User 在 Firestore 中已初始化，避免 404 錯誤
 # 如果資料庫沒有此帳號，這行會自動幫你建立測試設定檔（主幣別 USD、預設分類等）
-db_client.check_user_exists(TEST_USER_ID, "test@example.com", "Test User")
+get_db_client().check_user_exists(TEST_USER_ID, "test@example.com", "Test User")
 
 # 4. 模擬驗證：強制將 get_current_user_id 替換為測試用的 user_id
 app.dependency_overrides[get_current_user_id] = lambda: TEST_USER_ID
@@ -0,0 +1,84 @@
+import asyncio
+import unittest
+
+import httpx
+from fastapi import FastAPI, File, UploadFile
+
+from app.core.image_batch import IMAGE_BATCH_MAX_BYTES, IMAGE_BATCH_MAX_FILES
+from app.core.images import IMAGE_MAX_UPLOAD_BYTES
+from app.core.uploads import MULTIPART_OVERHEAD_BYTES, BodySizeLimitMiddleware
+from app.main import app as api_app
+
+
+def limited_app():
+    app = FastAPI()
+    app.state.calls = 0
+    app.add_middleware(BodySizeLimitMiddleware, limits={"/upload": 2048})
+
+    @app.post("/upload")
+    async def upload(file: UploadFile = File(...)):
+        app.state.calls += 1
+        return {"size": len(await file.read())}
+
+    @app.post("/other")
+    async def other(file: UploadFile = File(...)):
+        return {"size": len(await file.read())}
+
+    return app
+
+
+class BodySizeLimitTests(unittest.TestCase):
+    def post(self, app, path, **kwargs):
+        async def request():
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                return await client.post(path, **kwargs)
+        return asyncio.run(request())
+
+    def test_content_length_over_the_limit_is_refused_before_the_route(self):
+        app = limited_app()
+        response = self.post(app, "/upload", files={"file": ("a.jpg", b"x" * 4096, "image/jpeg")})
+        self.assertEqual(response.status_code, 413)
+        self.assertEqual(app.state.calls, 0)
+
+        self.assertEqual(self.post(app, "/upload", files={"file": ("a.jpg", b"x" * 1024, "image/jpeg")}).json(), {"size": 1024})
+        self.assertEqual(self.post(app, "/other", files={"file": ("a.jpg", b"x" * 4096, "image/jpeg")}).json(), {"size": 4096})
+
+    def test_chunked_body_is_cut_off_at_the_limit(self):
+        app = limited_app()
+        boundary = "limit-test"
+        body = (
+            f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"a.jpg\"\r\n"
+            f"Content-Type: image/jpeg\r\n\r\n"
+        ).encode() + b"x" * 8192 + f"\r\n--{boundary}--\r\n".encode()
+
+        async def chunks():
+            for start in range(0, len(body), 1024):
+                yield body[start:start + 1024]
+
+        response = self.post(
+            app, "/upload", content=chunks(), headers={"Content-Type": f"multipart/form-data; boundary={boundary}"}
+        )
+        self.assertEqual(response.status_code, 413)
+        self.assertEqual(app.state.calls, 0)
+
+    def test_image_routes_are_limited(self):
+        response = self.post(
+            api_app, "/parse_expense_image",
+            content=b"", headers={"Content-Length": str(1024 ** 3), "Content-Type": "multipart/form-data; boundary=x"},
+        )
+        self.assertEqual(response.status_code, 413)
+
+    def test_image_batch_has_its_own_total_cap(self):
+        # Under the old files × per-file cap (~600 MB) this request would have been read
+        response = self.post(
+            api_app, "/parse_expense_images",
+            content=b"", headers={"Content-Length": str(IMAGE_BATCH_MAX_BYTES + MULTIPART_OVERHEAD_BYTES + 1),
+                                  "Content-Type": "multipart/form-data; boundary=x"},
+        )
+        self.assertEqual(response.status_code, 413)
+        self.assertLess(IMAGE_BATCH_MAX_BYTES, IMAGE_BATCH_MAX_FILES * IMAGE_MAX_UPLOAD_BYTES)
+
+
+if __name__ == "__main__":
+    unittest.main()
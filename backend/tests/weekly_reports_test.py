@@ -0,0 +1,123 @@
+import threading
+import time
+import unittest
+from datetime import date
+
+from app.core.database import Database
+from app.core.weekly_reports import run_weekly_report_fanout
+from fake_firestore import FakeFirestore
+
+
+class FakeDatabase(Database):
+    def __init__(self, user_count):
+        super().__init__(client=FakeFirestore())
+        for i in range(user_count):
+            self.db.docs[f"users/user{i:03d}"] = {
+                "email": f"u{i}@example.com", "currency": "TWD", "rollups_built": True,
+                "weekly_report_subscribed": True,
+            }
+        self.fail_listing_after = None
+
+    def list_subscribed_users(self, limit, start_after=None):
+        if self.fail_listing_after is not None and start_after and start_after >= self.fail_listing_after:
+            return False, "listing failed"
+        return super().list_subscribed_users(limit, start_after)
+
+
+class WeeklyReportFanoutTests(unittest.TestCase):
+    reference_date = date(2026, 8, 16)
+
+    def test_sends_once_per_user_and_resumes_after_failure(self):
+        db = FakeDatabase(user_count=25)
+        sent = []
+
+        def send_email(recipient, report):
+            sent.append(recipient)
+            return True, "ok"
+
+        # 第一次執行：處理兩頁後列出使用者失敗（模擬中途當機）
+        db.fail_listing_after = "user009"
+        success, _ = run_weekly_report_fanout(db, self.reference_date, workers=4, page_size=5, send_email=send_email)
+        self.assertFalse(success)
+        self.assertEqual(len(sent), 10)
+
+        # 第二次執行：從 checkpoint 繼續，不重寄
+        db.fail_listing_after = None
+        success, run = run_weekly_report_fanout(db, self.reference_date, workers=4, page_size=5, send_email=send_email)
+        self.assertTrue(success)
+        self.assertEqual(run["status"], "completed")
+        self.assertEqual(len(sent), 25)
+        self.assertEqual(len(set(sent)), 25)
+        self.assertEqual(run["sent"], 25)
+
+        # 已完成的週不會再寄送
+        run_weekly_report_fanout(db, self.reference_date, page_size=5, send_email=send_email)
+        self.assertEqual(len(sent), 25)
+
+    def test_time_budget_stops_at_page_boundary(self):
+        db = FakeDatabase(user_count=12)
+        ticks = iter(range(100))
+        success, run = run_weekly_report_fanout(
+            db, self.reference_date, page_size=5, max_seconds=1,
+            send_email=lambda recipient, report: (True, "ok"),
+            clock=lambda: next(ticks),
+        )
+        self.assertTrue(success)
+        self.assertEqual(run["status"], "partial")
+        self.assertEqual(run["processed"], 5)
+        self.assertEqual(run["cursor"], "user004")
+
+    def test_overlapping_runs_send_each_email_once(self):
+        db = FakeDatabase(user_count=12)
+        sent = []
+        lock = threading.Lock()
+
+        def send_email(recipient, report):
+            time.sleep(0.01)
+            with lock:
+                sent.append(recipient)
+            return True, "ok"
+
+        results = []
+        runs = [
+            threading.Thread(target=lambda: results.append(
+                run_weekly_report_fanout(db, self.reference_date, workers=4, page_size=5, send_email=send_email)
+            ))
+            for _ in range(3)
+        ]
+        for thread in runs:
+            thread.start()
+        for thread in runs:
+            thread.join()
+
+        self.assertEqual(sorted(sent), sorted(set(sent)))
+        self.assertEqual(len(sent), 12)
+        statuses = sorted(run["status"] for _, run in results)
+        self.assertEqual(statuses.count("completed"), 1)
+        self.assertEqual(statuses.count("busy"), 2)
+
+    def test_expired_lease_is_taken_over_and_claimed_emails_are_not_resent(self):
+        db = FakeDatabase(user_count=3)
+        week_start = "2026-08-10"
+        # A crashed run: its lease has expired, and it claimed user000's email just before dying
+        db.db.docs[f"report_runs/{week_start}"] = {
+            "week_start": week_start, "status": "running", "cursor": None, "processed": 0,
+            "sent": 0, "skipped": 0, "failed": 0, "lease_owner": "crashed", "lease_expires_at": 0,
+        }
+        self.assertEqual(db.claim_weekly_report_email("user000", week_start, 900), (True, "claimed"))
+        sent = []
+
+        success, run = run_weekly_report_fanout(
+            db, self.reference_date, send_email=lambda recipient, report: (sent.append(recipient), (True, "ok"))[1]
+        )
+
+        self.assertTrue(success)
+        self.assertEqual(run["status"], "completed")
+        self.assertEqual(sent, ["u1@example.com", "u2@example.com"])
+        self.assertLessEqual(db.db.docs[f"report_runs/{week_start}"]["lease_expires_at"], time.time())
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
+
+# PYTHONPATH=. python3 tests/weekly_reports_test.py
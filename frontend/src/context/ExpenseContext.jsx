@@ -106,13 +106,11 @@ export function ExpenseProvider({ children, user, authReady }) {
                 setExpenses(prev => sortExpenses([...newRecords, ...prev]));
                 return newRecords;
             }else{
-                // 登入模式：逐筆呼叫後端 API 建立紀錄
-                const newRecords = [];
-                for (const item of items) {
-                    const response = await expenseService.create(item);
-                    if (response.data.status === 'success') {
-                        newRecords.push(response.data.data);
-                    }
+                // 登入模式：一次呼叫後端批次 API 建立所有紀錄
+                const response = await expenseService.createBatch(items);
+                const newRecords = response.data.status === 'success' ? response.data.data : [];
+                if (response.data.errors?.length) {
+                    console.warn('Some expenses were rejected:', response.data.errors);
                 }
                 // After all successful creations, refresh the cloud data and cache
                 await fetchExpenses();
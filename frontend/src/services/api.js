@@ -39,8 +39,15 @@ api.interceptors.request.use(
 
 // Call API methods 
 export const expenseService = {
-    getAll: () => api.get('/expense'),
+    getAll: (params) => api.get('/expense', { params }),
     create: (data) => api.post('/expense/create', data),
+    createBatch: (items) => api.post('/expense/batch', { expenses: items }),
+    importFile: (file) => {
+        const form = new FormData();
+        form.append('file', file);
+        return api.post('/expense/import', form);
+    },
+    importStatus: (jobId) => api.get(`/expense/import/${jobId}`),
     update: (id, data) => api.put(`/expense/${id}`, data),
     delete: (id) => api.delete(`/expense/${id}`),
     parse: (text) => api.post('/parse_expense', { text }),
@@ -58,6 +65,8 @@ export const userService = {
 
 export const reportService = {
     generateWeekly: (recipientEmail) => api.post('/report/weekly/generate', { recipient_email: recipientEmail }),
+    getRollups: (start, end) => api.get('/rollups', { params: { start, end } }),
+    getReport: (params) => api.get('/report', { params }),
 };
 
 export default api;